@@ -0,0 +1,244 @@
+"""
+Semantic Answer Cache
+Per-patient in-memory index of recent answers, looked up by query-embedding similarity
+
+Patients ask the same check-in question in many phrasings. When a new question is
+within the cosine threshold of a recent one, for the same patient, at the same turn
+position and with the patient's vector store unchanged, RAGEngine reuses the stored
+answer instead of calling the LLM. Entries expire after ANSWER_CACHE_TTL_SECONDS.
+Every hit is written to a durable audit store (answer_cache_hits in patient_data.db)
+before the cached answer is returned; a hit that cannot be recorded is treated as
+a miss. Recent hits are also kept in memory to serve the audit endpoint.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+import numpy as np
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+DEFAULT_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+DEFAULT_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "1800"))
+DEFAULT_MAX_ENTRIES_PER_PATIENT = int(os.getenv("ANSWER_CACHE_MAX_PER_PATIENT", "64"))
+DEFAULT_AUDIT_SIZE = 1000
+
+
+def _unit(vector) -> np.ndarray:
+    """L2-normalized float32 copy (cosine similarity becomes a dot product)"""
+    array = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(array))
+    return array / norm if norm else array
+
+
+class _PatientIndex:
+    """Exact inner-product index over one patient's cached questions"""
+
+    def __init__(self, dimension: int):
+        self.vectors = np.empty((0, dimension), dtype=np.float32)
+        self.entries: List[Dict[str, Any]] = []
+
+    def add(self, vector: np.ndarray, entry: Dict[str, Any]):
+        self.vectors = np.vstack([self.vectors, vector[None, :]])
+        self.entries.append(entry)
+
+    def keep(self, rows: List[int]):
+        self.vectors = self.vectors[rows]
+        self.entries = [self.entries[i] for i in rows]
+
+
+class SemanticAnswerCache:
+    """
+    Thread-safe per-patient semantic cache with TTL and store-version invalidation
+    """
+
+    def __init__(self, threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries_per_patient: int = DEFAULT_MAX_ENTRIES_PER_PATIENT,
+                 audit_size: int = DEFAULT_AUDIT_SIZE, audit_store=None, clock=time.monotonic):
+        """
+        Args:
+            threshold: Minimum cosine similarity for a hit
+            ttl_seconds: How long an answer may be reused
+            max_entries_per_patient: Oldest entries are dropped beyond this
+            audit_size: Recent hits kept in memory for get_audit_log
+            audit_store: Durable hit log with record_answer_cache_hit(record) and
+                get_answer_cache_hits(patient_id, limit) (e.g. PatientManager)
+            clock: Monotonic time source (injectable for tests)
+        """
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_patient = max_entries_per_patient
+        self._clock = clock
+        self._indexes: Dict[str, _PatientIndex] = {}
+        self._audit: Deque[Dict[str, Any]] = deque(maxlen=audit_size)
+        self._audit_store = audit_store
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "hits": 0, "stores": 0, "invalidations": 0,
+                       "audit_failures": 0}
+
+    def _prune(self, patient_id: str, store_version: Any) -> Optional[_PatientIndex]:
+        """Drop expired entries and, if the patient's store changed, all entries (lock held)"""
+        index = self._indexes.get(patient_id)
+        if index is None:
+            return None
+        cutoff = self._clock() - self.ttl_seconds
+        rows = [i for i, entry in enumerate(index.entries)
+                if entry["created"] >= cutoff and entry["store_version"] == store_version]
+        if len(rows) < len(index.entries):
+            if any(entry["store_version"] != store_version for entry in index.entries):
+                self._stats["invalidations"] += 1
+            index.keep(rows)
+        if not index.entries:
+            del self._indexes[patient_id]
+            return None
+        return index
+
+    def lookup(self, patient_id: str, question: str, embedding, store_version: Any,
+               scope: Any = None) -> Optional[Dict[str, Any]]:
+        """
+        Find a reusable answer
+
+        Args:
+            patient_id: Patient the question belongs to
+            question: New question (recorded in the audit log on a hit)
+            embedding: Query embedding of the new question
+            store_version: Current version of the patient's vector store
+            scope: Extra match condition (e.g. the turn position); entries only
+                match within the same scope
+
+        Returns:
+            {"payload", "question", "similarity", "age_seconds"} or None
+        """
+        query = _unit(embedding)
+        with self._lock:
+            self._stats["lookups"] += 1
+            index = self._prune(patient_id, store_version)
+            if index is None or index.vectors.shape[1] != query.shape[0]:
+                return None
+
+            similarities = index.vectors @ query
+            best, best_similarity = None, self.threshold
+            for row, similarity in enumerate(similarities):
+                if index.entries[row]["scope"] == scope and similarity >= best_similarity:
+                    best, best_similarity = row, float(similarity)
+            if best is None:
+                return None
+
+            entry = index.entries[best]
+            hit = {
+                "payload": dict(entry["payload"]),
+                "question": entry["question"],
+                "similarity": round(best_similarity, 4),
+                "age_seconds": round(self._clock() - entry["created"], 1)
+            }
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "patient_id": patient_id,
+            "question": question,
+            "cached_question": hit["question"],
+            "similarity": hit["similarity"],
+            "age_seconds": hit["age_seconds"],
+            "store_version": store_version
+        }
+
+        # No reused clinical answer without an audit record
+        if self._audit_store is not None:
+            try:
+                self._audit_store.record_answer_cache_hit(record)
+            except Exception as e:
+                print(f"[ANSWER CACHE] Audit write failed, not reusing answer: {e}")
+                with self._lock:
+                    self._stats["audit_failures"] += 1
+                return None
+        with self._lock:
+            self._stats["hits"] += 1
+            self._audit.append(record)
+        return hit
+
+    def add(self, patient_id: str, question: str, embedding, store_version: Any,
+            payload: Dict[str, Any], scope: Any = None):
+        """
+        Cache an answer for later reuse
+
+        Args:
+            patient_id: Patient the answer belongs to
+            question: Question that produced it
+            embedding: Query embedding of the question
+            store_version: Version of the patient's vector store it was generated from
+            payload: Data returned to the caller on a hit (answer, context, ...)
+            scope: Match condition, see lookup
+        """
+        vector = _unit(embedding)
+        with self._lock:
+            index = self._prune(patient_id, store_version)
+            if index is None or index.vectors.shape[1] != vector.shape[0]:
+                index = self._indexes[patient_id] = _PatientIndex(vector.shape[0])
+            index.add(vector, {
+                "question": question,
+                "payload": dict(payload),
+                "store_version": store_version,
+                "scope": scope,
+                "created": self._clock()
+            })
+            if len(index.entries) > self.max_entries_per_patient:
+                index.keep(list(range(len(index.entries) - self.max_entries_per_patient, len(index.entries))))
+            self._stats["stores"] += 1
+
+    def invalidate(self, patient_id: str):
+        """Forget every cached answer for a patient"""
+        with self._lock:
+            if self._indexes.pop(patient_id, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def get_audit_log(self, patient_id: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Recent cache hits, newest first
+
+        Served from memory when the recent hits cover the request, otherwise read
+        from the audit store (older hits, or hits from before a restart).
+
+        Args:
+            patient_id: Only hits for this patient (default: all)
+            limit: Max records returned
+        """
+        with self._lock:
+            records = [dict(r) for r in reversed(self._audit)
+                       if patient_id is None or r["patient_id"] == patient_id]
+        if len(records) >= limit or self._audit_store is None:
+            return records[:limit]
+        return self._audit_store.get_answer_cache_hits(patient_id, limit=limit)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Report hit ratio and cache size
+
+        Returns:
+            dict with lookups, hits, hit_ratio, stores, invalidations, patients and entries
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["patients"] = len(self._indexes)
+            stats["entries"] = sum(len(index.entries) for index in self._indexes.values())
+        stats["hit_ratio"] = round(stats["hits"] / stats["lookups"], 4) if stats["lookups"] else 0.0
+        stats["threshold"] = self.threshold
+        stats["enabled"] = ANSWER_CACHE_ENABLED
+        return stats
+
+
+# Singleton instance
+_answer_cache: Optional[SemanticAnswerCache] = None
+_answer_cache_lock = threading.Lock()
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """Get or create singleton SemanticAnswerCache instance"""
+    global _answer_cache
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                from patient_manager import get_patient_manager
+                _answer_cache = SemanticAnswerCache(audit_store=get_patient_manager())
+    return _answer_cache
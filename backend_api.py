@@ -7,21 +7,27 @@ This is the headless backend service.
 The Streamlit app is a prototype for reference.
 """
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 import os
 import sys
+import json
+import time
 
 # Add parent directory to path to import existing modules
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # Import existing business logic (NOT UI code)
-from rag_engine import RAGEngine
+from rag_engine_pool import get_rag_engine_pool
 from patient_manager import get_patient_manager
+from chat_writer import get_chat_writer
+from pdf_extract import get_pdf_extractor
+from ingest_jobs import IngestJobError, get_ingest_queue
 from daily_questions import DailyQuestionGenerator
 from clinical_monitoring_prompts import (
     CLINICAL_MONITORING_SYSTEM_PROMPT,
@@ -34,6 +40,14 @@ from clinical_monitoring_prompts import (
     validate_answer_type
 )
 from report_upload_engine import get_upload_handler
+from embedding_registry import get_embedding_registry
+from shared_index import get_shared_index_service
+from llm_client import LLMError, get_llm_client, message_content
+from executors import ExecutorBusy, LockedSteps, get_executor_stats, run_cpu, run_io, shutdown_executors
+from latency_stats import get_latency_stats
+from risk_jobs import get_risk_job_store
+from answer_cache import get_answer_cache
+from context_assembler import get_context_assembler
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -73,6 +87,7 @@ class ChatQueryRequest(BaseModel):
     patient_id: str
     message: str
     vector_store_name: Optional[str] = "DefaultVectorDB"
+    use_cache: bool = True  # False forces a fresh answer (skips the semantic answer cache)
 
 class ChatQueryResponse(BaseModel):
     """Chat query response"""
@@ -82,6 +97,10 @@ class ChatQueryResponse(BaseModel):
     risk_level: str
     risk_reason: str
     source_documents: List[str]
+    sources: List[Dict[str, Any]] = []  # score + provenance for each retrieved chunk
+    risk_job_id: Optional[str] = None  # set when the risk result is delivered later (deferred mode)
+    cached: bool = False  # answer reused from a near-identical recent question
+    context_usage: Optional[Dict[str, Any]] = None  # context tokens used vs budget
     timestamp: str
 
 class PatientRegisterRequest(BaseModel):
@@ -175,13 +194,15 @@ class DailyQuestionRequest(BaseModel):
 # ============================================================================
 
 class ReportUploadResponse(BaseModel):
-    """Response for medical report upload"""
+    """Response for medical report upload (indexing continues as a background job)"""
     success: bool
     patient_id: str
     filename: str
     message: str
     chunks_count: int
     timestamp: str
+    job_id: Optional[str] = None
+    status: str = "queued"
 
 class ReportStatusResponse(BaseModel):
     """Check if patient has uploaded medical reports"""
@@ -189,6 +210,8 @@ class ReportStatusResponse(BaseModel):
     has_medical_report: bool
     status: str
     can_proceed_with_monitoring: bool
+    indexing: bool = False
+    active_job_ids: List[str] = []
 
 # ============================================================================
 # LOGIN MODELS
@@ -238,11 +261,12 @@ async def login(request: LoginRequest):
     # For patient role, ensure patient exists in database
     if user_info["role"] == "patient":
         pm = get_patient_manager()
-        patient = pm.get_patient(user_info["user_id"])
+        patient = await run_io(pm.get_patient, user_info["user_id"])
         if not patient:
             # Create patient if doesn't exist
             try:
-                pm.register_patient(
+                await run_io(
+                    pm.register_patient,
                     patient_id=user_info["user_id"],
                     name=f"Patient {username}",
                     email=f"{username}@hospital.local",
@@ -268,6 +292,30 @@ async def health_check():
         version="1.0.0"
     )
 
+def _collect_system_metrics() -> Dict[str, Any]:
+    """Gather every component's stats (blocking: several read SQLite)"""
+    return {
+        "embeddings": get_embedding_registry().get_stats(),
+        "rag_engine_pool": get_rag_engine_pool().get_stats(),
+        "shared_index": get_shared_index_service().get_stats(),
+        "llm": get_llm_client().get_stats(),
+        "executors": get_executor_stats(),
+        "latency": get_latency_stats().get_stats(),
+        "risk_jobs": get_risk_job_store().get_stats(),
+        "answer_cache": get_answer_cache().get_stats(),
+        "context": get_context_assembler().get_stats(),
+        "database": get_patient_manager().get_pool_stats(),
+        "chat_writer": get_chat_writer().get_stats(),
+        "pdf_extract": get_pdf_extractor().get_stats(),
+        "ingest_jobs": get_ingest_queue().get_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/api/system/metrics")
+async def get_system_metrics():
+    """Runtime metrics for shared in-process resources"""
+    return await run_io(_collect_system_metrics)
+
 # ============================================================================
 # PATIENT ENDPOINTS
 # ============================================================================
@@ -277,7 +325,8 @@ async def register_patient(request: PatientRegisterRequest):
     """Register a new patient"""
     try:
         pm = get_patient_manager()
-        result = pm.register_patient(
+        result = await run_io(
+            pm.register_patient,
             patient_id=request.patient_id,
             name=request.name,
             email=request.email,
@@ -302,14 +351,14 @@ async def get_patient(patient_id: str):
     """Get patient information"""
     try:
         pm = get_patient_manager()
-        patient = pm.get_patient(patient_id)
+        patient = await run_io(pm.get_patient, patient_id)
         
         if not patient:
             raise HTTPException(status_code=404, detail=f"Patient {patient_id} not found")
         
         return PatientInfo(**patient)
     
-    except HTTPException:
+    except (HTTPException, ExecutorBusy):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -319,7 +368,7 @@ async def list_all_patients():
     """List all registered patients"""
     try:
         pm = get_patient_manager()
-        patients = pm.get_all_patients()
+        patients = await run_io(pm.get_all_patients)
         return {
             "total": len(patients),
             "patients": patients
@@ -331,6 +380,51 @@ async def list_all_patients():
 # CHAT / RAG ENDPOINTS
 # ============================================================================
 
+async def _require_chat_ready(patient_id: str):
+    """
+    Chat preconditions: patient exists and a medical report has been indexed
+    
+    Raises:
+        HTTPException: 404 for unknown patients, 400 before a report upload
+    """
+    # Validate patient exists
+    pm = get_patient_manager()
+    patient = await run_io(pm.get_patient, patient_id)
+    if not patient:
+        raise HTTPException(status_code=404, detail=f"Patient {patient_id} not found")
+    
+    # CRITICAL GATING: Check if patient has uploaded medical reports
+    handler = get_upload_handler()
+    upload_status = await run_io(handler.get_upload_status, patient_id)
+    
+    if not upload_status["can_proceed_with_monitoring"]:
+        # Block chat - medical report upload is required
+        raise HTTPException(
+            status_code=400,
+            detail="Medical reports are required before chatbot interaction can begin. Please upload your medical reports first."
+        )
+
+
+# How often a chat turn re-checks a busy engine's turn lock
+TURN_LOCK_POLL_SECONDS = 0.02
+
+
+def _turn_steps(rag_engine) -> LockedSteps:
+    """
+    Steps of one chat turn under the engine's turn lock
+    
+    Pooled engines are shared by all requests for a patient, so a second chat
+    turn waits until the first has been finalized - including a prepare/generate/
+    finalize call still running on a worker after its request was cancelled.
+    """
+    return LockedSteps(rag_engine.turn_lock, poll_seconds=TURN_LOCK_POLL_SECONDS)
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @app.post("/api/chat/query", response_model=ChatQueryResponse)
 async def chat_query(request: ChatQueryRequest):
     """
@@ -345,33 +439,31 @@ async def chat_query(request: ChatQueryRequest):
     - Patient must upload report first via /api/patient/{patient_id}/upload-report
     """
     try:
-        # Validate patient exists
-        pm = get_patient_manager()
-        patient = pm.get_patient(request.patient_id)
-        if not patient:
-            raise HTTPException(status_code=404, detail=f"Patient {request.patient_id} not found")
-        
-        # CRITICAL GATING: Check if patient has uploaded medical reports
-        handler = get_upload_handler()
-        upload_status = handler.get_upload_status(request.patient_id)
-        
-        if not upload_status["can_proceed_with_monitoring"]:
-            # Block chat - medical report upload is required
-            raise HTTPException(
-                status_code=400,
-                detail="Medical reports are required before chatbot interaction can begin. Please upload your medical reports first."
-            )
+        start = time.perf_counter()
+        await _require_chat_ready(request.patient_id)
         
         # Medical report exists - proceed with RAG query
-        # Initialize RAG engine with dual vector store retrieval
-        rag_engine = RAGEngine(
-            patient_id=request.patient_id,
-            max_tokens=500,
-            temperature=0.7
-        )
+        # Reuse the patient's warm RAG engine (stores, model and history already loaded)
+        rag_engine = await run_cpu(get_rag_engine_pool().get, request.patient_id)
         
-        # Get response (retrieves from both shared and patient stores)
-        response = rag_engine.answer_question(request.message)
+        # Query embedding and vector search (both stores) are CPU work; the LLM
+        # round-trip and the history write wait on I/O
+        steps = _turn_steps(rag_engine)
+        await steps.acquire()
+        try:
+            turn = await steps.run("cpu", rag_engine.prepare_turn, request.message, use_cache=request.use_cache)
+            if "result" in turn:
+                response = turn["result"]
+            else:
+                answer = await steps.run("io", rag_engine.generate_answer, turn)
+                response = await steps.run("io", rag_engine.finalize_turn, request.message, answer, turn)
+        except ExecutorBusy:
+            raise
+        except Exception as e:
+            response = rag_engine.error_result(e)
+        finally:
+            steps.release()
+        get_latency_stats().record("chat_query.total", time.perf_counter() - start)
         
         return ChatQueryResponse(
             patient_id=request.patient_id,
@@ -380,31 +472,191 @@ async def chat_query(request: ChatQueryRequest):
             risk_level=response["risk_level"],
             risk_reason=response["risk_reason"],
             source_documents=response["source_documents"],
+            sources=response.get("sources", []),
+            risk_job_id=response.get("risk_job_id"),
+            cached=response.get("cached", False),
+            context_usage=response.get("context_usage"),
             timestamp=datetime.now().isoformat()
         )
     
-    except HTTPException:
+    except (HTTPException, ExecutorBusy):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatQueryRequest):
+    """
+    Streaming chat endpoint - same preconditions and result as /api/chat/query
+    
+    Server-Sent Events:
+    - sources: retrieved chunks with scores, sent before generation starts
+    - token:   {"text": ...} for every delta relayed from the LLM
+    - done:    final ChatQueryResponse fields (answer may differ from the streamed
+               text, e.g. the first-question acknowledgement) plus timings
+    - error:   {"message": ...} if retrieval or generation fails
+    
+    Risk parsing and the chat history write happen after the last token.
+    """
+    start = time.perf_counter()
+    await _require_chat_ready(request.patient_id)
+    
+    rag_engine = await run_cpu(get_rag_engine_pool().get, request.patient_id)
+    
+    async def event_stream():
+        def done_event(response: Dict[str, Any], first_token_seconds: Optional[float]) -> str:
+            total_seconds = time.perf_counter() - start
+            get_latency_stats().record("chat_stream.total", total_seconds)
+            return _sse_event("done", {
+                **jsonable_encoder(ChatQueryResponse(
+                    patient_id=request.patient_id,
+                    question=request.message,
+                    answer=response["answer"],
+                    risk_level=response["risk_level"],
+                    risk_reason=response["risk_reason"],
+                    source_documents=response["source_documents"],
+                    sources=response.get("sources", []),
+                    risk_job_id=response.get("risk_job_id"),
+                    cached=response.get("cached", False),
+                    context_usage=response.get("context_usage"),
+                    timestamp=datetime.now().isoformat()
+                )),
+                "time_to_first_token": first_token_seconds,
+                "total_seconds": round(total_seconds, 3)
+            })
+        
+        # The engine is shared per patient: hold its turn lock until the turn is
+        # finalized (released in finally, also when the client disconnects)
+        steps = _turn_steps(rag_engine)
+        await steps.acquire()
+        turn = None
+        finalizing = False
+        try:
+            turn = await steps.run("cpu", rag_engine.prepare_turn, request.message, use_cache=request.use_cache)
+            
+            # Turn ended without an LLM call (e.g. no sources available)
+            if "result" in turn:
+                yield done_event(turn["result"], None)
+                return
+            
+            yield _sse_event("sources", {"sources": turn["sources"]})
+            
+            # Semantic cache hit: the whole answer is already known
+            if turn["cached_answer"] is not None:
+                first_token_seconds = round(time.perf_counter() - start, 3)
+                yield _sse_event("token", {"text": turn["cached_answer"]})
+                finalizing = True
+                response = await steps.run("io", rag_engine.finalize_turn, request.message,
+                                           turn["cached_answer"], turn)
+                yield done_event(response, first_token_seconds)
+                return
+            
+            parts = []
+            first_token_seconds = None
+            try:
+                async for delta in get_llm_client().astream(
+                    messages=rag_engine.build_messages(turn),
+                    max_tokens=rag_engine.max_tokens,
+                    temperature=rag_engine.temperature,
+                    timeout=60
+                ):
+                    if first_token_seconds is None:
+                        first_token_seconds = round(time.perf_counter() - start, 3)
+                        get_latency_stats().record("chat_stream.ttft", first_token_seconds)
+                    parts.append(delta)
+                    yield _sse_event("token", {"text": delta})
+            except LLMError as e:
+                yield _sse_event("error", {"message": f"Error calling Groq API: {str(e)}"})
+                return
+            
+            finalizing = True
+            response = await steps.run("io", rag_engine.finalize_turn, request.message,
+                                       "".join(parts).strip(), turn)
+            yield done_event(response, first_token_seconds)
+        except Exception as e:
+            # Headers are already sent: report failures (retrieval, executor busy,
+            # finalize) as an SSE error instead of breaking the stream
+            yield _sse_event("error", {"message": f"Error generating answer: {str(e)}"})
+        finally:
+            # The answer never completed: don't pay for its concurrent risk call
+            if not finalizing and turn is not None and turn.get("risk_future") is not None:
+                turn["risk_future"].cancel()
+            steps.release()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/chat/risk/{job_id}")
+async def get_chat_risk(job_id: str, patient_id: Optional[str] = None):
+    """
+    Poll a deferred risk assessment (risk_job_id from a chat response)
+    
+    Returns:
+        job with status pending|complete|failed and, when complete, the result
+    """
+    job = get_risk_job_store().get(job_id)
+    if job is None or (patient_id is not None and job["patient_id"] != patient_id):
+        raise HTTPException(status_code=404, detail=f"Risk job {job_id} not found")
+    return job
+
+@app.get("/api/chat/answer-cache/audit")
+async def get_answer_cache_audit(patient_id: Optional[str] = None, limit: int = 50):
+    """
+    Audit log of semantic answer cache hits (which question reused which answer)
+    
+    Returns:
+        hits newest first, each with patient_id, question, cached_question, similarity and age
+    """
+    return {"hits": get_answer_cache().get_audit_log(patient_id, limit=limit)}
+
 @app.get("/api/chat/history/{patient_id}")
-async def get_chat_history(patient_id: str, limit: int = 50):
-    """Get chat history for patient"""
+async def get_chat_history(patient_id: str, limit: int = 50, cursor: Optional[str] = None,
+                           fields: Optional[str] = None):
+    """
+    Get chat history for patient, newest page first
+    
+    Args:
+        limit: Messages per page
+        cursor: next_cursor from the previous page (omit for the most recent page)
+        fields: Comma-separated columns to return (e.g. "question,risk_level");
+            omit for full messages
+    
+    Returns:
+        patient_id, total (messages in this page), history (chronological) and
+        next_cursor (None on the last page)
+    """
     try:
         pm = get_patient_manager()
-        patient = pm.get_patient(patient_id)
+        patient = await run_io(pm.get_patient, patient_id)
         if not patient:
             raise HTTPException(status_code=404, detail=f"Patient {patient_id} not found")
         
-        history = pm.get_patient_history(patient_id, limit=limit)
+        columns = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        if cursor is None:
+            await run_io(get_chat_writer().flush, 5)  # include turns still in the write-behind queue
         
-        return {
-            "patient_id": patient_id,
-            "total": len(history),
-            "history": [
+        def load_page():
+            page = pm.query_patient_history(patient_id, columns=columns,
+                                            limit=min(max(limit, 1), 500), cursor=cursor)
+            # Resolve source_documents here, on the I/O thread, not the event loop
+            for h in page["items"]:
+                if "source_documents" in h:
+                    h["source_documents"] = h["source_documents"].decode()
+            return page
+        
+        try:
+            page = await run_io(load_page)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        history = page["items"]
+        
+        if columns is None:
+            items = [
                 ChatHistoryResponse(
-                    id=i,
+                    id=h["id"],
                     question=h["question"],
                     answer=h["answer"],
                     risk_level=h["risk_level"],
@@ -412,11 +664,19 @@ async def get_chat_history(patient_id: str, limit: int = 50):
                     source_documents=h["source_documents"],
                     timestamp=h["timestamp"]
                 )
-                for i, h in enumerate(history)
+                for h in history
             ]
+        else:
+            items = history
+        
+        return {
+            "patient_id": patient_id,
+            "total": len(history),
+            "history": items,
+            "next_cursor": page["next_cursor"]
         }
     
-    except HTTPException:
+    except (HTTPException, ExecutorBusy):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -426,17 +686,21 @@ async def clear_chat_history(patient_id: str):
     """Clear chat history for patient (GDPR right to be forgotten)"""
     try:
         pm = get_patient_manager()
-        patient = pm.get_patient(patient_id)
+        patient = await run_io(pm.get_patient, patient_id)
         if not patient:
             raise HTTPException(status_code=404, detail=f"Patient {patient_id} not found")
         
-        success = pm.clear_patient_history(patient_id)
+        # Commit queued writes first so none land after the delete
+        await run_io(get_chat_writer().flush, 10)
+        success = await run_io(pm.clear_patient_history, patient_id)
         if success:
+            # Pooled engine still holds the old history in memory
+            get_rag_engine_pool().invalidate(patient_id)
             return {"success": True, "message": f"Chat history cleared for patient {patient_id}"}
         else:
             raise HTTPException(status_code=500, detail="Failed to clear history")
     
-    except HTTPException:
+    except (HTTPException, ExecutorBusy):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -450,15 +714,15 @@ async def get_risk_summary(patient_id: str, days: int = 30):
     """Get risk assessment summary for patient"""
     try:
         pm = get_patient_manager()
-        patient = pm.get_patient(patient_id)
+        patient = await run_io(pm.get_patient, patient_id)
         if not patient:
             raise HTTPException(status_code=404, detail=f"Patient {patient_id} not found")
         
-        summary = pm.get_patient_risk_summary(patient_id, days=days)
+        summary = await run_io(pm.get_patient_risk_summary, patient_id, days=days)
         
         return RiskSummary(**summary)
     
-    except HTTPException:
+    except (HTTPException, ExecutorBusy):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -481,13 +745,13 @@ async def generate_daily_question(patient_id: str):
     try:
         # Validate patient exists
         pm = get_patient_manager()
-        patient = pm.get_patient(patient_id)
+        patient = await run_io(pm.get_patient, patient_id)
         if not patient:
             raise HTTPException(status_code=404, detail=f"Patient {patient_id} not found")
         
         # Generate question
-        generator = DailyQuestionGenerator(patient_id)
-        question = generator.generate_daily_question()
+        generator = await run_io(DailyQuestionGenerator, patient_id)
+        question = await run_io(generator.generate_daily_question)
         
         return {
             "success": True,
@@ -495,7 +759,7 @@ async def generate_daily_question(patient_id: str):
             **question
         }
     
-    except HTTPException:
+    except (HTTPException, ExecutorBusy):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -509,13 +773,14 @@ async def save_daily_answer(patient_id: str, request: DailyQuestionRequest):
     try:
         # Validate patient exists
         pm = get_patient_manager()
-        patient = pm.get_patient(patient_id)
+        patient = await run_io(pm.get_patient, patient_id)
         if not patient:
             raise HTTPException(status_code=404, detail=f"Patient {patient_id} not found")
         
         # Save answer
-        generator = DailyQuestionGenerator(patient_id)
-        success = generator.save_daily_answer(
+        generator = await run_io(DailyQuestionGenerator, patient_id)
+        success = await run_io(
+            generator.save_daily_answer,
             question=request.question,
             answer=request.answer,
             question_metadata=request.question_metadata
@@ -531,7 +796,7 @@ async def save_daily_answer(patient_id: str, request: DailyQuestionRequest):
             "timestamp": datetime.now().isoformat()
         }
     
-    except HTTPException:
+    except (HTTPException, ExecutorBusy):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -545,13 +810,13 @@ async def get_daily_answers_history(patient_id: str, days: int = 7):
     try:
         # Validate patient exists
         pm = get_patient_manager()
-        patient = pm.get_patient(patient_id)
+        patient = await run_io(pm.get_patient, patient_id)
         if not patient:
             raise HTTPException(status_code=404, detail=f"Patient {patient_id} not found")
         
         # Get history
-        generator = DailyQuestionGenerator(patient_id)
-        history = generator.get_recent_daily_answers(days=days)
+        generator = await run_io(DailyQuestionGenerator, patient_id)
+        history = await run_io(generator.get_recent_daily_answers, days=days)
         
         return {
             "patient_id": patient_id,
@@ -560,7 +825,7 @@ async def get_daily_answers_history(patient_id: str, days: int = 7):
             "history": history
         }
     
-    except HTTPException:
+    except (HTTPException, ExecutorBusy):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -569,6 +834,102 @@ async def get_daily_answers_history(patient_id: str, days: int = 7):
 # DOCUMENT MANAGEMENT ENDPOINTS (PATIENT-SPECIFIC)
 # ============================================================================
 
+def _save_patient_documents(patient_id: str, uploads: List[tuple]) -> List[str]:
+    """
+    Save uploaded records to patient_records/{patient_id}/ (blocking)
+    
+    Args:
+        patient_id: Patient identifier
+        uploads: (filename, bytes) pairs
+    
+    Returns:
+        Saved filenames
+    """
+    patient_records_dir = f"patient_records/{patient_id}"
+    os.makedirs(patient_records_dir, exist_ok=True)
+    
+    saved_files = []
+    for filename, content in uploads:
+        file_path = os.path.join(patient_records_dir, filename)
+        with open(file_path, "wb") as f:
+            f.write(content)
+        saved_files.append(filename)
+    return saved_files
+
+
+def _run_documents_job(job: Dict[str, Any], progress) -> Dict[str, Any]:
+    """
+    Ingestion job: index saved patient records through the streaming ingest pipeline
+    
+    Args:
+        job: Job with payload {filenames, chunk_size, chunk_overlap}
+        progress: Job progress callback
+    
+    Returns:
+        Job result (files, chunks_created, vector_store, pipeline stats)
+    """
+    patient_id = job["patient_id"]
+    payload = job["payload"]
+    patient_records_dir = f"patient_records/{patient_id}"
+    handler = get_upload_handler()
+    
+    progress(stage="indexing")
+    try:
+        stats = handler.index_documents(
+            patient_id,
+            [(os.path.join(patient_records_dir, filename), filename) for filename in payload["filenames"]],
+            payload["chunk_size"], payload["chunk_overlap"],
+            on_progress=lambda p: progress(pages_done=p["pages"], pages_total=p["pages_total"],
+                                           chunks_done=p["chunks_indexed"]),
+            commit_tag=job["job_id"]
+        )
+    except ValueError as e:
+        raise IngestJobError(f"Text extraction failed: {str(e)}")
+    
+    return {
+        "message": f"Indexed {len(payload['filenames'])} medical record(s) for patient {patient_id}",
+        "files": payload["filenames"],
+        "chunks_created": stats["chunks_count"],
+        "vector_store": os.path.basename(handler.vector_manager.get_patient_store_path(patient_id)),
+        "pipeline": stats
+    }
+
+
+def _run_report_job(job: Dict[str, Any], progress) -> Dict[str, Any]:
+    """
+    Ingestion job: run an uploaded report through the streaming ingest pipeline
+    
+    Args:
+        job: Job with payload {file_path, filename}
+        progress: Job progress callback
+    
+    Returns:
+        Job result (chunks_count, message, pipeline stats)
+    """
+    payload = job["payload"]
+    progress(stage="indexing")
+    result = get_upload_handler().process_and_index_report(
+        job["patient_id"], payload["file_path"], payload["filename"],
+        on_progress=lambda p: progress(pages_done=p["pages"], pages_total=p["pages_total"],
+                                       chunks_done=p["chunks_indexed"]),
+        commit_tag=job["job_id"],
+        keep_file=True,  # a retry needs it; removed by _remove_report_upload
+        raise_errors=True  # unreadable file -> IngestJobError, anything else is retried
+    )
+    return {
+        "chunks_count": result["chunks_count"],
+        "message": result["message"],
+        "pipeline": result.get("pipeline")
+    }
+
+
+def _remove_report_upload(job: Dict[str, Any]):
+    """Delete a report job's uploaded file once the job is complete or failed for good"""
+    file_path = job["payload"]["file_path"]
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+
 @app.post("/api/documents/patient/{patient_id}/upload")
 async def upload_patient_documents(
     patient_id: str,
@@ -582,81 +943,52 @@ async def upload_patient_documents(
     
     Documents are:
     - Saved to: patient_records/{patient_id}/
-    - Embedded to: vector_store/patient_{patient_id}/
+    - Embedded to: vector_store/patient_{patient_id}/ by a background ingestion job
     - Private to this patient only
+    
+    Returns:
+        job_id to poll via GET /api/ingest/jobs/{job_id}
     """
     try:
-        import falcon
-        
         # Validate patient exists
         pm = get_patient_manager()
-        patient = pm.get_patient(patient_id)
+        patient = await run_io(pm.get_patient, patient_id)
         if not patient:
             raise HTTPException(status_code=404, detail=f"Patient {patient_id} not found")
         
         if not files:
             raise HTTPException(status_code=400, detail="No files provided")
         
-        # Create patient directories
-        patient_records_dir = f"patient_records/{patient_id}"
-        os.makedirs(patient_records_dir, exist_ok=True)
-        
-        # Process and save files
-        combined_content = ""
-        saved_files = []
-        
         for file in files:
-            # Save original file
-            file_path = os.path.join(patient_records_dir, file.filename)
-            with open(file_path, "wb") as f:
-                content = await file.read()
-                f.write(content)
-                saved_files.append(file.filename)
-            
-            # Extract text content
-            await file.seek(0)  # Reset file pointer
-            if file.filename.endswith(".pdf"):
-                combined_content += falcon.read_pdf(file.file)
-            elif file.filename.endswith(".txt"):
-                combined_content += falcon.read_txt(file.file)
-            else:
+            if not file.filename.endswith((".pdf", ".txt")):
                 raise HTTPException(
                     status_code=400,
                     detail=f"Unsupported file type: {file.filename}"
                 )
         
-        if not combined_content:
-            raise HTTPException(status_code=400, detail="No content extracted from files")
-        
-        # Chunk documents
-        split_docs = falcon.split_doc(combined_content, chunk_size, chunk_overlap)
-        
-        # Embed into patient-specific vector store
-        patient_vector_store = f"patient_{patient_id}"
+        uploads = [(file.filename, await file.read()) for file in files]
         
-        # Check if patient vector store already exists
-        patient_vs_path = f"vector store/{patient_vector_store}"
-        merge_with_existing = os.path.exists(patient_vs_path)
-        
-        falcon.embedding_storing(
-            split=split_docs,
-            create_new_vs=not merge_with_existing,
-            existing_vector_store="" if not merge_with_existing else patient_vector_store,
-            new_vs_name=patient_vector_store
-        )
+        # Save now; extract, chunk and embed in the ingestion job
+        saved_files = await run_io(_save_patient_documents, patient_id, uploads)
+        job_id = await run_io(get_ingest_queue().submit, "documents", patient_id, {
+            "filenames": saved_files,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap
+        })
         
         return {
             "success": True,
-            "message": f"Uploaded {len(files)} medical record(s) for patient {patient_id}",
+            "message": f"Uploaded {len(files)} medical record(s) for patient {patient_id}; indexing in background",
             "patient_id": patient_id,
             "files_saved": saved_files,
-            "chunks_created": len(split_docs),
-            "vector_store": patient_vector_store,
+            "job_id": job_id,
+            "status": "queued",
+            "vector_store": f"patient_{patient_id}",
             "uploader_role": uploader_role,
             "timestamp": datetime.now().isoformat()
         }
     
-    except HTTPException:
+    except (HTTPException, ExecutorBusy):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -670,7 +1002,7 @@ async def list_patient_documents(patient_id: str):
     try:
         # Validate patient exists
         pm = get_patient_manager()
-        patient = pm.get_patient(patient_id)
+        patient = await run_io(pm.get_patient, patient_id)
         if not patient:
             raise HTTPException(status_code=404, detail=f"Patient {patient_id} not found")
         
@@ -700,7 +1032,7 @@ async def list_patient_documents(patient_id: str):
             "total": len(files)
         }
     
-    except HTTPException:
+    except (HTTPException, ExecutorBusy):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -717,7 +1049,7 @@ async def delete_patient_document(patient_id: str, filename: str):
     try:
         # Validate patient exists
         pm = get_patient_manager()
-        patient = pm.get_patient(patient_id)
+        patient = await run_io(pm.get_patient, patient_id)
         if not patient:
             raise HTTPException(status_code=404, detail=f"Patient {patient_id} not found")
         
@@ -737,7 +1069,7 @@ async def delete_patient_document(patient_id: str, filename: str):
             "timestamp": datetime.now().isoformat()
         }
     
-    except HTTPException:
+    except (HTTPException, ExecutorBusy):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -768,13 +1100,13 @@ async def start_monitoring_session(request: MonitoringSessionStartRequest):
     try:
         # Validate patient exists
         pm = get_patient_manager()
-        patient = pm.get_patient(request.patient_id)
+        patient = await run_io(pm.get_patient, request.patient_id)
         if not patient:
             raise HTTPException(status_code=404, detail=f"Patient {request.patient_id} not found")
         
         # CRITICAL GATING: Check if patient has uploaded medical reports
         handler = get_upload_handler()
-        upload_status = handler.get_upload_status(request.patient_id)
+        upload_status = await run_io(handler.get_upload_status, request.patient_id)
         
         if not upload_status["can_proceed_with_monitoring"]:
             # Block monitoring session - medical report upload is required
@@ -807,7 +1139,7 @@ async def start_monitoring_session(request: MonitoringSessionStartRequest):
             "message": "Monitoring session started. Ready for first question."
         }
     
-    except HTTPException:
+    except (HTTPException, ExecutorBusy):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -837,21 +1169,18 @@ async def get_next_monitoring_question(session_id: str):
         
         # Get patient info
         pm = get_patient_manager()
-        patient = pm.get_patient(session["patient_id"])
+        patient = await run_io(pm.get_patient, session["patient_id"])
         patient_history = patient.get("medical_history", "No previous history")
         
         # Get RAG guidance
         try:
-            rag_engine = RAGEngine(patient_id=session["patient_id"])
-            guidance = rag_engine.retrieve_documents("neurological symptoms monitoring")
+            rag_engine = await run_cpu(get_rag_engine_pool().get, session["patient_id"])
+            guidance = await run_cpu(rag_engine.retrieve_documents, "neurological symptoms monitoring")
             retrieved_guidance = " ".join([doc.page_content for doc in guidance[:3]]) if guidance else ""
         except:
             retrieved_guidance = ""
         
         # Generate question using LLM
-        from groq import Groq
-        client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        
         question_prompt = create_question_generation_prompt(
             patient_history=patient_history,
             previous_answers=session["responses"],
@@ -860,17 +1189,21 @@ async def get_next_monitoring_question(session_id: str):
             retrieved_medical_guidance=retrieved_guidance
         )
         
-        response = client.chat.completions.create(
-            model="mixtral-8x7b-32768",
-            messages=[
-                {"role": "system", "content": CLINICAL_MONITORING_SYSTEM_PROMPT},
-                {"role": "user", "content": question_prompt}
-            ],
-            temperature=0.7,
-            max_tokens=300
-        )
+        try:
+            response = await get_llm_client().achat(
+                model="mixtral-8x7b-32768",
+                messages=[
+                    {"role": "system", "content": CLINICAL_MONITORING_SYSTEM_PROMPT},
+                    {"role": "user", "content": question_prompt}
+                ],
+                temperature=0.7,
+                max_tokens=300,
+                timeout=30
+            )
+        except LLMError as e:
+            raise HTTPException(status_code=502, detail=f"Error calling Groq API: {str(e)}")
         
-        response_text = response.choices[0].message.content
+        response_text = message_content(response)
         
         # Parse JSON response
         import json
@@ -893,7 +1226,7 @@ async def get_next_monitoring_question(session_id: str):
             total_expected=question_data["total_expected"]
         )
     
-    except HTTPException:
+    except (HTTPException, ExecutorBusy):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -941,7 +1274,7 @@ async def submit_monitoring_answer(session_id: str, request: MonitoringAnswerReq
             "message": "Answer recorded. Ready for next question."
         }
     
-    except HTTPException:
+    except (HTTPException, ExecutorBusy):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -959,38 +1292,39 @@ async def get_monitoring_assessment(session_id: str):
         
         # Get patient info
         pm = get_patient_manager()
-        patient = pm.get_patient(session["patient_id"])
+        patient = await run_io(pm.get_patient, session["patient_id"])
         patient_history = patient.get("medical_history", "No previous history")
         
         # Get RAG guidance
         try:
-            rag_engine = RAGEngine(patient_id=session["patient_id"])
-            guidance = rag_engine.retrieve_documents("neurological symptoms risk assessment")
+            rag_engine = await run_cpu(get_rag_engine_pool().get, session["patient_id"])
+            guidance = await run_cpu(rag_engine.retrieve_documents, "neurological symptoms risk assessment")
             retrieved_guidance = " ".join([doc.page_content for doc in guidance[:3]]) if guidance else ""
         except:
             retrieved_guidance = ""
         
         # Generate risk assessment using LLM
-        from groq import Groq
-        client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        
         assessment_prompt = create_risk_assessment_prompt(
             patient_history=patient_history,
             monitoring_responses=session["responses"],
             retrieved_medical_guidance=retrieved_guidance
         )
         
-        response = client.chat.completions.create(
-            model="mixtral-8x7b-32768",
-            messages=[
-                {"role": "system", "content": CLINICAL_MONITORING_SYSTEM_PROMPT},
-                {"role": "user", "content": assessment_prompt}
-            ],
-            temperature=0.5,
-            max_tokens=400
-        )
+        try:
+            response = await get_llm_client().achat(
+                model="mixtral-8x7b-32768",
+                messages=[
+                    {"role": "system", "content": CLINICAL_MONITORING_SYSTEM_PROMPT},
+                    {"role": "user", "content": assessment_prompt}
+                ],
+                temperature=0.5,
+                max_tokens=400,
+                timeout=30
+            )
+        except LLMError as e:
+            raise HTTPException(status_code=502, detail=f"Error calling Groq API: {str(e)}")
         
-        response_text = response.choices[0].message.content
+        response_text = message_content(response)
         
         # Parse assessment JSON
         import json
@@ -1007,7 +1341,8 @@ async def get_monitoring_assessment(session_id: str):
         session["completed_at"] = datetime.now().isoformat()
         
         # Store in patient history
-        pm.add_to_patient_history(
+        await run_io(
+            pm.add_to_patient_history,
             patient_id=session["patient_id"],
             question="Clinical Monitoring Session",
             answer=json.dumps(session["responses"]),
@@ -1026,7 +1361,7 @@ async def get_monitoring_assessment(session_id: str):
             timestamp=session["completed_at"]
         )
     
-    except HTTPException:
+    except (HTTPException, ExecutorBusy):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1052,7 +1387,7 @@ async def get_session_status(session_id: str):
             "assessment": session.get("assessment") if session["status"] == "complete" else None
         }
     
-    except HTTPException:
+    except (HTTPException, ExecutorBusy):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1085,7 +1420,8 @@ async def upload_medical_report(
     - Plain text (.txt)
     
     Returns:
-        ReportUploadResponse with success/chunks_count/message
+        ReportUploadResponse with job_id; poll GET /api/ingest/jobs/{job_id} for
+        progress (chunks_count is reported there once indexing commits)
     """
     try:
         print(f"[UPLOAD DEBUG] Patient ID: {patient_id}")
@@ -1095,7 +1431,7 @@ async def upload_medical_report(
         
         # Validate patient exists
         pm = get_patient_manager()
-        patient = pm.get_patient(patient_id)
+        patient = await run_io(pm.get_patient, patient_id)
         if not patient:
             print(f"[UPLOAD ERROR] Patient not found: {patient_id}")
             raise HTTPException(status_code=404, detail=f"Patient {patient_id} not found")
@@ -1111,7 +1447,7 @@ async def upload_medical_report(
         file_bytes = await file.read()
         print(f"[UPLOAD DEBUG] File bytes read: {len(file_bytes)}")
         
-        success, file_path = handler.save_uploaded_file(file_bytes, file.filename)
+        success, file_path = await run_io(handler.save_uploaded_file, file_bytes, file.filename)
         
         if not success:
             print(f"[UPLOAD ERROR] Failed to save file: {file_path}")
@@ -1119,26 +1455,26 @@ async def upload_medical_report(
         
         print(f"[UPLOAD DEBUG] File saved to: {file_path}")
         
-        # Process report: extract -> chunk -> embed -> store in vector DB
-        result = handler.process_and_index_report(patient_id, file_path, file.filename)
-        
-        if not result["success"]:
-            error_msg = result.get("message", "Unknown error during processing")
-            print(f"[UPLOAD ERROR] Processing failed: {error_msg}")
-            raise HTTPException(status_code=400, detail=error_msg)
+        # Process report in the background: extract -> chunk -> embed -> store in vector DB
+        job_id = await run_io(get_ingest_queue().submit, "report", patient_id, {
+            "file_path": file_path,
+            "filename": file.filename
+        })
         
-        print(f"[UPLOAD SUCCESS] Report processed: {result['chunks_count']} chunks")
+        print(f"[UPLOAD QUEUED] Report indexing job {job_id}")
         
         return ReportUploadResponse(
             success=True,
             patient_id=patient_id,
             filename=file.filename,
-            message=result["message"],
-            chunks_count=result["chunks_count"],
-            timestamp=result["timestamp"]
+            message="Report received; indexing in background",
+            chunks_count=0,
+            timestamp=datetime.utcnow().isoformat(),
+            job_id=job_id,
+            status="queued"
         )
     
-    except HTTPException:
+    except (HTTPException, ExecutorBusy):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Report upload failed: {str(e)}")
@@ -1163,27 +1499,54 @@ async def check_medical_report_status(patient_id: str):
     try:
         # Validate patient exists
         pm = get_patient_manager()
-        patient = pm.get_patient(patient_id)
+        patient = await run_io(pm.get_patient, patient_id)
         if not patient:
             raise HTTPException(status_code=404, detail=f"Patient {patient_id} not found")
         
         # Check if patient has vector store (reports uploaded)
         handler = get_upload_handler()
-        status = handler.get_upload_status(patient_id)
+        status = await run_io(handler.get_upload_status, patient_id)
         
         return ReportStatusResponse(
             patient_id=patient_id,
             has_medical_report=status["has_medical_report"],
             status=status["status"],
-            can_proceed_with_monitoring=status["can_proceed_with_monitoring"]
+            can_proceed_with_monitoring=status["can_proceed_with_monitoring"],
+            indexing=status["indexing"],
+            active_job_ids=status["active_job_ids"]
         )
     
-    except HTTPException:
+    except (HTTPException, ExecutorBusy):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Status check failed: {str(e)}")
 
 
+@app.get("/api/ingest/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    """
+    Progress of a background ingestion job
+    
+    Returns:
+        status (queued/running/complete/failed), stage, pages_done/pages_total,
+        chunks_done, progress (0-1), eta_seconds, attempts, error and result
+    """
+    job = await run_io(get_ingest_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job {job_id} not found")
+    job.pop("payload", None)  # server-side file paths
+    return job
+
+
+@app.get("/api/patient/{patient_id}/ingest/jobs")
+async def list_ingest_jobs(patient_id: str, limit: int = 20):
+    """A patient's recent ingestion jobs, newest first"""
+    jobs = await run_io(get_ingest_queue().list_jobs, patient_id, min(max(limit, 1), 100))
+    for job in jobs:
+        job.pop("payload", None)
+    return {"patient_id": patient_id, "jobs": jobs}
+
+
 @app.get("/")
 async def root():
     """Root endpoint with API documentation"""
@@ -1238,6 +1601,20 @@ async def http_exception_handler(request, exc):
         }
     )
 
+@app.exception_handler(ExecutorBusy)
+async def executor_busy_handler(request, exc):
+    """Shed load when a worker pool queue is full"""
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": "1"},
+        content={
+            "error": True,
+            "message": "Server is busy, please retry shortly",
+            "detail": str(exc),
+            "timestamp": datetime.now().isoformat()
+        }
+    )
+
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
     """Handle unexpected exceptions"""
@@ -1263,6 +1640,19 @@ async def startup_event():
         pm = get_patient_manager()
         print("[OK] Patient manager initialized")
         print("[OK] Database connection verified")
+        
+        # Background report ingestion; jobs interrupted by the last shutdown are retried
+        ingest_queue = get_ingest_queue()
+        ingest_queue.register("report", _run_report_job, on_finished=_remove_report_upload)
+        ingest_queue.register("documents", _run_documents_job)
+        ingest_queue.start()
+        print("[OK] Ingestion workers started")
+        
+        # Load the shared medical books index once, before the first chat
+        if get_shared_index_service().get() is not None:
+            print("[OK] Shared medical books index loaded")
+        else:
+            print("[WARN] Shared medical books index not available")
     except Exception as e:
         print(f"[ERROR] Startup failed: {e}")
         import traceback
@@ -1273,6 +1663,12 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown"""
     print("[SHUTDOWN] Medical Chatbot API shutting down...")
+    get_llm_client().close()
+    shutdown_executors(wait=False)
+    get_ingest_queue().close()  # a running job stays 'running' and is retried on next start
+    get_pdf_extractor().close()
+    get_chat_writer().close()  # flush write-behind chat messages before closing the database
+    get_patient_manager().close()
 
 # Run server directly when executed as script
 if __name__ == "__main__":
@@ -0,0 +1,134 @@
+"""
+Report Ingest Benchmark
+Peak memory and throughput of the previous sequential upload path (extract all ->
+clean -> chunk -> embed all -> write) vs the streaming IngestPipeline
+
+Usage:
+    python bench_ingest_pipeline.py [--pages 500] [--dim 384]
+
+Builds a synthetic --pages page PDF and indexes it both ways with a deterministic
+stand-in embedding model (so the numbers measure the pipeline, not the model).
+Peak memory is Python allocations tracked by tracemalloc.
+"""
+
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from langchain_text_splitters import CharacterTextSplitter
+
+from ingest_pipeline import IngestPipeline
+from mmap_vector_store import MmapVectorStore
+from pdf_extract import PdfExtractor
+
+
+class HashEmbeddings:
+    """Deterministic vectors derived from the text hash"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def embed_documents(self, texts):
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:4], "little")
+            vectors.append(np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32).tolist())
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class Processor:
+    """ReportProcessor's splitter and cleaning, without loading a model"""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50, separator="\n")
+
+    def clean_text(self, text):
+        lines = [line.strip() for line in text.split('\n') if line.strip()]
+        return '\n'.join(lines)
+
+
+def make_report(path: str, pages: int):
+    """PDF with ~40 lines of lab results per page"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        lines = " ".join(f"({f'Page {page} result {i}: hemoglobin {12 + i % 4}.{i % 10} g/dL, '}"
+                         f"{f'glucose {80 + (page + i) % 60} mg/dL'}) Tj 0 -14 Td"
+                         for i in range(40))
+        stream = f"BT /F1 9 Tf 40 760 Td {lines} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def sequential(processor, pdf_path: str, store_path: str) -> int:
+    """The previous ReportUploadHandler path, stage by stage"""
+    text = PdfExtractor(max_workers=1).extract_text(pdf_path, separator="\n")
+    chunks = [c for c in processor.splitter.split_text(processor.clean_text(text)) if len(c.strip()) > 50]
+    vectors = processor.embeddings.embed_documents(chunks)
+    metadatas = [{"patient_id": "P001", "chunk_index": i} for i in range(len(chunks))]
+    MmapVectorStore.create(store_path, processor.embeddings, vectors, chunks, metadatas)
+    return len(chunks)
+
+
+def measure(name: str, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<11} {chunks:6d} chunks  {elapsed:7.2f}s  {chunks / elapsed:8.1f} chunks/s  "
+          f"peak {peak / 2**20:7.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    processor = Processor(HashEmbeddings(args.dim))
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "report.pdf")
+        make_report(pdf_path, args.pages)
+        print(f"{args.pages} pages, {os.path.getsize(pdf_path) / 2**20:.1f} MiB PDF, dim {args.dim}\n")
+
+        measure("sequential", lambda: sequential(processor, pdf_path, os.path.join(tmp, "seq")))
+        results = {}
+
+        def streaming():
+            results.update(IngestPipeline(processor).run("P001", pdf_path, os.path.join(tmp, "stream")))
+            return results["chunks_count"]
+
+        measure("streaming", streaming)
+        print()
+        for stage, stats in results["stages"].items():
+            print(f"  {stage:<8} {stats['items']:6d} items  {stats['busy_seconds']:7.2f}s busy  "
+                  f"{stats['items_per_second'] or 0:9.1f}/s")
+
+
+if __name__ == "__main__":
+    main()
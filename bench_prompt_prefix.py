@@ -0,0 +1,155 @@
+"""
+Prompt Prefix Benchmark
+Compares the legacy single user-message chat prompt with the split
+system prompt + per-turn slots layout (chat_prompts.py)
+
+Reports per turn: request bytes on the wire, estimated prompt tokens, the
+prefix shared with the previous turn's request (what provider-side prefix
+caching can reuse) and prompt build time.
+
+Usage:
+    python bench_prompt_prefix.py [--turns 6] [--live]
+
+--live also sends both layouts to the LLM and prints the reported usage
+(prompt_tokens and, where the provider returns it, cached_tokens).
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Dict, List
+
+from chat_prompts import CHAT_SYSTEM_PROMPT, create_chat_messages, create_chat_turn_prompt
+from context_assembler import ANSWER_CONTEXT_TOKENS, ContextAssembler, estimate_tokens
+
+MODEL = "llama-3.3-70b-versatile"
+MAX_QUESTIONS = 6
+
+QUESTION_RULE = '- Question number: given as "Question number: N/6" at the top of each message'
+CONTEXT_NOTE = "The patient's retrieved medical context and recent conversation follow in the user message.\n\n"
+CLOSING_PARAGRAPH = "If reports are missing:"
+
+SAMPLE_CHUNKS = [
+    "Sudden weakness or numbness of the face, arm or leg, especially on one side of the body, "
+    "is a warning sign of stroke and requires emergency evaluation.",
+    "Post-stroke headaches are common in the first weeks after discharge. Severe or sudden "
+    "headache with vomiting or confusion should be reported immediately.",
+    "Dizziness and balance problems can follow cerebellar infarcts. Patients should avoid "
+    "driving until cleared and use support when walking.",
+    "Antiplatelet therapy must be continued as prescribed. Missing doses increases the risk "
+    "of recurrent ischaemic events.",
+    "Discharge summary: left MCA ischaemic stroke, mild right-sided weakness, hypertension, "
+    "on aspirin 75 mg and atorvastatin 40 mg.",
+    "Seizures occur in a minority of stroke survivors, most often within the first year. "
+    "Any seizure after discharge should be assessed by a neurologist.",
+]
+
+SAMPLE_EXCHANGES = [
+    ("I feel okay today", "Do you have any headache today? (YES/NO)"),
+    ("Yes, a mild one", "How strong is the headache from 0 to 10?"),
+    ("About 3", "Do you feel dizzy or unsteady when walking? (YES/NO)"),
+    ("No", "Have you taken all your prescribed medicines today? (YES/NO)"),
+    ("Yes", "Any new weakness or numbness in your face, arm or leg? (YES/NO)"),
+]
+
+
+def legacy_messages(question_number: int, context: str, history: str) -> List[Dict[str, str]]:
+    """The pre-split layout: one user message with the slots embedded in the instructions"""
+    instructions = CHAT_SYSTEM_PROMPT.replace(
+        QUESTION_RULE, f"- Question number: {question_number}/{MAX_QUESTIONS}"
+    ).replace(CONTEXT_NOTE, "")
+    head, tail = instructions.split(CLOSING_PARAGRAPH, 1)
+    history_block = f"\n\nPrevious conversation:\n{history}\n\n" if history else ""
+    prompt = f"{head}Retrieved medical context:\n{context}\n\n{history_block}\n\n{CLOSING_PARAGRAPH}{tail}"
+    return [{"role": "user", "content": prompt}]
+
+
+def split_messages(question_number: int, context: str, history: str) -> List[Dict[str, str]]:
+    return create_chat_messages(create_chat_turn_prompt(question_number, MAX_QUESTIONS, context, history))
+
+
+def request_body(messages: List[Dict[str, str]]) -> str:
+    return json.dumps({"model": MODEL, "messages": messages, "max_tokens": 500, "temperature": 0.7})
+
+
+def shared_prefix(a: str, b: str) -> str:
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return a[:i]
+
+
+def build_turns(turns: int):
+    """(question_number, context, history) per simulated turn"""
+    assembler = ContextAssembler()
+    inputs = []
+    for turn in range(turns):
+        chunks = SAMPLE_CHUNKS[turn % len(SAMPLE_CHUNKS):] + SAMPLE_CHUNKS[:turn % len(SAMPLE_CHUNKS)]
+        context = assembler.assemble(chunks, ANSWER_CONTEXT_TOKENS)["context"]
+        exchanges = SAMPLE_EXCHANGES[:turn][-2:]
+        history = "\n".join(f"User: {q}\nAssistant: {a}" for q, a in exchanges)
+        inputs.append((turn + 1, context, history))
+    return inputs
+
+
+def measure(name: str, builder, inputs, repeat: int = 2000) -> Dict[str, float]:
+    bodies = [request_body(builder(*args)) for args in inputs]
+    prompt_tokens = [sum(estimate_tokens(m["content"]) for m in builder(*args)) for args in inputs]
+    prefixes = [estimate_tokens(shared_prefix(prev, cur)) for prev, cur in zip(bodies, bodies[1:])]
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for args in inputs:
+            builder(*args)
+    build_us = (time.perf_counter() - start) / (repeat * len(inputs)) * 1e6
+
+    result = {
+        "bytes_per_turn": sum(len(b.encode("utf-8")) for b in bodies) / len(bodies),
+        "prompt_tokens_per_turn": sum(prompt_tokens) / len(prompt_tokens),
+        "shared_prefix_tokens": sum(prefixes) / len(prefixes) if prefixes else 0.0,
+        "build_us": build_us
+    }
+    print(f"{name:<8} bytes/turn={result['bytes_per_turn']:8.0f}  "
+          f"prompt_tokens/turn={result['prompt_tokens_per_turn']:6.0f}  "
+          f"prefix_reusable={result['shared_prefix_tokens']:6.0f} tok  "
+          f"build={result['build_us']:6.2f} µs")
+    return result
+
+
+def live(inputs):
+    from llm_client import get_llm_client
+
+    client = get_llm_client()
+    for name, builder in (("legacy", legacy_messages), ("split", split_messages)):
+        for args in inputs[:3]:
+            data = client.chat(builder(*args), model=MODEL, max_tokens=20, temperature=0.0)
+            usage = data.get("usage") or {}
+            cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+            print(f"[live] {name:<6} turn {args[0]}: prompt_tokens={usage.get('prompt_tokens')} "
+                  f"cached_tokens={cached}")
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=MAX_QUESTIONS)
+    parser.add_argument("--live", action="store_true", help="also send requests and print reported usage")
+    args = parser.parse_args()
+
+    inputs = build_turns(args.turns)
+    print(f"{args.turns} turns, system prompt {estimate_tokens(CHAT_SYSTEM_PROMPT)} tokens (estimated)\n")
+    before = measure("legacy", legacy_messages, inputs)
+    after = measure("split", split_messages, inputs)
+    print(f"\nreusable prefix: {before['shared_prefix_tokens']:.0f} -> {after['shared_prefix_tokens']:.0f} tokens/turn; "
+          f"bytes on the wire: {after['bytes_per_turn'] - before['bytes_per_turn']:+.0f}/turn")
+
+    if args.live:
+        if not os.getenv("GROQ_API_KEY"):
+            raise SystemExit("--live needs GROQ_API_KEY")
+        live(inputs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Source Document Storage Benchmark
+Database size of a synthetic chat history with per-row source_documents JSON
+(previous layout) vs the deduplicated source_chunks table (schema version 3)
+
+Usage:
+    python bench_source_dedup.py [--messages 100000] [--chunks 3000]
+
+Builds a version-0 patient_data.db in which every message stores six 500-character
+chunks drawn from a shared pool of --chunks book chunks, then opens it with
+PatientManager, which migrates and compacts it in place. Reports file size before
+and after, the migration time and a history page read.
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from patient_manager import PatientManager
+
+PATIENTS = 50
+CHUNKS_PER_MESSAGE = 6
+CHUNK_CHARS = 500
+
+LEGACY_SCHEMA = [
+    '''CREATE TABLE patients (
+        patient_id TEXT PRIMARY KEY, name TEXT NOT NULL, email TEXT UNIQUE, age INTEGER,
+        medical_history TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+    '''CREATE TABLE chat_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, patient_id TEXT NOT NULL, question TEXT NOT NULL,
+        answer TEXT NOT NULL, risk_level TEXT, risk_reason TEXT, source_documents TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+]
+
+
+def make_chunk(rng: random.Random, index: int) -> str:
+    words = [f"w{rng.randrange(5000)}" for _ in range(CHUNK_CHARS // 5)]
+    return f"[chunk {index}] " + " ".join(words)[:CHUNK_CHARS]
+
+
+def build_legacy_db(path: str, messages: int, chunk_pool: int):
+    rng = random.Random(0)
+    chunks = [make_chunk(rng, i) for i in range(chunk_pool)]
+    conn = sqlite3.connect(path)
+    for statement in LEGACY_SCHEMA:
+        conn.execute(statement)
+    conn.executemany("INSERT INTO patients (patient_id, name) VALUES (?, ?)",
+                     [(f"P{i:03d}", f"Patient {i}") for i in range(PATIENTS)])
+
+    def rows():
+        for n in range(messages):
+            yield (f"P{n % PATIENTS:03d}", f"question {n}", f"answer {n} " * 20, "LOW", "stable",
+                   json.dumps(rng.sample(chunks, CHUNKS_PER_MESSAGE)))
+
+    conn.executemany(
+        "INSERT INTO chat_history (patient_id, question, answer, risk_level, risk_reason, source_documents) "
+        "VALUES (?, ?, ?, ?, ?, ?)", rows()
+    )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--chunks", type=int, default=3000, help="shared chunk pool size")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "patient_data.db")
+        build_legacy_db(path, args.messages, args.chunks)
+        before = os.path.getsize(path)
+
+        start = time.perf_counter()
+        pm = PatientManager(db_path=path)
+        migrate_seconds = time.perf_counter() - start
+        pm._pool.connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        after = os.path.getsize(path)
+
+        start = time.perf_counter()
+        page = pm.query_patient_history("P007", limit=50)
+        documents = sum(len(item["source_documents"]) for item in page["items"])
+        read_ms = (time.perf_counter() - start) * 1000
+        pm.close()
+
+    print(f"messages       {args.messages:,} ({CHUNKS_PER_MESSAGE} x {CHUNK_CHARS}-char chunks, "
+          f"pool of {args.chunks:,})")
+    print(f"JSON per row   {before / 2**20:9.1f} MiB")
+    print(f"deduplicated   {after / 2**20:9.1f} MiB  ({before / after:.1f}x smaller)")
+    print(f"migration      {migrate_seconds:9.2f} s")
+    print(f"history page   {read_ms:9.2f} ms  (50 messages, {documents} documents resolved)")
+
+
+if __name__ == "__main__":
+    main()
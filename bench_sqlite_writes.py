@@ -0,0 +1,108 @@
+"""
+SQLite Write Benchmark
+Concurrent chat-message writes: connect-per-call (previous PatientManager behaviour)
+vs the pooled WAL connections used by PatientManager now
+
+Usage:
+    python bench_sqlite_writes.py [--threads 8] [--writes 200]
+
+Each thread inserts --writes chat messages. Reports writes/sec and how many
+writes failed with "database is locked".
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from patient_manager import PatientManager
+
+PATIENTS = 4
+SOURCE_DOCUMENTS = ["Sudden weakness or numbness of the face, arm or leg is a stroke warning sign."] * 6
+
+
+def legacy_insert(db_path: str, patient_id: str, question: str) -> bool:
+    """Previous insert_chat_message: get_patient on one connection, insert on another"""
+    conn = sqlite3.connect(db_path)
+    row = conn.execute("SELECT * FROM patients WHERE patient_id = ?", (patient_id,)).fetchone()
+    conn.close()
+    if not row:
+        return False
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO chat_history
+            (patient_id, question, answer, risk_level, risk_reason, source_documents)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (patient_id, question, "answer", "LOW", "stable", json.dumps(SOURCE_DOCUMENTS)))
+        cursor.execute("UPDATE patients SET last_accessed = CURRENT_TIMESTAMP WHERE patient_id = ?",
+                       (patient_id,))
+        conn.commit()
+        conn.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def run(name: str, insert, threads: int, writes: int):
+    failures = []
+    lock = threading.Lock()
+
+    def worker(index: int):
+        patient_id = f"P{index % PATIENTS}"
+        failed = 0
+        for n in range(writes):
+            if not insert(patient_id, f"question {index}-{n}"):
+                failed += 1
+        with lock:
+            failures.append(failed)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = threads * writes
+    failed = sum(failures)
+    print(f"{name:<8} {total - failed:6d} ok  {failed:5d} locked  "
+          f"{(total - failed) / elapsed:9.0f} writes/s  ({elapsed:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=200, help="writes per thread")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Legacy: rollback journal, default synchronous, 5s connect timeout, no pool
+        legacy_path = os.path.join(tmp, "legacy.db")
+        pm = PatientManager(db_path=legacy_path)
+        for i in range(PATIENTS):
+            pm.register_patient(f"P{i}", f"Patient {i}")
+        pm.close()
+        conn = sqlite3.connect(legacy_path)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+        run("legacy", lambda patient_id, q: legacy_insert(legacy_path, patient_id, q),
+            args.threads, args.writes)
+
+        pooled = PatientManager(db_path=os.path.join(tmp, "pooled.db"))
+        for i in range(PATIENTS):
+            pooled.register_patient(f"P{i}", f"Patient {i}")
+        run("pooled", lambda patient_id, q: pooled.insert_chat_message(
+            patient_id, q, "answer", "LOW", "stable", SOURCE_DOCUMENTS) is not None,
+            args.threads, args.writes)
+        print(f"\npool: {pooled.get_pool_stats()}")
+        pooled.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Chat Write-Behind Queue
+Batches chat_history inserts off the request path
+
+RAGEngine submits each saved turn here instead of writing it synchronously. A
+background writer groups queued messages into one transaction (one INSERT per
+message, one last_accessed UPDATE per patient) every CHAT_WRITE_FLUSH_MS or once
+CHAT_WRITE_MAX_BATCH messages are waiting. submit() returns a Future resolving to
+the chat_history id once the batch is committed.
+
+Durability trade-off: a message is acknowledged before it is committed, so a hard
+crash can lose up to one flush interval of messages. Set CHAT_WRITE_BEHIND=false to
+write synchronously; close() (called from the API shutdown hook) flushes the queue.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from patient_manager import PatientManager, get_patient_manager
+
+WRITE_BEHIND_ENABLED = os.getenv("CHAT_WRITE_BEHIND", "true").lower() == "true"
+DEFAULT_FLUSH_INTERVAL_SECONDS = float(os.getenv("CHAT_WRITE_FLUSH_MS", "50")) / 1000
+DEFAULT_MAX_BATCH = int(os.getenv("CHAT_WRITE_MAX_BATCH", "64"))
+
+_WRITE = "write"
+_FLUSH = "flush"
+_STOP = "stop"
+
+
+class ChatWriteQueue:
+    """
+    Single background writer that commits queued chat messages in batches
+    """
+
+    def __init__(self, patient_manager: Optional[PatientManager] = None,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL_SECONDS,
+                 max_batch: int = DEFAULT_MAX_BATCH,
+                 enabled: bool = WRITE_BEHIND_ENABLED):
+        """
+        Args:
+            patient_manager: Database to write to (defaults to the shared PatientManager)
+            flush_interval: Max seconds a message waits for more to batch with
+            max_batch: Messages committed per transaction at most
+            enabled: False writes synchronously in submit()
+        """
+        self._patient_manager = patient_manager
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.enabled = enabled
+        self._queue: "queue.Queue[Tuple[str, Any, Any]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "written": 0,
+            "failed": 0,
+            "batches": 0,
+            "max_batch_size": 0,
+            "write_seconds": 0.0
+        }
+
+    @property
+    def patient_manager(self) -> PatientManager:
+        if self._patient_manager is None:
+            self._patient_manager = get_patient_manager()
+        return self._patient_manager
+
+    def submit(self, patient_id: str, question: str, answer: str, risk_level: str,
+               risk_reason: str, source_documents: Optional[List[str]] = None) -> Future:
+        """
+        Queue a chat message for the next batch
+
+        Returns:
+            Future resolving to the chat_history id (None if the patient does not exist
+            or the write failed)
+        """
+        message = {
+            "patient_id": patient_id,
+            "question": question,
+            "answer": answer,
+            "risk_level": risk_level,
+            "risk_reason": risk_reason,
+            "source_documents": source_documents
+        }
+        future: Future = Future()
+        with self._lock:
+            self._stats["submitted"] += 1
+            queued = self.enabled and not self._closed
+            if queued:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="chat-writer", daemon=True)
+                    self._thread.start()
+                self._queue.put((_WRITE, message, future))
+        if not queued:
+            self._write([(message, future)])
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Commit everything queued so far
+
+        Returns:
+            True if the queue was flushed within the timeout
+        """
+        if self._thread is None or self._closed:
+            return True  # nothing queued: submits are written synchronously
+        done = threading.Event()
+        self._queue.put((_FLUSH, done, None))
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """Flush pending messages and stop the writer (later submits write synchronously)"""
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+            if thread is not None:
+                self._queue.put((_STOP, None, None))  # queued after every accepted message
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            kind, payload, future = self._queue.get()
+            batch: List[Tuple[Dict[str, Any], Future]] = []
+            signals: List[threading.Event] = []
+            stop = False
+            if kind == _WRITE:
+                batch.append((payload, future))
+            elif kind == _FLUSH:
+                signals.append(payload)
+            else:
+                stop = True
+
+            # Gather more messages until the interval elapses or the batch is full
+            deadline = time.monotonic() + self.flush_interval
+            while batch and not stop and not signals and len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    kind, payload, future = (self._queue.get(timeout=remaining) if remaining > 0
+                                             else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+                if kind == _WRITE:
+                    batch.append((payload, future))
+                elif kind == _FLUSH:
+                    signals.append(payload)
+                else:
+                    stop = True
+
+            if stop or signals:
+                # Drain whatever is already queued so flush/close cover it
+                while True:
+                    try:
+                        kind, payload, future = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if kind == _WRITE:
+                        batch.append((payload, future))
+                    elif kind == _FLUSH:
+                        signals.append(payload)
+                    else:
+                        stop = True
+
+            for start in range(0, len(batch), self.max_batch):
+                self._write(batch[start:start + self.max_batch])
+            for signal in signals:
+                signal.set()
+            if stop:
+                return
+
+    def _write(self, batch: List[Tuple[Dict[str, Any], Future]]):
+        """Commit one batch and resolve its futures"""
+        start = time.perf_counter()
+        try:
+            ids = self.patient_manager.insert_chat_messages([message for message, _ in batch])
+        except Exception as e:
+            print(f"[CHAT_WRITER] Batch of {len(batch)} failed: {e}")
+            ids = [None] * len(batch)
+        written = sum(1 for message_id in ids if message_id is not None)
+        with self._lock:
+            self._stats["written"] += written
+            self._stats["failed"] += len(batch) - written
+            self._stats["batches"] += 1
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+            self._stats["write_seconds"] += time.perf_counter() - start
+        for (_, future), message_id in zip(batch, ids):
+            future.set_result(message_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Report queue depth and batching efficiency
+
+        Returns:
+            dict with submitted, written, failed, batches, pending, avg_batch_size,
+            max_batch_size and avg_batch_seconds
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        write_seconds = stats.pop("write_seconds")
+        batches = stats["batches"]
+        stats["pending"] = self._queue.qsize()
+        stats["avg_batch_size"] = round((stats["written"] + stats["failed"]) / batches, 2) if batches else 0.0
+        stats["avg_batch_seconds"] = round(write_seconds / batches, 4) if batches else None
+        stats["enabled"] = self.enabled
+        stats["flush_interval_ms"] = round(self.flush_interval * 1000, 1)
+        stats["max_batch"] = self.max_batch
+        return stats
+
+
+# Singleton instance
+_chat_writer: Optional[ChatWriteQueue] = None
+_chat_writer_lock = threading.Lock()
+
+def get_chat_writer() -> ChatWriteQueue:
+    """Get or create singleton ChatWriteQueue instance"""
+    global _chat_writer
+    if _chat_writer is None:
+        with _chat_writer_lock:
+            if _chat_writer is None:
+                _chat_writer = ChatWriteQueue()
+    return _chat_writer
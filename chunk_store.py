@@ -0,0 +1,277 @@
+"""
+Columnar Chunk Store
+Compact, pickle-free replacement for LangChain's InMemoryDocstore
+
+Chunk text lives in one UTF-8 buffer with an end-offset table, and the metadata
+fields we actually use are stored as typed columns:
+
+    chunks.txt           UTF-8 chunk text, concatenated
+    chunks.off           uint64 end offset of each chunk
+    col_source_file.u32  dictionary code into chunk_dicts.json["source_file"]
+    col_patient_id.u32   dictionary code into chunk_dicts.json["patient_id"]
+    col_extra.u32        dictionary code into chunk_dicts.json["extra"] (other keys as JSON)
+    col_chunk_index.i32  chunk_index (INT32_MIN = missing)
+    col_timestamp.i64    naive ISO timestamp as microseconds since epoch (INT64_MIN = missing)
+    chunk_dicts.json     append-only dictionaries for the coded columns
+
+Rows are addressed by position (the FAISS row id). Documents are only built for
+rows that are actually returned by a search.
+"""
+
+import json
+import mmap
+import os
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+TEXT_FILE = "chunks.txt"
+TEXT_OFFSETS_FILE = "chunks.off"
+DICTS_FILE = "chunk_dicts.json"
+
+# Coded (dictionary-encoded) columns: name -> (file name, array typecode)
+_CODED_COLUMNS = {
+    "source_file": ("col_source_file.u32", "I"),
+    "patient_id": ("col_patient_id.u32", "I"),
+    "extra": ("col_extra.u32", "I"),
+}
+_CHUNK_INDEX_FILE = ("col_chunk_index.i32", "i")
+_TIMESTAMP_FILE = ("col_timestamp.i64", "q")
+
+INT32_MISSING = -2 ** 31
+INT64_MISSING = -2 ** 63
+_EPOCH = datetime(1970, 1, 1)
+
+CHUNK_FILES = [TEXT_FILE, TEXT_OFFSETS_FILE, DICTS_FILE, _CHUNK_INDEX_FILE[0], _TIMESTAMP_FILE[0]] + \
+    [name for name, _ in _CODED_COLUMNS.values()]
+
+
+def _encode_timestamp(value: Any) -> Optional[int]:
+    """Naive ISO timestamp -> epoch microseconds, or None if it would not round-trip"""
+    if not isinstance(value, str):
+        return None
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if dt.tzinfo is not None or dt.isoformat() != value:
+        return None
+    return (dt - _EPOCH) // timedelta(microseconds=1)
+
+
+def _decode_timestamp(value: int) -> str:
+    return (_EPOCH + timedelta(microseconds=value)).isoformat()
+
+
+def _split_metadata(metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Split a metadata dict into column values
+
+    Returns:
+        dict with source_file, patient_id, chunk_index, timestamp and extra
+        (extra holds every key that does not fit a typed column, as JSON)
+    """
+    remaining = dict(metadata or {})
+    columns = {"source_file": None, "patient_id": None, "chunk_index": INT32_MISSING,
+               "timestamp": INT64_MISSING, "extra": None}
+
+    for key in ("source_file", "patient_id"):
+        if isinstance(remaining.get(key), str):
+            columns[key] = remaining.pop(key)
+
+    chunk_index = remaining.get("chunk_index")
+    if isinstance(chunk_index, int) and not isinstance(chunk_index, bool) \
+            and INT32_MISSING < chunk_index < 2 ** 31:
+        columns["chunk_index"] = remaining.pop("chunk_index")
+
+    micros = _encode_timestamp(remaining.get("timestamp"))
+    if micros is not None and micros != INT64_MISSING:
+        columns["timestamp"] = micros
+        remaining.pop("timestamp")
+
+    if remaining:
+        columns["extra"] = json.dumps(remaining, sort_keys=True, separators=(",", ":"), default=str)
+    return columns
+
+
+def _map_file(path: str, length: int):
+    """Read-only mmap of the first `length` bytes (empty bytes if length is 0)"""
+    if length == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ)
+
+
+def _map_column(path: str, typecode: str, count: int):
+    """Zero-copy typed view of the first `count` items of a column file"""
+    if count == 0:
+        return array(typecode)
+    itemsize = array(typecode).itemsize
+    return memoryview(_map_file(path, count * itemsize)).cast(typecode)
+
+
+class ChunkStore:
+    """
+    Read-only view of the chunks in a store directory
+
+    Opening maps the files; nothing is decoded until a row is requested.
+    """
+
+    __slots__ = ("path", "count", "_text", "_text_end", "_coded", "_chunk_index",
+                 "_timestamp", "_dicts")
+
+    def __init__(self, path: str, count: int, text_bytes: int):
+        """
+        Args:
+            path: Store directory
+            count: Number of committed rows (from the owning manifest)
+            text_bytes: Committed length of chunks.txt
+        """
+        self.path = path
+        self.count = count
+        self._text = _map_file(os.path.join(path, TEXT_FILE), text_bytes)
+        self._text_end = _map_column(os.path.join(path, TEXT_OFFSETS_FILE), "Q", count)
+        self._coded = {
+            name: _map_column(os.path.join(path, file_name), typecode, count)
+            for name, (file_name, typecode) in _CODED_COLUMNS.items()
+        }
+        self._chunk_index = _map_column(os.path.join(path, _CHUNK_INDEX_FILE[0]), _CHUNK_INDEX_FILE[1], count)
+        self._timestamp = _map_column(os.path.join(path, _TIMESTAMP_FILE[0]), _TIMESTAMP_FILE[1], count)
+        self._dicts = _read_dicts(path)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def get_text(self, row: int) -> str:
+        """Decode one chunk's text"""
+        start = self._text_end[row - 1] if row > 0 else 0
+        return self._text[start:self._text_end[row]].decode("utf-8")
+
+    def get_metadata(self, row: int) -> Dict[str, Any]:
+        """Rebuild one chunk's metadata dict from the columns"""
+        metadata: Dict[str, Any] = {}
+        for name in ("source_file", "patient_id"):
+            code = self._coded[name][row]
+            if code:
+                metadata[name] = self._dicts[name][code]
+        if self._chunk_index[row] != INT32_MISSING:
+            metadata["chunk_index"] = self._chunk_index[row]
+        if self._timestamp[row] != INT64_MISSING:
+            metadata["timestamp"] = _decode_timestamp(self._timestamp[row])
+        extra_code = self._coded["extra"][row]
+        if extra_code:
+            metadata.update(json.loads(self._dicts["extra"][extra_code]))
+        return metadata
+
+    def get_document(self, row: int) -> Document:
+        """Build a Document for one row"""
+        return Document(page_content=self.get_text(row), metadata=self.get_metadata(row))
+
+
+def _read_dicts(path: str) -> Dict[str, List[Optional[str]]]:
+    """Load coded-column dictionaries (code 0 is reserved for 'missing')"""
+    dicts_path = os.path.join(path, DICTS_FILE)
+    if os.path.exists(dicts_path):
+        with open(dicts_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {name: [None] for name in _CODED_COLUMNS}
+
+
+def truncate_to(file_path: str, size: int):
+    """Drop bytes past the committed size (left over from an interrupted append)"""
+    if os.path.exists(file_path):
+        if os.path.getsize(file_path) != size:
+            with open(file_path, "r+b") as f:
+                f.truncate(size)
+    else:
+        open(file_path, "wb").close()
+
+
+def remove_chunk_files(path: str):
+    """Delete every chunk store file in a directory (used before a fresh write)"""
+    for name in CHUNK_FILES:
+        file_path = os.path.join(path, name)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def append_chunks(path: str, count: int, text_bytes: int, texts: List[str],
+                  metadatas: Optional[List[Optional[Dict[str, Any]]]] = None) -> int:
+    """
+    Append chunks after the committed rows
+
+    The caller commits the new row count and text length (e.g. in its manifest);
+    until then readers keep seeing only the old rows. Dictionaries only grow, so
+    rewriting chunk_dicts.json early is safe for old readers.
+
+    Args:
+        path: Store directory
+        count: Committed row count
+        text_bytes: Committed length of chunks.txt
+        texts: Chunk texts
+        metadatas: Optional per-chunk metadata
+
+    Returns:
+        New committed length of chunks.txt
+    """
+    n = len(texts)
+    if metadatas is not None and len(metadatas) != n:
+        raise ValueError("metadatas must match texts")
+
+    text_path = os.path.join(path, TEXT_FILE)
+    offsets_path = os.path.join(path, TEXT_OFFSETS_FILE)
+    truncate_to(text_path, text_bytes)
+    truncate_to(offsets_path, count * 8)
+    for file_name, typecode in list(_CODED_COLUMNS.values()) + [_CHUNK_INDEX_FILE, _TIMESTAMP_FILE]:
+        truncate_to(os.path.join(path, file_name), count * array(typecode).itemsize)
+
+    dicts = _read_dicts(path)
+    lookups = {name: {value: code for code, value in enumerate(values) if code}
+               for name, values in dicts.items()}
+
+    encoded_texts = [t.encode("utf-8") for t in texts]
+    text_end = array("Q")
+    coded = {name: array(typecode) for name, (_, typecode) in _CODED_COLUMNS.items()}
+    chunk_index = array(_CHUNK_INDEX_FILE[1])
+    timestamp = array(_TIMESTAMP_FILE[1])
+
+    position = text_bytes
+    for i, blob in enumerate(encoded_texts):
+        position += len(blob)
+        text_end.append(position)
+
+        columns = _split_metadata(metadatas[i] if metadatas else None)
+        for name in _CODED_COLUMNS:
+            value = columns[name]
+            if value is None:
+                coded[name].append(0)
+                continue
+            code = lookups[name].get(value)
+            if code is None:
+                code = len(dicts[name])
+                dicts[name].append(value)
+                lookups[name][value] = code
+            coded[name].append(code)
+        chunk_index.append(columns["chunk_index"])
+        timestamp.append(columns["timestamp"])
+
+    with open(text_path, "ab") as f:
+        f.write(b"".join(encoded_texts))
+    with open(offsets_path, "ab") as f:
+        text_end.tofile(f)
+    for name, (file_name, _) in _CODED_COLUMNS.items():
+        with open(os.path.join(path, file_name), "ab") as f:
+            coded[name].tofile(f)
+    with open(os.path.join(path, _CHUNK_INDEX_FILE[0]), "ab") as f:
+        chunk_index.tofile(f)
+    with open(os.path.join(path, _TIMESTAMP_FILE[0]), "ab") as f:
+        timestamp.tofile(f)
+
+    tmp_path = os.path.join(path, DICTS_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(dicts, f, separators=(",", ":"))
+    os.replace(tmp_path, os.path.join(path, DICTS_FILE))
+
+    return position
@@ -0,0 +1,182 @@
+"""
+Context Assembler
+Packs retrieved chunks into an LLM prompt by token budget instead of character slicing
+
+Chunks arrive best-first (RAGEngine.retrieve order). Near-duplicates of an already
+selected chunk are skipped, and every remaining chunk is either included whole or
+left out, so the model never sees text cut mid-sentence. Token counts use a fast
+local estimate (no tokenizer download); usage against the budget is reported per call.
+"""
+
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+ANSWER_CONTEXT_TOKENS = int(os.getenv("ANSWER_CONTEXT_TOKENS", "800"))
+RISK_CONTEXT_TOKENS = int(os.getenv("RISK_CONTEXT_TOKENS", "400"))
+DEFAULT_DUPLICATE_THRESHOLD = 0.8
+CONTEXT_SEPARATOR = "\n\n"
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_WORD_PATTERN = re.compile(r"\w+")
+_SENTENCE_END = re.compile(r"[.!?](?=\s|$)")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast BPE-style token estimate
+
+    Every word or punctuation mark is one token, plus one per further 6
+    characters of long words (medical terms split into several BPE pieces).
+    """
+    return sum(1 + (len(token) - 1) // 6 for token in _TOKEN_PATTERN.findall(text))
+
+
+def _shingles(text: str, size: int = 3) -> Set[tuple]:
+    """Lowercased word n-grams used for near-duplicate detection"""
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _similarity(a: Set[tuple], b: Set[tuple]) -> float:
+    """Jaccard similarity of two shingle sets"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _truncate_to_budget(text: str, budget: int) -> str:
+    """Longest prefix within the budget, ending at a sentence (or word) boundary"""
+    words = text.split()
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(" ".join(words[:middle])) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    prefix = " ".join(words[:low])
+    sentence_ends = [m.end() for m in _SENTENCE_END.finditer(prefix)]
+    return prefix[:sentence_ends[-1]] if sentence_ends else prefix
+
+
+class ContextAssembler:
+    """
+    Budgeted, de-duplicated context packing with per-purpose usage stats
+    """
+
+    def __init__(self, duplicate_threshold: float = DEFAULT_DUPLICATE_THRESHOLD,
+                 separator: str = CONTEXT_SEPARATOR):
+        """
+        Args:
+            duplicate_threshold: Word-trigram Jaccard similarity at which a chunk
+                counts as a near-duplicate of a higher-ranked one
+            separator: Text placed between chunks
+        """
+        self.duplicate_threshold = duplicate_threshold
+        self.separator = separator
+        self._separator_tokens = estimate_tokens(separator)
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def assemble(self, chunks: List[str], budget: int, purpose: str = "default") -> Dict[str, Any]:
+        """
+        Pack chunks best-first into at most `budget` tokens
+
+        Args:
+            chunks: Chunk texts, most relevant first
+            budget: Token budget for the joined context
+            purpose: Stats bucket (e.g. "answer", "risk")
+
+        Returns:
+            dict with context, chunks (selected texts), tokens_used, budget,
+            duplicates_dropped and over_budget_dropped
+        """
+        selected: List[str] = []
+        selected_shingles: List[Set[tuple]] = []
+        tokens_used = 0
+        duplicates = 0
+        over_budget = 0
+
+        for chunk in chunks:
+            chunk = chunk.strip()
+            if not chunk:
+                continue
+            shingles = _shingles(chunk)
+            if any(_similarity(shingles, seen) >= self.duplicate_threshold for seen in selected_shingles):
+                duplicates += 1
+                continue
+
+            cost = estimate_tokens(chunk) + (self._separator_tokens if selected else 0)
+            if tokens_used + cost > budget:
+                over_budget += 1
+                continue  # a smaller, lower-ranked chunk may still fit
+            selected.append(chunk)
+            selected_shingles.append(shingles)
+            tokens_used += cost
+
+        # The best chunk alone exceeds the budget: keep its leading sentences
+        # rather than sending no context at all
+        if not selected and over_budget:
+            first = next(chunk.strip() for chunk in chunks if chunk.strip())
+            truncated = _truncate_to_budget(first, budget)
+            if truncated:
+                selected.append(truncated)
+                tokens_used = estimate_tokens(truncated)
+
+        self._record(purpose, budget, tokens_used, len(selected), duplicates, over_budget)
+        return {
+            "context": self.separator.join(selected),
+            "chunks": selected,
+            "tokens_used": tokens_used,
+            "budget": budget,
+            "duplicates_dropped": duplicates,
+            "over_budget_dropped": over_budget
+        }
+
+    def _record(self, purpose: str, budget: int, tokens_used: int, selected: int,
+                duplicates: int, over_budget: int):
+        with self._lock:
+            stats = self._stats.setdefault(purpose, {
+                "calls": 0, "tokens_used": 0, "tokens_budget": 0, "chunks_used": 0,
+                "duplicates_dropped": 0, "over_budget_dropped": 0
+            })
+            stats["calls"] += 1
+            stats["tokens_used"] += tokens_used
+            stats["tokens_budget"] += budget
+            stats["chunks_used"] += selected
+            stats["duplicates_dropped"] += duplicates
+            stats["over_budget_dropped"] += over_budget
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Token usage against budget per purpose
+
+        Returns:
+            purpose -> cumulative counters plus avg_tokens_used and budget_utilization
+        """
+        with self._lock:
+            snapshot = {purpose: dict(stats) for purpose, stats in self._stats.items()}
+        for stats in snapshot.values():
+            stats["avg_tokens_used"] = round(stats["tokens_used"] / stats["calls"], 1)
+            stats["budget_utilization"] = (
+                round(stats["tokens_used"] / stats["tokens_budget"], 3) if stats["tokens_budget"] else 0.0
+            )
+        return snapshot
+
+
+# Singleton instance
+_context_assembler: Optional[ContextAssembler] = None
+_context_assembler_lock = threading.Lock()
+
+def get_context_assembler() -> ContextAssembler:
+    """Get or create singleton ContextAssembler instance"""
+    global _context_assembler
+    if _context_assembler is None:
+        with _context_assembler_lock:
+            if _context_assembler is None:
+                _context_assembler = ContextAssembler()
+    return _context_assembler
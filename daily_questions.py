@@ -6,11 +6,11 @@ Uses patient records + shared medical knowledge
 
 import os
 import json
-import requests
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from patient_manager import get_patient_manager
+from llm_client import get_llm_client, message_content
 
 load_dotenv()
 
@@ -53,36 +53,14 @@ class DailyQuestionGenerator:
         Returns:
             Generated text
         """
-        api_key = os.getenv("GROQ_API_KEY")
-        
-        if not api_key:
-            return "Error: GROQ_API_KEY environment variable not set"
-        
-        url = "https://api.groq.com/openai/v1/chat/completions"
-        
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": "llama-3.3-70b-versatile",
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "max_tokens": max_tokens,
-            "temperature": 0.7
-        }
-        
         try:
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
-            return data["choices"][0]["message"]["content"].strip()
+            data = get_llm_client().chat(
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=0.7,
+                timeout=30
+            )
+            return message_content(data)
             
         except Exception as e:
             return f"Error calling Groq API: {str(e)}"
@@ -97,7 +75,9 @@ class DailyQuestionGenerator:
         Returns:
             Text summary of recent questions and concerns
         """
-        history = self.patient_manager.get_patient_history(self.patient_id, limit=20)
+        history = self.patient_manager.query_patient_history(
+            self.patient_id, columns=["question", "risk_level"], limit=20
+        )["items"]
         
         if not history:
             return "No previous chat history available."
@@ -274,7 +254,9 @@ Generate ONE daily question now:"""
         Returns:
             List of daily Q&A records
         """
-        history = self.patient_manager.get_patient_history(self.patient_id, limit=50)
+        history = self.patient_manager.query_patient_history(
+            self.patient_id, columns=["question", "answer", "timestamp"], limit=50
+        )["items"]
         
         daily_answers = []
         for item in history:
@@ -0,0 +1,202 @@
+"""
+Database Migrations
+Versioned, in-place schema upgrades for patient_data.db
+
+The applied version is stored in SQLite's PRAGMA user_version. PatientManager
+creates the base (version 0) tables and then calls migrate(), which applies every
+newer migration in order, each in its own IMMEDIATE transaction, so an existing
+database file upgrades in place and a crash mid-migration leaves it at the
+previous version.
+"""
+
+import hashlib
+import json
+import sqlite3
+from typing import Callable, List, Tuple, Union
+
+# Each step is SQL or a callable(cursor) for data migrations
+MigrationStep = Union[str, Callable[[sqlite3.Cursor], None]]
+
+
+def source_chunk_hash(content: str) -> bytes:
+    """Content address of a source-document chunk (sha256 digest)"""
+    return hashlib.sha256(content.encode("utf-8")).digest()
+
+
+def _compact_source_documents(cursor: sqlite3.Cursor, batch_size: int = 1000):
+    """Move per-row source_documents JSON into source_chunks/chat_sources"""
+    chunk_ids = {}
+    last_id = 0
+    while True:
+        rows = cursor.execute(
+            "SELECT id, source_documents FROM chat_history "
+            "WHERE id > ? AND source_documents IS NOT NULL ORDER BY id LIMIT ?",
+            (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            return
+        refs = []
+        for message_id, raw in rows:
+            try:
+                documents = json.loads(raw) if raw else []
+            except ValueError:
+                documents = [raw]  # not JSON: keep the text as a single chunk
+            for position, content in enumerate(documents):
+                content = content if isinstance(content, str) else json.dumps(content)
+                digest = source_chunk_hash(content)
+                chunk_id = chunk_ids.get(digest)
+                if chunk_id is None:
+                    cursor.execute("INSERT OR IGNORE INTO source_chunks (hash, content) VALUES (?, ?)",
+                                   (digest, content))
+                    chunk_id = cursor.execute("SELECT id FROM source_chunks WHERE hash = ?",
+                                              (digest,)).fetchone()[0]
+                    chunk_ids[digest] = chunk_id
+                refs.append((message_id, position, chunk_id))
+        cursor.executemany("INSERT OR REPLACE INTO chat_sources (message_id, position, chunk_id) "
+                           "VALUES (?, ?, ?)", refs)
+        cursor.executemany("UPDATE chat_history SET source_documents = NULL WHERE id = ?",
+                           [(message_id,) for message_id, _ in rows])
+        last_id = rows[-1][0]
+
+
+MIGRATIONS: List[Tuple[int, str, List[MigrationStep]]] = [
+    (1, "chat_history: integer epoch column and composite indexes", [
+        "ALTER TABLE chat_history ADD COLUMN ts INTEGER",
+        "UPDATE chat_history SET ts = CAST(strftime('%s', timestamp) AS INTEGER) WHERE ts IS NULL",
+        "CREATE INDEX IF NOT EXISTS idx_chat_history_patient_ts ON chat_history(patient_id, ts)",
+        "CREATE INDEX IF NOT EXISTS idx_chat_history_patient_risk_ts "
+        "ON chat_history(patient_id, risk_level, ts)",
+    ]),
+    (2, "risk_daily_counts: per-patient, per-day risk buckets maintained by triggers", [
+        # day = UTC epoch day (ts / 86400); NULL risk levels are bucketed as ''
+        '''CREATE TABLE IF NOT EXISTS risk_daily_counts (
+            patient_id TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            risk_level TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (patient_id, day, risk_level)
+        ) WITHOUT ROWID''',
+        '''INSERT INTO risk_daily_counts (patient_id, day, risk_level, count)
+        SELECT patient_id, ts / 86400, COALESCE(risk_level, ''), COUNT(*)
+        FROM chat_history WHERE ts IS NOT NULL
+        GROUP BY patient_id, ts / 86400, COALESCE(risk_level, '')''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_risk_daily_counts_insert
+        AFTER INSERT ON chat_history WHEN NEW.ts IS NOT NULL
+        BEGIN
+            INSERT INTO risk_daily_counts (patient_id, day, risk_level, count)
+            VALUES (NEW.patient_id, NEW.ts / 86400, COALESCE(NEW.risk_level, ''), 1)
+            ON CONFLICT (patient_id, day, risk_level) DO UPDATE SET count = count + 1;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_risk_daily_counts_delete
+        AFTER DELETE ON chat_history WHEN OLD.ts IS NOT NULL
+        BEGIN
+            UPDATE risk_daily_counts SET count = count - 1
+            WHERE patient_id = OLD.patient_id AND day = OLD.ts / 86400
+              AND risk_level = COALESCE(OLD.risk_level, '');
+            DELETE FROM risk_daily_counts
+            WHERE patient_id = OLD.patient_id AND day = OLD.ts / 86400
+              AND risk_level = COALESCE(OLD.risk_level, '') AND count <= 0;
+        END''',
+        # Deferred risk assessment rewrites risk_level after the row was saved
+        '''CREATE TRIGGER IF NOT EXISTS trg_risk_daily_counts_update
+        AFTER UPDATE OF patient_id, risk_level, ts ON chat_history
+        BEGIN
+            UPDATE risk_daily_counts SET count = count - 1
+            WHERE OLD.ts IS NOT NULL AND patient_id = OLD.patient_id AND day = OLD.ts / 86400
+              AND risk_level = COALESCE(OLD.risk_level, '');
+            DELETE FROM risk_daily_counts
+            WHERE OLD.ts IS NOT NULL AND patient_id = OLD.patient_id AND day = OLD.ts / 86400
+              AND risk_level = COALESCE(OLD.risk_level, '') AND count <= 0;
+            INSERT INTO risk_daily_counts (patient_id, day, risk_level, count)
+            SELECT NEW.patient_id, NEW.ts / 86400, COALESCE(NEW.risk_level, ''), 1
+            WHERE NEW.ts IS NOT NULL
+            ON CONFLICT (patient_id, day, risk_level) DO UPDATE SET count = count + 1;
+        END''',
+    ]),
+    (3, "source_chunks: content-addressed source documents referenced by chat_sources", [
+        '''CREATE TABLE IF NOT EXISTS source_chunks (
+            id INTEGER PRIMARY KEY,
+            hash BLOB NOT NULL UNIQUE,
+            content TEXT NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS chat_sources (
+            message_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            chunk_id INTEGER NOT NULL,
+            PRIMARY KEY (message_id, position)
+        ) WITHOUT ROWID''',
+        # Lets orphaned chunks be found without a full scan
+        "CREATE INDEX IF NOT EXISTS idx_chat_sources_chunk ON chat_sources(chunk_id)",
+        _compact_source_documents,
+        '''CREATE TRIGGER IF NOT EXISTS trg_chat_sources_delete
+        AFTER DELETE ON chat_history
+        BEGIN
+            DELETE FROM chat_sources WHERE message_id = OLD.id;
+        END''',
+    ]),
+    (4, "answer_cache_hits: durable audit trail of reused (semantically cached) answers", [
+        '''CREATE TABLE IF NOT EXISTS answer_cache_hits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id TEXT NOT NULL,
+            question TEXT NOT NULL,
+            cached_question TEXT NOT NULL,
+            similarity REAL NOT NULL,
+            age_seconds REAL NOT NULL,
+            store_version TEXT,
+            timestamp TEXT NOT NULL,
+            FOREIGN KEY (patient_id) REFERENCES patients(patient_id) ON DELETE CASCADE
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_answer_cache_hits_patient ON answer_cache_hits(patient_id, id)",
+    ]),
+]
+
+# Migrations that free enough pages to be worth a VACUUM afterwards (VACUUM
+# cannot run inside the migration transaction)
+VACUUM_AFTER = {3}
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Schema version recorded in the database file"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> Tuple[int, int]:
+    """
+    Apply pending migrations
+
+    Args:
+        conn: Connection to the database (no transaction open)
+
+    Returns:
+        (version before, version after)
+    """
+    start = get_schema_version(conn)
+    vacuum = False
+    for version, description, steps in MIGRATIONS:
+        if get_schema_version(conn) >= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            cursor = conn.cursor()
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            cursor.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        print(f"[DB] Migrated schema to version {version}: {description}")
+        vacuum = vacuum or version in VACUUM_AFTER
+    if vacuum:
+        conn.execute("VACUUM")
+        print("[DB] Vacuumed database after migration")
+    return start, get_schema_version(conn)
@@ -0,0 +1,115 @@
+"""
+Dual Retrieval
+Searches the shared medical books and a patient's records with ONE query embedding
+
+The query is embedded once, both indexes are searched concurrently with that
+vector, and the hits are merged by distance subject to a per-source quota.
+Every hit keeps its score and provenance instead of just page_content.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+SOURCE_SHARED = "shared"
+SOURCE_PATIENT = "patient"
+
+# Max chunks taken from each source per query
+DEFAULT_QUOTAS = {SOURCE_SHARED: 3, SOURCE_PATIENT: 3}
+
+_search_executor: Optional[ThreadPoolExecutor] = None
+_search_executor_lock = threading.Lock()
+
+
+def _get_search_executor() -> ThreadPoolExecutor:
+    """Shared thread pool for index searches (FAISS/numpy release the GIL)"""
+    global _search_executor
+    if _search_executor is None:
+        with _search_executor_lock:
+            if _search_executor is None:
+                _search_executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("RETRIEVAL_SEARCH_WORKERS", "4")),
+                    thread_name_prefix="retrieval"
+                )
+    return _search_executor
+
+
+def _search_store(store: Any, source: str, query_vector: List[float], k: int) -> List[Dict[str, Any]]:
+    """Search one store by vector and tag each hit with its source"""
+    hits = store.similarity_search_with_score_by_vector(query_vector, k=k)
+    return [
+        {
+            "content": doc.page_content,
+            "score": float(score),
+            "source": source,
+            "metadata": dict(doc.metadata or {})
+        }
+        for doc, score in hits
+    ]
+
+
+def merge_by_score(results: Dict[str, List[Dict[str, Any]]], quotas: Dict[str, int],
+                   k_total: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Merge per-source hits by distance (lower is closer)
+
+    Args:
+        results: source -> hits (each with a 'score')
+        quotas: source -> max hits kept from that source
+        k_total: Overall cap (defaults to the sum of quotas)
+
+    Returns:
+        Merged hits, closest first, each with a 'rank'
+    """
+    candidates = []
+    for source, hits in results.items():
+        candidates.extend(sorted(hits, key=lambda h: h["score"])[:quotas.get(source, 0)])
+
+    merged = sorted(candidates, key=lambda h: h["score"])
+    if k_total is not None:
+        merged = merged[:k_total]
+    for rank, hit in enumerate(merged):
+        hit["rank"] = rank
+    return merged
+
+
+def dual_retrieve(query: str, embedding: Any, stores: Dict[str, Any],
+                  quotas: Optional[Dict[str, int]] = None,
+                  k_total: Optional[int] = None,
+                  precomputed: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> List[Dict[str, Any]]:
+    """
+    Embed a query once and search every available store concurrently
+
+    Args:
+        query: User question
+        embedding: Embedding model (embed_query is called exactly once)
+        stores: source name -> vector store (None entries are skipped)
+        quotas: source -> max hits from that source (defaults to DEFAULT_QUOTAS)
+        k_total: Overall cap on merged hits
+        precomputed: source -> hits already known for this query (that store is not searched)
+
+    Returns:
+        List of {content, score, source, metadata, rank}, closest first
+    """
+    quotas = quotas or DEFAULT_QUOTAS
+    precomputed = precomputed or {}
+    active = {source: store for source, store in stores.items()
+              if store is not None and quotas.get(source, 0) > 0 and source not in precomputed}
+    if not active:
+        return merge_by_score(dict(precomputed), quotas, k_total) if precomputed else []
+
+    query_vector = embedding.embed_query(query)
+
+    if len(active) == 1:
+        source, store = next(iter(active.items()))
+        results = {source: _search_store(store, source, query_vector, quotas[source])}
+    else:
+        executor = _get_search_executor()
+        futures = {
+            source: executor.submit(_search_store, store, source, query_vector, quotas[source])
+            for source, store in active.items()
+        }
+        results = {source: future.result() for source, future in futures.items()}
+
+    return merge_by_score({**precomputed, **results}, quotas, k_total)
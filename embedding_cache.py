@@ -0,0 +1,148 @@
+"""
+Query Embedding Cache
+Bounded LRU of normalized query text -> embedding vector
+
+Monitoring endpoints retrieve with fixed strings and patients repeat similar
+symptom phrasing, so the same query vectors are computed over and over.
+CachedEmbeddings sits in front of the shared model and serves repeated
+embed_query calls from memory; document embedding is passed straight through.
+The model always embeds the text as written. Only for models known to use an
+uncased tokenizer (UNCASED_MODELS) do queries differing in case or spacing share
+an entry; for any other model the key is the exact text.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_QUERY_CACHE_SIZE = int(os.getenv("EMBEDDING_QUERY_CACHE_SIZE", "1024"))
+
+# Models whose tokenizer lower-cases and splits on whitespace (BERT uncased
+# WordPiece), so case and spacing do not change the vector
+UNCASED_MODELS = {
+    "sentence-transformers/all-MiniLM-L6-v2",
+    "sentence-transformers/all-MiniLM-L12-v2",
+}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str, uncased: bool = True) -> str:
+    """
+    Cache key for a query
+
+    Args:
+        text: Query text
+        uncased: Model ignores case and spacing: trim, lower-case and collapse
+            whitespace; otherwise the text is the key as is
+    """
+    if not uncased:
+        return text
+    return _WHITESPACE.sub(" ", text.strip()).lower()
+
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe LRU of query vectors with hit/miss statistics
+    """
+
+    def __init__(self, max_size: int = DEFAULT_QUERY_CACHE_SIZE):
+        """
+        Args:
+            max_size: Max cached queries (0 disables caching)
+        """
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[List[float]]:
+        """Look up a vector, marking it most recently used (None on miss)"""
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Callers get their own list so they cannot mutate the cached vector
+        return list(vector)
+
+    def put(self, key: str, vector: List[float]):
+        """Store a vector, evicting the least recently used entry if full"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = tuple(vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all cached vectors (statistics are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Report cache usage
+
+        Returns:
+            dict with size, max_size, hits, misses, evictions and hit_ratio
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that caches embed_query results
+    Usable anywhere a LangChain Embeddings object is expected
+    """
+
+    def __init__(self, model: Any, cache: Optional[QueryEmbeddingCache] = None,
+                 uncased: Optional[bool] = None):
+        """
+        Args:
+            model: Underlying embedding model (e.g. HuggingFaceEmbeddings)
+            cache: Query cache (a new one is created if omitted)
+            uncased: Share entries between queries differing only in case and
+                spacing (default: model.model_name is in UNCASED_MODELS)
+        """
+        self.model = model
+        self.cache = cache if cache is not None else QueryEmbeddingCache()
+        if uncased is None:
+            uncased = getattr(model, "model_name", None) in UNCASED_MODELS
+        self.uncased = uncased
+
+    def embed_query(self, text: str) -> List[float]:
+        key = normalize_query(text, self.uncased)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.model.embed_query(text)
+            self.cache.put(key, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.model.embed_documents(texts)
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes not found on the wrapper (e.g. model_name)
+        if name in ("model", "cache", "uncased"):
+            raise AttributeError(name)
+        return getattr(self.model, name)
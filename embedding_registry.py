@@ -0,0 +1,157 @@
+"""
+Embedding Model Registry
+Process-wide, thread-safe cache of sentence-transformer embedding models
+RAGEngine, ReportProcessor, PatientVectorStoreManager and the loaders all share
+one loaded copy of each model instead of building their own
+Each model is wrapped in CachedEmbeddings so repeated queries skip inference
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from embedding_cache import CachedEmbeddings, QueryEmbeddingCache
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_EMBEDDING_DEVICE = "cpu"
+
+
+def _current_rss_bytes() -> int:
+    """Resident set size of this process in bytes (0 if unavailable)"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    try:
+        import resource
+        # ru_maxrss is the peak RSS in KB on Linux (bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return 0
+
+
+def _parameter_bytes(embeddings: Any) -> int:
+    """Size of the underlying torch model weights in bytes (0 if unknown)"""
+    client = getattr(embeddings, "_client", None) or getattr(embeddings, "client", None)
+    if client is None or not hasattr(client, "parameters"):
+        return 0
+    try:
+        return sum(p.numel() * p.element_size() for p in client.parameters())
+    except Exception:
+        return 0
+
+
+class EmbeddingRegistry:
+    """
+    Loads each (model_name, device) pair at most once per process
+    Safe to call from request threads and executor workers concurrently
+    """
+
+    def __init__(self):
+        self._models: Dict[Tuple[str, str], CachedEmbeddings] = {}
+        self._stats: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str = DEFAULT_EMBEDDING_MODEL,
+            device: str = DEFAULT_EMBEDDING_DEVICE) -> CachedEmbeddings:
+        """
+        Get the shared embedding model, loading it on first use
+
+        Args:
+            model_name: HuggingFace model identifier
+            device: Torch device (e.g. 'cpu')
+
+        Returns:
+            Shared HuggingFaceEmbeddings instance behind a query-embedding cache
+        """
+        key = (model_name, device)
+
+        # Fast path: the model is loaded; the lock only guards the counter
+        model = self._models.get(key)
+        if model is not None:
+            with self._lock:
+                self._stats[key]["requests"] += 1
+            return model
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                model = self._load(model_name, device)
+                self._models[key] = model
+            self._stats[key]["requests"] += 1
+            return model
+
+    def _load(self, model_name: str, device: str) -> CachedEmbeddings:
+        """Load a model and record load time and memory footprint (lock held)"""
+        rss_before = _current_rss_bytes()
+        start = time.perf_counter()
+
+        model = HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={'device': device}
+        )
+
+        load_seconds = time.perf_counter() - start
+        rss_after = _current_rss_bytes()
+
+        self._stats[(model_name, device)] = {
+            "model_name": model_name,
+            "device": device,
+            "load_seconds": round(load_seconds, 3),
+            "parameter_bytes": _parameter_bytes(model),
+            "rss_delta_bytes": max(rss_after - rss_before, 0),
+            "loaded_at": datetime.utcnow().isoformat(),
+            "requests": 0
+        }
+        print(f"✅ Loaded embedding model {model_name} on {device} in {load_seconds:.2f}s")
+        return CachedEmbeddings(model, QueryEmbeddingCache())
+
+    def is_loaded(self, model_name: str = DEFAULT_EMBEDDING_MODEL,
+                  device: str = DEFAULT_EMBEDDING_DEVICE) -> bool:
+        """Check whether a model has already been loaded"""
+        return (model_name, device) in self._models
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Report loaded models with load time and memory usage
+
+        Returns:
+            dict with per-model stats and process RSS
+        """
+        with self._lock:
+            models = [
+                dict(stats, query_cache=self._models[key].cache.get_stats())
+                for key, stats in self._stats.items() if key in self._models
+            ]
+        return {
+            "loaded_models": len(models),
+            "models": models,
+            "process_rss_bytes": _current_rss_bytes()
+        }
+
+
+# Singleton instance
+_registry: Optional[EmbeddingRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_embedding_registry() -> EmbeddingRegistry:
+    """Get or create singleton EmbeddingRegistry instance"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = EmbeddingRegistry()
+    return _registry
+
+
+def get_embeddings(model_name: str = DEFAULT_EMBEDDING_MODEL,
+                   device: str = DEFAULT_EMBEDDING_DEVICE) -> CachedEmbeddings:
+    """Shortcut for get_embedding_registry().get(...)"""
+    return get_embedding_registry().get(model_name, device)
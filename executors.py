@@ -0,0 +1,237 @@
+"""
+Dispatch Layer
+Bounded executors that keep blocking work off the FastAPI event loop
+
+Two pools with separate limits so a burst of one kind of work cannot starve the other:
+- cpu: embedding, FAISS search, PDF parsing, chunking (small pool, ~one job per core)
+- io:  sqlite queries, file writes, blocking LLM calls (larger pool, mostly waiting)
+
+Async handlers call `await run_cpu(fn, ...)` / `await run_io(fn, ...)`. Each pool
+reports queue depth, running jobs and how long jobs waited before starting.
+A request that must hold a threading.Lock across several such calls uses
+LockedSteps, which keeps the lock until the last worker thread has finished even
+when the request is cancelled mid-call.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Union
+
+DEFAULT_CPU_WORKERS = int(os.getenv("CPU_EXECUTOR_WORKERS", str(min(4, os.cpu_count() or 1))))
+DEFAULT_CPU_QUEUE = int(os.getenv("CPU_EXECUTOR_QUEUE", "32"))
+DEFAULT_IO_WORKERS = int(os.getenv("IO_EXECUTOR_WORKERS", "16"))
+DEFAULT_IO_QUEUE = int(os.getenv("IO_EXECUTOR_QUEUE", "256"))
+
+
+class ExecutorBusy(Exception):
+    """Raised when an executor's queue is full"""
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a cap on queued jobs and wait/run time statistics
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        """
+        Args:
+            name: Pool name (thread name prefix and stats key)
+            max_workers: Jobs running at once
+            max_queue: Jobs allowed to wait for a worker before submissions are rejected
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "queued": 0,
+            "running": 0,
+            "max_queue_depth": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "run_seconds_total": 0.0
+        }
+
+    def submit(self, fn: Callable, *args, **kwargs):
+        """
+        Submit a job (concurrent.futures.Future)
+
+        Raises:
+            ExecutorBusy: If max_workers + max_queue jobs are already pending
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise ExecutorBusy(f"{self.name} executor is saturated")
+
+        enqueued_at = time.perf_counter()
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["queued"] += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._stats["queued"])
+
+        try:
+            return self._pool.submit(self._run, enqueued_at, fn, args, kwargs)
+        except BaseException:
+            with self._lock:
+                self._stats["queued"] -= 1
+            self._slots.release()
+            raise
+
+    def _run(self, enqueued_at: float, fn: Callable, args, kwargs) -> Any:
+        started_at = time.perf_counter()
+        waited = started_at - enqueued_at
+        with self._lock:
+            self._stats["queued"] -= 1
+            self._stats["running"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+
+        failed = False
+        try:
+            return fn(*args, **kwargs)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self._stats["running"] -= 1
+                self._stats["failed" if failed else "completed"] += 1
+                self._stats["run_seconds_total"] += time.perf_counter() - started_at
+            self._slots.release()
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking call in this pool and await its result"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Report queue depth, running jobs and wait/run times
+
+        Returns:
+            dict with counters plus avg_wait_seconds and avg_run_seconds
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        started = stats["submitted"] - stats["queued"]
+        finished = stats["completed"] + stats["failed"]
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "queue_depth": stats["queued"],
+            "running": stats["running"],
+            "submitted": stats["submitted"],
+            "completed": stats["completed"],
+            "failed": stats["failed"],
+            "rejected": stats["rejected"],
+            "max_queue_depth": stats["max_queue_depth"],
+            "avg_wait_seconds": round(stats["wait_seconds_total"] / started, 4) if started else 0.0,
+            "max_wait_seconds": round(stats["wait_seconds_max"], 4),
+            "avg_run_seconds": round(stats["run_seconds_total"] / finished, 4) if finished else 0.0
+        }
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting work and (optionally) wait for running jobs"""
+        self._pool.shutdown(wait=wait)
+
+
+# Singleton instances
+_executors: Dict[str, BoundedExecutor] = {}
+_executors_lock = threading.Lock()
+
+_EXECUTOR_CONFIG = {
+    "cpu": (DEFAULT_CPU_WORKERS, DEFAULT_CPU_QUEUE),
+    "io": (DEFAULT_IO_WORKERS, DEFAULT_IO_QUEUE),
+}
+
+
+def get_executor(kind: str) -> BoundedExecutor:
+    """Get or create the 'cpu' or 'io' executor"""
+    executor = _executors.get(kind)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(kind)
+            if executor is None:
+                max_workers, max_queue = _EXECUTOR_CONFIG[kind]
+                executor = BoundedExecutor(kind, max_workers, max_queue)
+                _executors[kind] = executor
+    return executor
+
+
+async def run_cpu(fn: Callable, *args, **kwargs) -> Any:
+    """Await a CPU-bound call (embedding, search, PDF parsing) on the cpu executor"""
+    return await get_executor("cpu").run(fn, *args, **kwargs)
+
+
+async def run_io(fn: Callable, *args, **kwargs) -> Any:
+    """Await a blocking I/O call (sqlite, files, LLM HTTP) on the io executor"""
+    return await get_executor("io").run(fn, *args, **kwargs)
+
+
+class LockedSteps:
+    """
+    Runs executor calls for one async request while it holds a threading.Lock
+
+    Cancelling the awaiting coroutine (client disconnect, timeout) does not stop
+    a call that a worker thread has already started. release() therefore hands
+    the lock back only once the last submitted call has finished, so the next
+    holder never runs alongside it.
+    """
+
+    def __init__(self, lock: threading.Lock, poll_seconds: float = 0.02):
+        """
+        Args:
+            lock: Lock to hold (e.g. a pooled engine's turn lock)
+            poll_seconds: How often acquire re-checks a busy lock
+        """
+        self.lock = lock
+        self.poll_seconds = poll_seconds
+        self._pending: Optional[Future] = None
+
+    async def acquire(self):
+        """
+        Wait for the lock without parking an executor thread; a request
+        cancelled while waiting never takes it
+        """
+        while not self.lock.acquire(blocking=False):
+            await asyncio.sleep(self.poll_seconds)
+
+    async def run(self, executor: Union[str, BoundedExecutor], fn: Callable, *args, **kwargs) -> Any:
+        """Await a blocking call on an executor ('cpu', 'io' or an instance)"""
+        if isinstance(executor, str):
+            executor = get_executor(executor)
+        self._pending = executor.submit(fn, *args, **kwargs)
+        return await asyncio.wrap_future(self._pending)
+
+    def release(self):
+        """Release the lock now, or when a call still running on a worker finishes"""
+        if self._pending is None:
+            self.lock.release()
+        else:
+            # Runs at once if the call is already done
+            self._pending.add_done_callback(lambda _: self.lock.release())
+
+
+def get_executor_stats() -> Dict[str, Any]:
+    """Stats for every executor created so far"""
+    with _executors_lock:
+        executors = dict(_executors)
+    return {kind: executor.get_stats() for kind, executor in executors.items()}
+
+
+def shutdown_executors(wait: bool = True):
+    """Shut down all executors (called on API shutdown)"""
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
@@ -4,24 +4,20 @@ Handles PDF/TXT reading, text splitting, and vector store management
 """
 
 import streamlit as st
-from pypdf import PdfReader
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from dotenv import load_dotenv
+from embedding_registry import get_embeddings
+from mmap_vector_store import MmapVectorStore, faiss_to_arrays, is_mmap_store
+from pdf_extract import get_pdf_extractor
 import time
 
 load_dotenv()
 
 
 def read_pdf(file):
-    document = ""
-
-    reader = PdfReader(file)
-    for page in reader.pages:
-        document += page.extract_text()
-
-    return document
+    # Uploaded file objects are extracted in-process; pages are joined once
+    return get_pdf_extractor().extract_text(file)
 
 
 def read_txt(file):
@@ -64,10 +60,7 @@ def embedding_storing(split, create_new_vs, existing_vector_store, new_vs_name):
             status_text.write("🔄 Step 1/3: Loading embedding model...")
             progress_bar.progress(10)
             
-            instructor_embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/all-MiniLM-L6-v2", 
-                model_kwargs={'device': 'cpu'}
-            )
+            instructor_embeddings = get_embeddings()
             
             # Step 2: Creating embeddings for documents
             status_text.write(f"🔄 Step 2/3: Creating embeddings for {len(split)} chunks...")
@@ -84,6 +77,11 @@ def embedding_storing(split, create_new_vs, existing_vector_store, new_vs_name):
             if create_new_vs == True:
                 # Save db
                 db.save_local("vector store/" + new_vs_name)
+            elif existing_vector_store == new_vs_name and is_mmap_store("vector store/" + new_vs_name):
+                # Append the new vectors to the memory-mapped store
+                existing_db = MmapVectorStore("vector store/" + existing_vector_store, instructor_embeddings)
+                vectors, texts, metadatas, _ = faiss_to_arrays(db.index, db.docstore, db.index_to_docstore_id)
+                existing_db.add_vectors(vectors, texts, metadatas)
             else:
                 # Load existing db
                 load_db = FAISS.load_local(
@@ -68,9 +68,76 @@ export const sendChatMessage = async (patientId, message) => {
   return response.data;
 };
 
-export const getChatHistory = async (patientId, limit = 50) => {
+/**
+ * Stream a chat answer over Server-Sent Events.
+ * onToken(text) fires for every LLM delta; the promise resolves with the final
+ * response (same fields as sendChatMessage plus time_to_first_token).
+ */
+export const streamChatMessage = async (patientId, message, { onToken, onSources, signal } = {}) => {
+  const response = await fetch(`${API_BASE_URL}/api/chat/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+    body: JSON.stringify({ patient_id: patientId, message }),
+    signal,
+  });
+
+  if (!response.ok) {
+    let errorMessage = `Request failed with status ${response.status}`;
+    try {
+      const data = await response.json();
+      errorMessage = data.message || data.detail || errorMessage;
+    } catch (e) {
+      // Non-JSON error body
+    }
+    throw new Error(errorMessage);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let result = null;
+
+  const handleEvent = (rawEvent) => {
+    let event = 'message';
+    const dataLines = [];
+    rawEvent.split('\n').forEach((line) => {
+      if (line.startsWith('event:')) event = line.slice(6).trim();
+      else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+    });
+    if (!dataLines.length) return;
+    const data = JSON.parse(dataLines.join('\n'));
+
+    if (event === 'token') onToken?.(data.text);
+    else if (event === 'sources') onSources?.(data.sources);
+    else if (event === 'done') result = data;
+    else if (event === 'error') throw new Error(data.message);
+  };
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      handleEvent(buffer.slice(0, boundary));
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf('\n\n');
+    }
+  }
+
+  if (!result) {
+    throw new Error('Chat stream ended unexpectedly');
+  }
+  return result;
+};
+
+export const getChatHistory = async (patientId, limit = 50, cursor = null) => {
+  // Pass the previous response's next_cursor to fetch the next (older) page
+  const params = { limit };
+  if (cursor) params.cursor = cursor;
   const response = await api.get(`/api/chat/history/${patientId}`, {
-    params: { limit },
+    params,
   });
   return response.data;
 };
@@ -114,6 +181,12 @@ export const uploadPatientDocuments = async (patientId, files, uploaderRole = 'p
   return response.data;
 };
 
+// Uploads return a job_id; indexing runs in the background
+export const getIngestJob = async (jobId) => {
+  const response = await api.get(`/api/ingest/jobs/${jobId}`);
+  return response.data;
+};
+
 export const listPatientDocuments = async (patientId) => {
   const response = await api.get(`/api/documents/patient/${patientId}/list`);
   return response.data;
@@ -6,7 +6,7 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { useTheme } from '../context/ThemeContext';
 import MessageBubble from './MessageBubble';
-import { sendChatMessage, getChatHistory } from '../api/api';
+import { streamChatMessage, getChatHistory } from '../api/api';
 
 const ChatBox = ({ patientId }) => {
   const [messages, setMessages] = useState([]);
@@ -75,10 +75,25 @@ const ChatBox = ({ patientId }) => {
 
     setLoading(true);
 
+    let streaming = false;
     try {
-      const response = await sendChatMessage(patientId, userMessage);
+      const response = await streamChatMessage(patientId, userMessage, {
+        onToken: (text) => {
+          if (!streaming) {
+            // First token: show the AI bubble and hide the typing indicator
+            streaming = true;
+            setLoading(false);
+            setMessages((prev) => [...prev, { message: text, isUser: false, timestamp: new Date().toISOString() }]);
+            return;
+          }
+          setMessages((prev) => {
+            const last = prev[prev.length - 1];
+            return [...prev.slice(0, -1), { ...last, message: last.message + text }];
+          });
+        },
+      });
 
-      // Add AI response to messages
+      // Replace the streamed text with the final answer and risk details
       const aiMessage = {
         message: response.answer,
         isUser: false,
@@ -87,11 +102,11 @@ const ChatBox = ({ patientId }) => {
         source_documents: response.source_documents,
         timestamp: response.timestamp,
       };
-      setMessages((prev) => [...prev, aiMessage]);
+      setMessages((prev) => [...(streaming ? prev.slice(0, -1) : prev), aiMessage]);
     } catch (err) {
       setError(err.message || 'Failed to send message');
-      // Remove user message on error
-      setMessages((prev) => prev.slice(0, -1));
+      // Remove user message (and any partial answer) on error
+      setMessages((prev) => prev.slice(0, streaming ? -2 : -1));
     } finally {
       setLoading(false);
     }
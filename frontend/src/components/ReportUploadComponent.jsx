@@ -5,7 +5,7 @@
  * This component handles:
  * 1. Report status checking
  * 2. File upload (PDF, Image, Text)
- * 3. Processing feedback
+ * 3. Processing feedback (polls the background indexing job)
  * 4. Blocking message if no report exists
  */
 
@@ -20,6 +20,7 @@ const ReportUploadComponent = ({ patientId, onReportUploaded }) => {
   const [uploadError, setUploadError] = useState(null);
   const [uploadSuccess, setUploadSuccess] = useState(null);
   const [selectedFile, setSelectedFile] = useState(null);
+  const [jobProgress, setJobProgress] = useState(null);
 
   const { theme, isDark } = useTheme();
 
@@ -49,6 +50,24 @@ const ReportUploadComponent = ({ patientId, onReportUploaded }) => {
     }
   };
 
+  /**
+   * Poll an ingestion job until indexing commits or fails
+   */
+  const waitForIngestJob = async (jobId) => {
+    while (true) {
+      const response = await axios.get(`${API_BASE_URL}/api/ingest/jobs/${jobId}`);
+      const job = response.data;
+      setJobProgress(job);
+      if (job.status === 'complete') {
+        return job;
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Indexing failed');
+      }
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+  };
+
   /**
    * Upload medical report to backend
    * Supported formats: PDF, Images (JPG/PNG), Plain Text
@@ -99,15 +118,17 @@ const ReportUploadComponent = ({ patientId, onReportUploaded }) => {
         `${API_BASE_URL}/api/patient/${patientId}/upload-report`,
         formData,
         {
-          timeout: 60000, // 60 seconds for large file processing
+          timeout: 60000, // 60 seconds for large file transfers
         }
       );
 
       console.log('Upload response:', response.data);
 
-      // Upload successful
+      // File received; indexing continues in a background job
+      const job = await waitForIngestJob(response.data.job_id);
+
       setUploadSuccess(
-        `✅ Report uploaded successfully! (${response.data.chunks_count} chunks indexed)`
+        `✅ Report uploaded successfully! (${job.result?.chunks_count ?? job.chunks_done} chunks indexed)`
       );
       setSelectedFile(null);
       
@@ -137,6 +158,7 @@ const ReportUploadComponent = ({ patientId, onReportUploaded }) => {
       setUploadError(`❌ Upload failed: ${errorMsg}`);
     } finally {
       setUploading(false);
+      setJobProgress(null);
     }
   };
 
@@ -347,7 +369,13 @@ const ReportUploadComponent = ({ patientId, onReportUploaded }) => {
               style={buttonStyle}
               disabled={!selectedFile || uploading}
             >
-              {uploading ? 'Uploading...' : '📤 Upload Report'}
+              {!uploading
+                ? '📤 Upload Report'
+                : jobProgress
+                  ? `Indexing (${jobProgress.stage}, ${jobProgress.chunks_done} chunks${
+                      jobProgress.eta_seconds != null ? `, ~${Math.ceil(jobProgress.eta_seconds)}s left` : ''
+                    })...`
+                  : 'Uploading...'}
             </button>
             {selectedFile && (
               <button
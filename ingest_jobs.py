@@ -0,0 +1,432 @@
+"""
+Ingestion Jobs
+Persistent background queue for report uploads
+
+Upload endpoints save the file, enqueue a job and return its id at once; a small
+pool of worker threads runs the registered handler (extract -> chunk -> embed ->
+index) and records stage, pages and chunks done as it goes, so clients can poll
+progress and an ETA. Job state lives in SQLite (INGEST_JOBS_PATH) and may be
+shared by several API processes. A claimed job is leased to the claiming queue,
+which renews the lease (updated_at) while the job runs; a running job whose lease
+is older than INGEST_JOB_LEASE_SECONDS belongs to a process that died and is
+queued again, up to INGEST_MAX_ATTEMPTS attempts. A job can therefore run again
+after its store commit if the process died before the row was marked complete,
+so handlers tag their commit with the job id and skip work that is already
+committed.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlite_pool import ConnectionPool
+
+DEFAULT_JOBS_PATH = os.getenv("INGEST_JOBS_PATH", "ingest_jobs.db")
+DEFAULT_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+# Finished jobs older than this are deleted on start
+DEFAULT_RETENTION_SECONDS = float(os.getenv("INGEST_JOB_RETENTION_SECONDS", str(7 * 86400)))
+# A running job not renewed for this long is considered abandoned
+DEFAULT_LEASE_SECONDS = float(os.getenv("INGEST_JOB_LEASE_SECONDS", "60"))
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_COMPLETE = "complete"
+STATUS_FAILED = "failed"
+
+# Handler signature: handler(job, progress) -> result dict; progress(**fields)
+# accepts stage, pages_done, pages_total and chunks_done
+JobHandler = Callable[[Dict[str, Any], Callable[..., None]], Dict[str, Any]]
+# Finished hook signature: on_finished(job), called once the job is complete or failed
+FinishedHook = Callable[[Dict[str, Any]], None]
+
+_PROGRESS_FIELDS = ("stage", "pages_done", "pages_total", "chunks_done")
+
+
+class IngestJobError(Exception):
+    """Raised by a handler for failures that retrying cannot fix (bad file, no text)"""
+
+
+class IngestJobQueue:
+    """
+    SQLite-backed job queue with a pool of worker threads
+    """
+
+    def __init__(self, path: str = DEFAULT_JOBS_PATH, workers: int = DEFAULT_WORKERS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 retention_seconds: float = DEFAULT_RETENTION_SECONDS,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS, clock=time.time):
+        """
+        Args:
+            path: SQLite file holding job state
+            workers: Jobs processed at once
+            max_attempts: Attempts (including restarts) before a job is marked failed
+            retention_seconds: Age after which finished jobs are purged on start
+            lease_seconds: Time without a lease renewal after which a running job
+                is taken over
+            clock: Wall-clock time source (injectable for tests)
+        """
+        self.path = path
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.retention_seconds = retention_seconds
+        self.lease_seconds = lease_seconds
+        # Identifies the jobs this queue instance is running (host, process, instance)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._clock = clock
+        self._pool = ConnectionPool(path)
+        self._handlers: Dict[str, JobHandler] = {}
+        self._finished_hooks: Dict[str, FinishedHook] = {}
+        self._threads: List[threading.Thread] = []
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._stop_heartbeat = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {"completed": 0, "failed": 0, "retried": 0, "recovered": 0}
+        self._init_database()
+
+    def _init_database(self):
+        """Create jobs table if it doesn't exist"""
+        with self._pool.transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS ingest_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    patient_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    pages_done INTEGER NOT NULL DEFAULT 0,
+                    pages_total INTEGER,
+                    chunks_done INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    updated_at REAL NOT NULL,
+                    finished_at REAL,
+                    owner TEXT
+                )
+            ''')
+            # Files created before job leases lack the owner column
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(ingest_jobs)')}
+            if "owner" not in columns:
+                conn.execute('ALTER TABLE ingest_jobs ADD COLUMN owner TEXT')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_ingest_jobs_status ON ingest_jobs(status, created_at)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_ingest_jobs_patient ON ingest_jobs(patient_id, created_at)')
+
+    def register(self, kind: str, handler: JobHandler, on_finished: Optional[FinishedHook] = None):
+        """
+        Set the function that runs jobs of one kind
+
+        Args:
+            kind: Job kind
+            handler: Runs one attempt of a job
+            on_finished: Called once the job will not run again (e.g. to delete its
+                uploaded file, which retries still need)
+        """
+        self._handlers[kind] = handler
+        if on_finished is not None:
+            self._finished_hooks[kind] = on_finished
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> int:
+        """
+        Requeue abandoned jobs, purge old finished ones and start the workers
+
+        Returns:
+            Number of abandoned jobs queued again
+        """
+        recovered = self._requeue_abandoned()
+        with self._pool.transaction() as conn:
+            conn.execute('DELETE FROM ingest_jobs WHERE status IN (?, ?) AND finished_at < ?',
+                         (STATUS_COMPLETE, STATUS_FAILED, self._clock() - self.retention_seconds))
+
+        with self._wakeup:
+            self._stopping = False
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._run, name=f"ingest-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+        if self._heartbeat_thread is None:
+            self._stop_heartbeat.clear()
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat, name="ingest-heartbeat",
+                                                      daemon=True)
+            self._heartbeat_thread.start()
+        return recovered
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """
+        Stop the workers; a job still running stays 'running' and is taken over
+        once its lease expires
+        """
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        self._stop_heartbeat.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join(timeout)
+            self._heartbeat_thread = None
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        if not self._threads:
+            self._pool.close()
+
+    def _requeue_abandoned(self) -> int:
+        """
+        Queue running jobs whose lease expired again (or fail them once their
+        attempts are used up)
+
+        Returns:
+            Number of jobs queued again
+        """
+        now = self._clock()
+        stale = now - self.lease_seconds
+        with self._pool.transaction() as conn:
+            exhausted = conn.execute('''
+                UPDATE ingest_jobs SET status = ?, error = 'Interrupted ' || attempts || ' time(s)',
+                    updated_at = ?, finished_at = ?, owner = NULL
+                WHERE status = ? AND updated_at < ? AND attempts >= ?
+                RETURNING *
+            ''', (STATUS_FAILED, now, now, STATUS_RUNNING, stale, self.max_attempts)).fetchall()
+            recovered = conn.execute('''
+                UPDATE ingest_jobs SET status = ?, stage = 'queued', updated_at = ?, owner = NULL
+                WHERE status = ? AND updated_at < ?
+            ''', (STATUS_QUEUED, now, STATUS_RUNNING, stale)).rowcount
+        for row in exhausted:
+            self._finished(self._to_dict(row))
+        if recovered:
+            print(f"[INGEST] Requeued {recovered} interrupted job(s)")
+            with self._lock:
+                self._stats["recovered"] += recovered
+            with self._wakeup:
+                self._wakeup.notify_all()
+        return recovered
+
+    def _heartbeat(self):
+        """Renew this queue's leases and take over other processes' abandoned jobs"""
+        while not self._stop_heartbeat.wait(self.lease_seconds / 3):
+            try:
+                with self._pool.transaction() as conn:
+                    conn.execute('UPDATE ingest_jobs SET updated_at = ? WHERE status = ? AND owner = ?',
+                                 (self._clock(), STATUS_RUNNING, self.owner))
+                self._requeue_abandoned()
+            except Exception as e:
+                print(f"[INGEST] Lease renewal failed: {e}")
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+
+    def submit(self, kind: str, patient_id: str, payload: Dict[str, Any]) -> str:
+        """
+        Queue a job
+
+        Args:
+            kind: Registered handler name
+            patient_id: Patient the job indexes for
+            payload: JSON-serializable handler arguments (e.g. saved file paths)
+
+        Returns:
+            New job id
+        """
+        job_id = uuid.uuid4().hex
+        now = self._clock()
+        with self._pool.transaction() as conn:
+            conn.execute('''
+                INSERT INTO ingest_jobs (job_id, patient_id, kind, payload, status, stage,
+                                         created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)
+            ''', (job_id, patient_id, kind, json.dumps(payload), STATUS_QUEUED, now, now))
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Job state and progress
+
+        Returns:
+            Job dict with status, stage, pages/chunks done, progress (0-1 when the
+            page count is known) and eta_seconds, or None for unknown ids
+        """
+        row = self._pool.connection().execute(
+            'SELECT * FROM ingest_jobs WHERE job_id = ?', (job_id,)
+        ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list_jobs(self, patient_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """A patient's most recent jobs, newest first"""
+        rows = self._pool.connection().execute(
+            'SELECT * FROM ingest_jobs WHERE patient_id = ? ORDER BY created_at DESC LIMIT ?',
+            (patient_id, limit)
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def active_jobs(self, patient_id: str) -> List[Dict[str, Any]]:
+        """Queued or running jobs for a patient, oldest first"""
+        rows = self._pool.connection().execute(
+            'SELECT * FROM ingest_jobs WHERE patient_id = ? AND status IN (?, ?) ORDER BY created_at',
+            (patient_id, STATUS_QUEUED, STATUS_RUNNING)
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def _to_dict(self, row) -> Dict[str, Any]:
+        columns = ("job_id", "patient_id", "kind", "payload", "status", "stage", "attempts",
+                   "pages_done", "pages_total", "chunks_done", "result", "error",
+                   "created_at", "started_at", "updated_at", "finished_at", "owner")
+        job = dict(zip(columns, row))
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+
+        progress = eta = None
+        if job["status"] == STATUS_COMPLETE:
+            progress, eta = 1.0, 0.0
+        elif job["status"] == STATUS_RUNNING and job["pages_total"]:
+            progress = min(job["pages_done"] / job["pages_total"], 1.0)
+            if job["pages_done"] and job["started_at"]:
+                elapsed = self._clock() - job["started_at"]
+                eta = round(elapsed * (job["pages_total"] - job["pages_done"]) / job["pages_done"], 1)
+        job["progress"] = round(progress, 3) if progress is not None else None
+        job["eta_seconds"] = eta
+        return job
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically move the oldest queued job to running, leased to this queue"""
+        now = self._clock()
+        with self._pool.transaction() as conn:
+            row = conn.execute('''
+                UPDATE ingest_jobs
+                SET status = ?, stage = 'starting', attempts = attempts + 1, started_at = ?,
+                    updated_at = ?, pages_done = 0, chunks_done = 0, owner = ?
+                WHERE job_id = (
+                    SELECT job_id FROM ingest_jobs WHERE status = ? ORDER BY created_at LIMIT 1
+                )
+                RETURNING *
+            ''', (STATUS_RUNNING, now, now, self.owner, STATUS_QUEUED)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                if self._stopping:
+                    return
+            job = self._claim()
+            if job is None:
+                with self._wakeup:
+                    if not self._stopping:
+                        self._wakeup.wait(timeout=1.0)
+                continue
+            self._process(job)
+
+    def _process(self, job: Dict[str, Any]):
+        job_id = job["job_id"]
+
+        def progress(**fields):
+            updates = {key: value for key, value in fields.items() if key in _PROGRESS_FIELDS}
+            if not updates:
+                return
+            assignments = ", ".join(f"{key} = ?" for key in updates)
+            with self._pool.transaction() as conn:
+                conn.execute(f'UPDATE ingest_jobs SET {assignments}, updated_at = ? '
+                             'WHERE job_id = ? AND owner = ?',
+                             (*updates.values(), self._clock(), job_id, self.owner))
+
+        handler = self._handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise IngestJobError(f"No handler registered for job kind '{job['kind']}'")
+            result = handler(job, progress)
+        except Exception as e:
+            retry = not isinstance(e, IngestJobError) and job["attempts"] < self.max_attempts
+            status = STATUS_QUEUED if retry else STATUS_FAILED
+            print(f"[INGEST] Job {job_id} attempt {job['attempts']} failed: {e}"
+                  + (" (will retry)" if retry else ""))
+            now = self._clock()
+            with self._pool.transaction() as conn:
+                owned = conn.execute('''
+                    UPDATE ingest_jobs SET status = ?, stage = ?, error = ?, updated_at = ?,
+                        finished_at = ?, owner = NULL
+                    WHERE job_id = ? AND owner = ?
+                ''', (status, "queued" if retry else "failed", str(e), now,
+                      None if retry else now, job_id, self.owner)).rowcount
+            if not owned:
+                print(f"[INGEST] Job {job_id} was taken over after its lease expired")
+                return
+            with self._lock:
+                self._stats["retried" if retry else "failed"] += 1
+            if not retry:
+                self._finished(job)
+            return
+
+        now = self._clock()
+        with self._pool.transaction() as conn:
+            owned = conn.execute('''
+                UPDATE ingest_jobs SET status = ?, stage = 'committed', result = ?, error = NULL,
+                    updated_at = ?, finished_at = ?, owner = NULL
+                WHERE job_id = ? AND owner = ?
+            ''', (STATUS_COMPLETE, json.dumps(result, default=str), now, now, job_id,
+                  self.owner)).rowcount
+        if not owned:
+            print(f"[INGEST] Job {job_id} was taken over after its lease expired")
+            return
+        with self._lock:
+            self._stats["completed"] += 1
+        self._finished(job)
+
+    def _finished(self, job: Dict[str, Any]):
+        """Run the kind's on_finished hook; its errors never affect the job row"""
+        hook = self._finished_hooks.get(job["kind"])
+        if hook is None:
+            return
+        try:
+            hook(job)
+        except Exception as e:
+            print(f"[INGEST] Cleanup for job {job['job_id']} failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Queue depth and outcome counters
+
+        Returns:
+            dict with jobs per status, completed/failed/retried/recovered since start
+            and workers
+        """
+        rows = self._pool.connection().execute(
+            'SELECT status, COUNT(*) FROM ingest_jobs GROUP BY status'
+        ).fetchall()
+        with self._lock:
+            stats = dict(self._stats)
+        stats["jobs"] = {status: 0 for status in (STATUS_QUEUED, STATUS_RUNNING, STATUS_COMPLETE, STATUS_FAILED)}
+        stats["jobs"].update(dict(rows))
+        stats["workers"] = self.workers
+        stats["max_attempts"] = self.max_attempts
+        return stats
+
+
+# Singleton instance
+_ingest_queue: Optional[IngestJobQueue] = None
+_ingest_queue_lock = threading.Lock()
+
+def get_ingest_queue() -> IngestJobQueue:
+    """Get or create singleton IngestJobQueue instance"""
+    global _ingest_queue
+    if _ingest_queue is None:
+        with _ingest_queue_lock:
+            if _ingest_queue is None:
+                _ingest_queue = IngestJobQueue()
+    return _ingest_queue
@@ -0,0 +1,351 @@
+"""
+Report Ingest Pipeline
+Streaming extract -> chunk -> embed -> index for uploaded reports
+
+Each stage runs in its own thread and hands work to the next through a bounded
+queue, so a fast stage blocks instead of buffering the whole document:
+
+    extract   pages from pdf_extract (or the whole text for images / .txt)
+    split     cleans each page and emits chunks as soon as they are complete
+    embed     embeds chunks in fixed-size batches
+    index     appends each batch to the patient's mmap store (StoreAppender)
+
+At most PIPELINE_QUEUE_SIZE items wait between two stages, so memory stays flat
+however many pages a report has. The appended rows of every file in a run are
+published with a single manifest commit once the last batch is written; a failed
+upload leaves the patient store exactly as it was.
+"""
+
+import itertools
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from mmap_vector_store import StoreAppender, convert_faiss_directory, is_mmap_store
+from pdf_extract import get_pdf_extractor
+
+DEFAULT_EMBED_BATCH_SIZE = int(os.getenv("PIPELINE_EMBED_BATCH", "32"))
+DEFAULT_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+# Text the splitter buffers before emitting the chunks it is sure about
+SPLIT_WINDOW_CHARS = 4000
+MIN_CHUNK_CHARS = 50
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tiff', '.bmp')
+
+_DONE = object()
+
+
+class PipelineCancelled(Exception):
+    """Raised inside a stage when another stage failed"""
+
+
+class _Stage:
+    """Per-stage counters: items produced and time spent working (not waiting)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0  # time spent blocked on the upstream queue
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "wait_seconds": round(self.wait_seconds, 3),
+            "items_per_second": round(self.items / self.busy_seconds, 1) if self.busy_seconds else None
+        }
+
+
+class IngestPipeline:
+    """
+    Runs one report through the streaming stages into a patient vector store
+    """
+
+    def __init__(self, processor, embed_batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, splitter=None):
+        """
+        Args:
+            processor: ReportProcessor (text extraction, clean_text, splitter, embeddings)
+            embed_batch_size: Chunks per embed_documents call / store append
+            queue_size: Items allowed to wait between two stages
+            splitter: Text splitter to use instead of processor.splitter
+        """
+        self.processor = processor
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.queue_size = max(1, queue_size)
+        self.splitter = splitter
+
+    # ------------------------------------------------------------------
+    # Stages
+    # ------------------------------------------------------------------
+
+    def iter_pages(self, file_path: str, counters: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        """Raw text per page (one item for images and plain text)"""
+        counters = {} if counters is None else counters
+        file_ext = Path(file_path).suffix.lower()
+        if file_ext == '.pdf':
+            for page in get_pdf_extractor().iter_pages(file_path):
+                counters["pages_total"] = page.page_count
+                yield page.text
+        elif file_ext in IMAGE_EXTENSIONS:
+            counters["pages_total"] = 1
+            yield self.processor.extract_text_from_image(file_path)
+        elif file_ext == '.txt':
+            counters["pages_total"] = 1
+            yield self.processor.extract_text_from_plain_text(file_path)
+        else:
+            raise ValueError(f"Unsupported file type: {file_ext}")
+
+    def iter_chunks(self, pages: Iterator[str], counters: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        """
+        Clean pages and split them into chunks without joining the whole document
+
+        Only the text after the last complete chunk is carried over to the next
+        page, so chunks can span page boundaries as with whole-document splitting.
+        """
+        splitter = self.splitter or self.processor.splitter
+        pending = ""
+        for page_text in pages:
+            cleaned = self.processor.clean_text(page_text)
+            if counters is not None:
+                counters["text_chars"] = counters.get("text_chars", 0) + len(cleaned)
+            if not cleaned:
+                continue
+            pending = f"{pending}\n{cleaned}" if pending else cleaned
+            if len(pending) >= SPLIT_WINDOW_CHARS:
+                pieces = splitter.split_text(pending)
+                for piece in pieces[:-1]:
+                    if len(piece.strip()) > MIN_CHUNK_CHARS:
+                        yield piece
+                pending = pieces[-1] if pieces else ""
+        if pending:
+            for piece in splitter.split_text(pending):
+                if len(piece.strip()) > MIN_CHUNK_CHARS:
+                    yield piece
+
+    # ------------------------------------------------------------------
+    # Run
+    # ------------------------------------------------------------------
+
+    def run(self, patient_id: str, file_path: str, store_path: str,
+            metadata: Optional[Dict[str, Any]] = None,
+            on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+            commit_tag: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Ingest one report into a patient store
+
+        Args:
+            patient_id: Patient identifier (stored in chunk metadata)
+            file_path: Uploaded report
+            store_path: Patient vector store directory
+            metadata: Extra metadata for every chunk (source_file, source_type)
+            on_progress: Called after every indexed batch with pages, pages_total,
+                chunks_indexed and elapsed_seconds
+            commit_tag: Recorded with the commit (e.g. the ingestion job id, see committed_tag)
+
+        Returns:
+            dict with chunks_count, pages, text_chars, wall_seconds and per-stage stats
+
+        Raises:
+            ValueError: Unsupported file, too little text, or no usable chunks
+        """
+        return self.run_many(patient_id, [(file_path, metadata)], store_path,
+                             on_progress=on_progress, commit_tag=commit_tag)
+
+    def run_many(self, patient_id: str, sources: Sequence[Tuple[str, Optional[Dict[str, Any]]]],
+                 store_path: str,
+                 on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 commit_tag: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Ingest several files into a patient store with one commit
+
+        Chunks never span two files; chunk_index restarts for each file.
+
+        Args:
+            sources: (file_path, metadata) per file
+            Others as in run
+
+        Returns / Raises:
+            As run
+        """
+        started = time.perf_counter()
+        stages = {name: _Stage(name) for name in ("extract", "split", "embed", "index")}
+        counters: Dict[str, int] = {}
+        stop = threading.Event()
+        errors: List[BaseException] = []
+        pages_q: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        chunks_q: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        vectors_q: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        peak_depth = {"pages": 0, "chunks": 0, "vectors": 0}
+
+        def put(q: "queue.Queue", name: str, item):
+            while True:
+                if stop.is_set():
+                    raise PipelineCancelled()
+                try:
+                    q.put(item, timeout=0.1)
+                    peak_depth[name] = max(peak_depth[name], q.qsize())
+                    return
+                except queue.Full:
+                    continue
+
+        def get(q: "queue.Queue"):
+            while True:
+                if stop.is_set():
+                    raise PipelineCancelled()
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+
+        def drain(q: "queue.Queue", stage: _Stage) -> Iterator[Any]:
+            while True:
+                began = time.perf_counter()
+                item = get(q)
+                stage.wait_seconds += time.perf_counter() - began
+                if item is _DONE:
+                    return
+                yield item
+
+        def timed(stage: _Stage, items: Iterator[Any]) -> Iterator[Any]:
+            """Charge the time spent producing each item (minus upstream waits) to the stage"""
+            while True:
+                began = time.perf_counter()
+                waited = stage.wait_seconds
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+                finally:
+                    stage.busy_seconds += (time.perf_counter() - began) - (stage.wait_seconds - waited)
+                stage.items += 1
+                yield item
+
+        def worker(target: Callable[[], None]):
+            try:
+                target()
+            except PipelineCancelled:
+                pass
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+
+        def extract():
+            pages_before = 0
+            for source_index, (file_path, _) in enumerate(sources):
+                file_counters: Dict[str, int] = {}
+                for page in timed(stages["extract"], self.iter_pages(file_path, file_counters)):
+                    counters["pages_total"] = pages_before + file_counters.get("pages_total", 0)
+                    put(pages_q, "pages", (source_index, page))
+                pages_before += file_counters.get("pages_total", 0)
+            put(pages_q, "pages", _DONE)
+
+        def split():
+            batch: List[Tuple[int, str]] = []
+            pages = drain(pages_q, stages["split"])
+            for source_index, file_pages in itertools.groupby(pages, key=lambda item: item[0]):
+                chunks = self.iter_chunks((text for _, text in file_pages), counters)
+                for chunk in timed(stages["split"], chunks):
+                    batch.append((source_index, chunk))
+                    if len(batch) == self.embed_batch_size:
+                        put(chunks_q, "chunks", batch)
+                        batch = []
+            if batch:
+                put(chunks_q, "chunks", batch)
+            put(chunks_q, "chunks", _DONE)
+
+        def embed():
+            embeddings = self.processor.embeddings
+            for batch in drain(chunks_q, stages["embed"]):
+                began = time.perf_counter()
+                vectors = embeddings.embed_documents([chunk for _, chunk in batch])
+                stages["embed"].busy_seconds += time.perf_counter() - began
+                stages["embed"].items += len(batch)
+                put(vectors_q, "vectors", (batch, vectors))
+            put(vectors_q, "vectors", _DONE)
+
+        threads = [threading.Thread(target=worker, args=(target,), name=f"ingest-{name}", daemon=True)
+                   for name, target in (("extract", extract), ("split", split), ("embed", embed))]
+        for thread in threads:
+            thread.start()
+
+        appender = None
+        created_dir = not os.path.exists(store_path)
+        try:
+            # A legacy FAISS store is converted once so new rows can be appended
+            if os.path.exists(os.path.join(store_path, "index.faiss")) and not is_mmap_store(store_path):
+                success, message = convert_faiss_directory(store_path, self.processor.embeddings)
+                if not success:
+                    raise RuntimeError(message)
+            appender = StoreAppender(store_path)
+
+            index_stage = stages["index"]
+            file_chunks = [0] * len(sources)
+            for batch, vectors in drain(vectors_q, stages["index"]):
+                began = time.perf_counter()
+                timestamp = datetime.utcnow().isoformat()
+                texts, metadatas = [], []
+                for source_index, chunk in batch:
+                    meta = {
+                        "patient_id": patient_id,
+                        "chunk_index": file_chunks[source_index],
+                        "timestamp": timestamp
+                    }
+                    if sources[source_index][1]:
+                        meta.update(sources[source_index][1])
+                    file_chunks[source_index] += 1
+                    texts.append(chunk)
+                    metadatas.append(meta)
+                appender.append(vectors, texts, metadatas)
+                index_stage.busy_seconds += time.perf_counter() - began
+                index_stage.items += len(texts)
+                if on_progress is not None:
+                    on_progress({
+                        "pages": stages["extract"].items,
+                        "pages_total": counters.get("pages_total"),
+                        "chunks_indexed": index_stage.items,
+                        "elapsed_seconds": time.perf_counter() - started
+                    })
+        except PipelineCancelled:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            for thread in threads:
+                thread.join()
+
+        try:
+            if errors:
+                raise errors[0]
+            if counters.get("text_chars", 0) < MIN_CHUNK_CHARS:
+                raise ValueError("Extracted text is too short. Please check the file.")
+            if not appender or not appender.appended:
+                raise ValueError("Could not split text into meaningful chunks.")
+            began = time.perf_counter()
+            appender.commit(tag=commit_tag)
+            stages["index"].busy_seconds += time.perf_counter() - began
+        except BaseException:
+            # Nothing was published; don't leave a manifest-less directory behind
+            if created_dir and os.path.isdir(store_path):
+                shutil.rmtree(store_path, ignore_errors=True)
+            raise
+
+        wall_seconds = time.perf_counter() - started
+        return {
+            "chunks_count": stages["index"].items,
+            "pages": stages["extract"].items,
+            "files": len(sources),
+            "text_chars": counters.get("text_chars", 0),
+            "wall_seconds": round(wall_seconds, 3),
+            "chunks_per_second": round(stages["index"].items / wall_seconds, 1) if wall_seconds else None,
+            "stages": {name: stage.report() for name, stage in stages.items()},
+            "peak_queue_depth": peak_depth,
+            "embed_batch_size": self.embed_batch_size,
+            "queue_size": self.queue_size
+        }
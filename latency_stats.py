@@ -0,0 +1,81 @@
+"""
+Latency Stats
+Rolling per-path latency percentiles for the API (time-to-first-token, totals, ...)
+"""
+
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+DEFAULT_WINDOW = 1000
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+class LatencyStats:
+    """
+    Keeps the last `window` samples per metric name
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        """
+        Args:
+            window: Samples kept per metric
+        """
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        """Add one latency sample"""
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+                self._counts[name] = 0
+            samples.append(seconds)
+            self._counts[name] += 1
+
+    def get_stats(self, name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Percentiles over the recent window
+
+        Args:
+            name: Single metric (default: all metrics)
+
+        Returns:
+            metric -> {count, p50, p95, max, avg} in seconds
+        """
+        with self._lock:
+            names = [name] if name is not None else list(self._samples)
+            snapshot = {n: (sorted(self._samples[n]), self._counts[n]) for n in names if n in self._samples}
+
+        stats = {}
+        for metric, (values, count) in snapshot.items():
+            stats[metric] = {
+                "count": count,
+                "p50": round(_percentile(values, 0.50), 4),
+                "p95": round(_percentile(values, 0.95), 4),
+                "max": round(values[-1], 4),
+                "avg": round(sum(values) / len(values), 4)
+            }
+        return stats
+
+
+# Singleton instance
+_latency_stats: Optional[LatencyStats] = None
+_latency_stats_lock = threading.Lock()
+
+def get_latency_stats() -> LatencyStats:
+    """Get or create singleton LatencyStats instance"""
+    global _latency_stats
+    if _latency_stats is None:
+        with _latency_stats_lock:
+            if _latency_stats is None:
+                _latency_stats = LatencyStats()
+    return _latency_stats
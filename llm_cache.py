@@ -0,0 +1,202 @@
+"""
+LLM Response Cache
+On-disk (SQLite) cache of chat-completion responses for deterministic, repeatable calls
+
+Keys are a SHA-256 of the model, the whitespace-normalized messages and the
+generation parameters. Entries expire after a TTL and the least recently used
+ones are evicted beyond max_entries. Call sites opt in per call (cache=True on
+LLMClient.chat / achat / submit_chat).
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+DEFAULT_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def make_cache_key(model: str, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+    """
+    Stable key for a chat-completion request
+
+    Args:
+        model: Model name
+        messages: OpenAI-style messages (content whitespace is normalized)
+        params: Remaining payload fields (max_tokens, temperature, response_format, ...)
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    normalized = [
+        {**message, "content": _WHITESPACE.sub(" ", str(message.get("content", ""))).strip()}
+        for message in messages
+    ]
+    blob = json.dumps({"model": model, "messages": normalized, "params": params},
+                      sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _total_tokens(response: Dict[str, Any]) -> int:
+    usage = response.get("usage") or {}
+    return int(usage.get("total_tokens") or 0)
+
+
+class LLMResponseCache:
+    """
+    SQLite-backed response cache with TTL and LRU size bound
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, clock=time.time):
+        """
+        Args:
+            path: SQLite file
+            ttl_seconds: Entry lifetime
+            max_entries: Entries kept before least recently used ones are evicted
+            clock: Wall-clock time source (injectable for tests)
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "saved_tokens": 0, "writes": 0, "evictions": 0, "expired": 0}
+        self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _init_database(self):
+        """Create cache table if it doesn't exist"""
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                total_tokens INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access)')
+        conn.commit()
+        conn.close()
+
+    def _count(self, **deltas):
+        with self._lock:
+            for key, delta in deltas.items():
+                self._stats[key] += delta
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached response
+
+        Returns:
+            Parsed response, or None on a miss or expired entry
+        """
+        now = self._clock()
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                'SELECT response, total_tokens, created_at FROM llm_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                self._count(misses=1)
+                return None
+            if now - row[2] > self.ttl_seconds:
+                conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+                conn.commit()
+                self._count(misses=1, expired=1)
+                return None
+            conn.execute('UPDATE llm_cache SET last_access = ? WHERE key = ?', (now, key))
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._count(hits=1, saved_tokens=row[1])
+        return json.loads(row[0])
+
+    def put(self, key: str, response: Dict[str, Any]):
+        """Store a response and evict least recently used entries beyond max_entries"""
+        now = self._clock()
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, response, total_tokens, created_at, last_access) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, json.dumps(response), _total_tokens(response), now, now)
+            )
+            excess = conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    'DELETE FROM llm_cache WHERE key IN '
+                    '(SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)', (excess,)
+                )
+            conn.commit()
+        finally:
+            conn.close()
+        self._count(writes=1, evictions=max(excess, 0))
+
+    def purge_expired(self) -> int:
+        """Delete expired entries, returning how many were removed"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute('DELETE FROM llm_cache WHERE created_at < ?',
+                                  (self._clock() - self.ttl_seconds,))
+            conn.commit()
+            removed = cursor.rowcount
+        finally:
+            conn.close()
+        self._count(expired=removed)
+        return removed
+
+    def clear(self):
+        """Remove every cached response"""
+        conn = self._connect()
+        conn.execute('DELETE FROM llm_cache')
+        conn.commit()
+        conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Report cache effectiveness
+
+        Returns:
+            dict with hits, misses, hit_ratio, saved_tokens, entries and eviction counts
+        """
+        conn = self._connect()
+        try:
+            entries = conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+        finally:
+            conn.close()
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["entries"] = entries
+        stats["max_entries"] = self.max_entries
+        stats["ttl_seconds"] = self.ttl_seconds
+        return stats
+
+
+# Singleton instance
+_llm_cache: Optional[LLMResponseCache] = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_response_cache() -> LLMResponseCache:
+    """Get or create singleton LLMResponseCache instance"""
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMResponseCache()
+    return _llm_cache
@@ -0,0 +1,430 @@
+"""
+LLM Client
+One connection-pooled, async Groq (OpenAI-compatible) chat client for the whole process
+
+All requests run on a single background event loop that owns an httpx.AsyncClient,
+so TLS connections are kept alive and reused across RAGEngine, DailyQuestionGenerator
+and the monitoring endpoints. Async handlers await achat(); synchronous code calls
+chat(), which blocks only the calling thread.
+
+Every call has a timeout, concurrency is bounded by a semaphore, and 429/5xx
+responses and transport errors are retried with jittered exponential backoff.
+astream() relays completion tokens as they arrive (stream=true SSE).
+Deterministic call sites can pass cache=True to reuse responses from the
+on-disk LLMResponseCache (see llm_cache.py).
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from llm_cache import LLMResponseCache, get_llm_response_cache, make_cache_key
+
+load_dotenv()
+
+GROQ_API_BASE = os.getenv("GROQ_API_BASE", "https://api.groq.com/openai/v1")
+DEFAULT_CHAT_MODEL = "llama-3.3-70b-versatile"
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+DEFAULT_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+DEFAULT_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+DEFAULT_BACKOFF_BASE_SECONDS = 0.5
+DEFAULT_BACKOFF_MAX_SECONDS = 8.0
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Raised when a chat completion fails after all retries"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, detail: Any = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class LLMClient:
+    """
+    Shared async chat-completions client with keep-alive pooling and retries
+    """
+
+    def __init__(self, base_url: str = GROQ_API_BASE, api_key: Optional[str] = None,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 timeout: float = DEFAULT_TIMEOUT_SECONDS,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_base: float = DEFAULT_BACKOFF_BASE_SECONDS,
+                 backoff_max: float = DEFAULT_BACKOFF_MAX_SECONDS,
+                 response_cache: Optional[LLMResponseCache] = None):
+        """
+        Args:
+            base_url: API root (chat completions are POSTed to {base_url}/chat/completions)
+            api_key: Bearer token (defaults to GROQ_API_KEY, read at call time)
+            max_concurrency: Max requests in flight at once
+            timeout: Default per-call timeout in seconds
+            max_retries: Retries after the first attempt on 429/5xx/transport errors
+            backoff_base: First backoff ceiling in seconds (doubles per retry)
+            backoff_max: Upper bound on a single backoff
+            response_cache: Cache used by cache=True calls (defaults to the shared on-disk cache)
+        """
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._response_cache = response_cache
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "attempts": 0,
+            "retries": 0,
+            "failures": 0,
+            "in_flight": 0,
+            "waiting": 0,
+            "total_seconds": 0.0
+        }
+
+    # ------------------------------------------------------------------
+    # Background loop
+    # ------------------------------------------------------------------
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the background event loop that owns the HTTP connection pool"""
+        if self._loop is not None:
+            return self._loop
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    self._http = httpx.AsyncClient(
+                        timeout=self.timeout,
+                        limits=httpx.Limits(
+                            max_connections=self.max_concurrency,
+                            max_keepalive_connections=self.max_concurrency
+                        )
+                    )
+                    self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                    ready.set()
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name="llm-client", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+        return self._loop
+
+    def _submit(self, coro):
+        """Schedule a coroutine on the background loop (concurrent.futures.Future)"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    async def achat(self, messages: List[Dict[str, str]], model: str = DEFAULT_CHAT_MODEL,
+                    max_tokens: int = 500, temperature: float = 0.7,
+                    timeout: Optional[float] = None, cache: bool = False,
+                    **params) -> Dict[str, Any]:
+        """
+        Chat completion, awaitable from any event loop
+
+        Args:
+            messages: OpenAI-style message list
+            model: Model name
+            max_tokens: Max completion tokens
+            temperature: Sampling temperature
+            timeout: Per-call timeout in seconds (overrides the client default)
+            cache: Serve/store the response in the on-disk response cache
+                (only for deterministic calls whose answer may be reused)
+            **params: Extra payload fields (e.g. response_format)
+
+        Returns:
+            Parsed JSON response
+
+        Raises:
+            LLMError: On a non-retryable error or once retries are exhausted
+        """
+        future = self._submit(self._chat(messages, model, max_tokens, temperature, timeout, params,
+                                         cache=cache))
+        return await asyncio.wrap_future(future)
+
+    def chat(self, messages: List[Dict[str, str]], model: str = DEFAULT_CHAT_MODEL,
+             max_tokens: int = 500, temperature: float = 0.7,
+             timeout: Optional[float] = None, cache: bool = False,
+             **params) -> Dict[str, Any]:
+        """
+        Blocking chat completion for synchronous callers (same arguments as achat)
+        Must not be called from the event loop thread of an async handler
+        """
+        future = self._submit(self._chat(messages, model, max_tokens, temperature, timeout, params,
+                                         cache=cache))
+        return future.result()
+
+    def submit_chat(self, messages: List[Dict[str, str]], model: str = DEFAULT_CHAT_MODEL,
+                    max_tokens: int = 500, temperature: float = 0.7,
+                    timeout: Optional[float] = None, cache: bool = False,
+                    **params) -> Future:
+        """
+        Start a chat completion without waiting (same arguments as achat)
+
+        Returns:
+            concurrent.futures.Future resolving to the parsed JSON response
+        """
+        return self._submit(self._chat(messages, model, max_tokens, temperature, timeout, params,
+                                       cache=cache))
+
+    async def astream(self, messages: List[Dict[str, str]], model: str = DEFAULT_CHAT_MODEL,
+                      max_tokens: int = 500, temperature: float = 0.7,
+                      timeout: Optional[float] = None, **params) -> AsyncIterator[str]:
+        """
+        Streaming chat completion: yields content deltas as they arrive
+
+        Retries apply only until the response starts; once a token has been
+        yielded a failure is raised to the caller.
+
+        Args:
+            Same as achat
+
+        Yields:
+            Text deltas of the first choice
+
+        Raises:
+            LLMError: On failure before or during the stream
+        """
+        caller_loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def emit(kind: str, value: Any = None):
+            try:
+                caller_loop.call_soon_threadsafe(queue.put_nowait, (kind, value))
+            except RuntimeError:
+                pass  # caller's loop already closed
+
+        future = self._submit(self._chat(messages, model, max_tokens, temperature, timeout,
+                                         params, on_delta=lambda delta: emit("delta", delta)))
+        future.add_done_callback(lambda f: emit("done"))
+        try:
+            while True:
+                kind, value = await queue.get()
+                if kind == "delta":
+                    yield value
+                else:
+                    break
+            future.result()  # re-raise LLMError from the request
+        finally:
+            if not future.done():
+                future.cancel()  # client went away: stop reading the upstream stream
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Report request counts, retries, average latency and response cache stats
+
+        Returns:
+            dict of counters plus max_concurrency, avg_seconds and cache
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        completed = stats["requests"] - stats["in_flight"] - stats["waiting"]
+        stats["avg_seconds"] = round(stats.pop("total_seconds") / completed, 3) if completed else None
+        stats["max_concurrency"] = self.max_concurrency
+        stats["cache"] = self.response_cache.get_stats()
+        return stats
+
+    @property
+    def response_cache(self) -> LLMResponseCache:
+        """Response cache used by cache=True calls"""
+        if self._response_cache is None:
+            self._response_cache = get_llm_response_cache()
+        return self._response_cache
+
+    def close(self):
+        """Close pooled connections and stop the background loop"""
+        with self._start_lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._http is not None:
+            asyncio.run_coroutine_threadsafe(self._http.aclose(), loop).result(timeout=5)
+        asyncio.run_coroutine_threadsafe(loop.shutdown_asyncgens(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=5)
+        self._http = None
+
+    # ------------------------------------------------------------------
+    # Request handling (runs on the background loop)
+    # ------------------------------------------------------------------
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for key, delta in deltas.items():
+                self._stats[key] += delta
+
+    def _backoff_seconds(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Full-jitter exponential backoff, honouring Retry-After when given"""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    async def _chat(self, messages, model, max_tokens, temperature, timeout, params,
+                    on_delta: Optional[Callable[[str], None]] = None,
+                    cache: bool = False) -> Dict[str, Any]:
+        if cache and on_delta is None:
+            cache_key = make_cache_key(model, messages, {"max_tokens": max_tokens,
+                                                         "temperature": temperature, **params})
+            loop = asyncio.get_running_loop()
+            cached = await loop.run_in_executor(None, self.response_cache.get, cache_key)
+            if cached is not None:
+                return cached
+            data = await self._chat(messages, model, max_tokens, temperature, timeout, params)
+            await loop.run_in_executor(None, self.response_cache.put, cache_key, data)
+            return data
+
+        api_key = self.api_key or os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise LLMError("GROQ_API_KEY environment variable not set")
+
+        payload = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            **params
+        }
+        if on_delta is not None:
+            payload["stream"] = True
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+
+        self._count(requests=1)
+        start = time.perf_counter()
+        try:
+            return await self._post_with_retries(payload, headers, timeout or self.timeout, on_delta)
+        except BaseException:
+            self._count(failures=1)
+            raise
+        finally:
+            self._count(total_seconds=time.perf_counter() - start)
+
+    async def _post_with_retries(self, payload, headers, timeout: float,
+                                 on_delta: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        url = f"{self.base_url}/chat/completions"
+        for attempt in range(self.max_retries + 1):
+            self._count(attempts=1)
+            last_attempt = attempt == self.max_retries
+
+            # A concurrency slot is held per attempt, not across backoff sleeps,
+            # so retrying calls don't block fresh ones
+            self._count(waiting=1)
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self._count(waiting=-1)
+            self._count(in_flight=1)
+            try:
+                try:
+                    request = self._http.build_request("POST", url, json=payload, headers=headers, timeout=timeout)
+                    response = await self._http.send(request, stream=on_delta is not None)
+                except httpx.TransportError as e:
+                    if last_attempt:
+                        raise LLMError(f"Request failed: {e}") from e
+                    delay = self._backoff_seconds(attempt)
+                else:
+                    if response.status_code < 400:
+                        if on_delta is None:
+                            try:
+                                return response.json()
+                            except ValueError as e:
+                                raise LLMError(f"Invalid JSON in response: {e}",
+                                               status_code=response.status_code,
+                                               detail=response.text) from e
+                        try:
+                            return await self._read_stream(response, on_delta)
+                        finally:
+                            await response.aclose()
+                    if on_delta is not None:
+                        await response.aread()
+                        await response.aclose()
+                    if response.status_code not in RETRYABLE_STATUS_CODES or last_attempt:
+                        try:
+                            detail = response.json()
+                        except ValueError:
+                            detail = response.text
+                        raise LLMError(f"{response.status_code} - {detail}",
+                                       status_code=response.status_code, detail=detail)
+                    delay = self._backoff_seconds(attempt, response.headers.get("Retry-After"))
+            finally:
+                self._count(in_flight=-1)
+                self._semaphore.release()
+
+            self._count(retries=1)
+            await asyncio.sleep(delay)
+
+    async def _read_stream(self, response: httpx.Response, on_delta: Callable[[str], None]) -> Dict[str, Any]:
+        """
+        Relay an SSE completion stream and rebuild the non-streaming response shape
+
+        Returns:
+            {"choices": [{"message": {"content": full_text}}], "usage": ...}
+        """
+        parts = []
+        usage = None
+        try:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage") or usage
+                for choice in chunk.get("choices", []):
+                    delta = (choice.get("delta") or {}).get("content")
+                    if delta and choice.get("index", 0) == 0:
+                        parts.append(delta)
+                        on_delta(delta)
+        except httpx.TransportError as e:
+            raise LLMError(f"Stream interrupted: {e}") from e
+        return {"choices": [{"message": {"content": "".join(parts)}}], "usage": usage}
+
+
+def message_content(data: Dict[str, Any]) -> str:
+    """Text of the first choice in a chat completion response"""
+    return data["choices"][0]["message"]["content"].strip()
+
+
+# Singleton instance
+_llm_client: Optional[LLMClient] = None
+_llm_client_lock = threading.Lock()
+
+def get_llm_client() -> LLMClient:
+    """Get or create singleton LLMClient instance"""
+    global _llm_client
+    if _llm_client is None:
+        with _llm_client_lock:
+            if _llm_client is None:
+                _llm_client = LLMClient()
+    return _llm_client
@@ -0,0 +1,527 @@
+"""
+Memory-Mapped Vector Store
+Zero-copy on-disk format for patient and shared vector stores
+
+Directory layout (format "mmap-v1"):
+    vectors.f32          raw float32 vectors, row-major (count x dim)
+    ids.i64              int64 chunk id per row
+    chunks.* / col_*     columnar chunk text + metadata (see chunk_store.py)
+    manifest.json        dim/count/metric plus a log of tagged commits; written
+                         last and acts as the commit marker
+
+Files are opened with mmap, so resident memory only grows with the pages a
+search actually touches, and forked workers share them through the page cache.
+Appends write past the committed rows and then replace manifest.json, so
+readers never see a partially written chunk. Rewriting an existing store builds
+it in a staging directory and renames it into place: files a reader has mapped
+are never truncated (touching a vanished page would raise SIGBUS).
+
+Usage:
+    python mmap_vector_store.py --convert                  # migrate every dir in "vector store/"
+    python mmap_vector_store.py --convert "vector store/shared"
+"""
+
+import json
+import os
+import pickle
+import shutil
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from chunk_store import CHUNK_FILES, ChunkStore, append_chunks, remove_chunk_files, truncate_to
+
+FORMAT_NAME = "mmap-v1"
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.f32"
+IDS_FILE = "ids.i64"
+
+VECTOR_STORE_ROOT = "vector store"
+# Tagged commits remembered in the manifest (lets ingestion jobs detect they already ran)
+COMMIT_LOG_SIZE = int(os.getenv("STORE_COMMIT_LOG_SIZE", "200"))
+# Everything a store rewrite replaces; other files (e.g. legacy FAISS) are kept
+_STORE_FILES = {MANIFEST_FILE, MANIFEST_FILE + ".tmp", VECTORS_FILE, IDS_FILE,
+                *CHUNK_FILES}
+
+
+def _manifest_format(path: str) -> Optional[str]:
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f).get("format")
+    except (OSError, ValueError):
+        return None
+
+
+def is_mmap_store(path: str) -> bool:
+    """Check whether a directory holds a committed store in the current mmap format"""
+    return _manifest_format(path) == FORMAT_NAME
+
+
+def store_version(path: str) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) of a store's commit file (manifest.json or index.faiss), or None if missing"""
+    for name in (MANIFEST_FILE, "index.faiss"):
+        try:
+            stat = os.stat(os.path.join(path, name))
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            continue
+    return None
+
+
+def committed_tag(path: str, tag: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up a tagged commit in a store's commit log
+
+    Returns:
+        {tag, rows, count} recorded by StoreAppender.commit(tag=...), or None
+    """
+    if not is_mmap_store(path):
+        return None
+    for entry in _read_manifest(path).get("commits", []):
+        if entry["tag"] == tag:
+            return entry
+    return None
+
+
+def _read_manifest(path: str) -> Dict[str, Any]:
+    with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_NAME:
+        raise ValueError(f"Unsupported vector store format: {manifest.get('format')}")
+    return manifest
+
+
+def _write_manifest(path: str, manifest: Dict[str, Any]):
+    """Atomically replace manifest.json (the commit point)"""
+    tmp_path = os.path.join(path, MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(path, MANIFEST_FILE))
+
+
+def _map_array(file_path: str, dtype, count: int, shape=None) -> np.ndarray:
+    """Read-only zero-copy view of the first `count` items of a raw array file"""
+    if count == 0:
+        return np.empty(shape if shape else (0,), dtype=dtype)
+    return np.memmap(file_path, dtype=dtype, mode="r", shape=shape or (count,))
+
+
+class MmapVectorStore(VectorStore):
+    """
+    LangChain-compatible vector store backed by memory-mapped files
+
+    Distances are squared L2, matching FAISS IndexFlatL2, so scores from this
+    store and legacy FAISS stores are directly comparable (lower is closer).
+    """
+
+    def __init__(self, path: str, embedding: Embeddings):
+        """
+        Open an existing store with zero copy
+
+        Args:
+            path: Store directory (must contain manifest.json)
+            embedding: Embedding model used for queries and appends
+        """
+        self.path = path
+        self.embedding = embedding
+        self._open()
+
+    def _open(self):
+        """Map the committed portion of every file"""
+        manifest = _read_manifest(self.path)
+        self.dim = int(manifest["dim"])
+        self.count = int(manifest["count"])
+        self._manifest = manifest
+
+        self._vectors = _map_array(os.path.join(self.path, VECTORS_FILE), np.float32,
+                                   self.count, (self.count, self.dim))
+        self._ids = _map_array(os.path.join(self.path, IDS_FILE), np.int64, self.count)
+        self.chunks = ChunkStore(self.path, self.count, int(manifest["text_bytes"]))
+        self._norms = None
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding
+
+    # ------------------------------------------------------------------
+    # Row access
+    # ------------------------------------------------------------------
+
+    def get_text(self, row: int) -> str:
+        """Decode a single chunk's text"""
+        return self.chunks.get_text(row)
+
+    def get_metadata(self, row: int) -> Dict[str, Any]:
+        """Decode a single chunk's metadata"""
+        return self.chunks.get_metadata(row)
+
+    def get_document(self, row: int) -> Document:
+        """Build a Document for one row (only done for returned results)"""
+        return self.chunks.get_document(row)
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def _search_rows(self, query_vector: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Exact squared-L2 search over the mapped vectors"""
+        if self.count == 0 or k <= 0:
+            return []
+        if self._norms is None:
+            self._norms = np.einsum("ij,ij->i", self._vectors, self._vectors)
+
+        q = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        distances = self._norms - 2.0 * (self._vectors @ q) + float(q @ q)
+
+        k = min(k, self.count)
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        return [(int(row), float(max(distances[row], 0.0))) for row in top]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               **kwargs: Any) -> List[Tuple[Document, float]]:
+        return [(self.get_document(row), score) for row, score in self._search_rows(embedding, k)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  **kwargs: Any) -> List[str]:
+        """Embed and append texts; returns the new chunk ids"""
+        texts = list(texts)
+        vectors = self.embedding.embed_documents(texts)
+        return self.add_vectors(vectors, texts, metadatas)
+
+    def add_vectors(self, vectors, texts: List[str],
+                    metadatas: Optional[List[dict]] = None) -> List[str]:
+        """
+        Append pre-computed vectors and commit them
+
+        Args:
+            vectors: Array-like of shape (n, dim)
+            texts: Chunk texts
+            metadatas: Optional per-chunk metadata
+
+        Returns:
+            List of new chunk ids (as strings)
+        """
+        first_id = int(self._ids[-1]) + 1 if self.count else 0
+        ids = _append_rows(self.path, self._manifest, vectors, texts, metadatas, first_id)
+        self._open()
+        return [str(i) for i in ids]
+
+    @classmethod
+    def create(cls, path: str, embedding: Embeddings, vectors, texts: List[str],
+               metadatas: Optional[List[dict]] = None,
+               ids: Optional[List[int]] = None) -> "MmapVectorStore":
+        """
+        Write a new store directory from pre-computed vectors
+
+        Args:
+            path: Target directory (created if missing; an existing store is rebuilt
+                in a staging directory and swapped in, other files are kept)
+            embedding: Embedding model for the returned store
+            vectors: Array-like of shape (n, dim)
+            texts: Chunk texts
+            metadatas: Optional per-chunk metadata
+            ids: Optional chunk ids (defaults to 0..n-1)
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2:
+            raise ValueError("vectors must be a 2-D array")
+
+        if not _has_store_files(path):
+            manifest = _prepare_new_store(path, int(vectors.shape[1]))
+            _append_rows(path, manifest, vectors, texts, metadatas, 0, ids=ids)
+            return cls(path, embedding)
+
+        # Other processes may have the current files mapped: never rewrite them in place
+        staging_path = f"{path}.staging-{os.getpid()}"
+        if os.path.exists(staging_path):
+            shutil.rmtree(staging_path)
+        os.makedirs(staging_path)
+        for name in os.listdir(path):
+            if name not in _STORE_FILES and os.path.isfile(os.path.join(path, name)):
+                _link_or_copy(os.path.join(path, name), os.path.join(staging_path, name))
+        manifest = _prepare_new_store(staging_path, int(vectors.shape[1]))
+        _append_rows(staging_path, manifest, vectors, texts, metadatas, 0, ids=ids)
+        swap_in_directory(staging_path, path)
+        return cls(path, embedding)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings,
+                   metadatas: Optional[List[dict]] = None, **kwargs: Any) -> "MmapVectorStore":
+        """Embed texts and write a new store at kwargs['path']"""
+        path = kwargs.get("path")
+        if not path:
+            raise ValueError("MmapVectorStore.from_texts requires path=...")
+        vectors = embedding.embed_documents(list(texts))
+        return cls.create(path, embedding, vectors, list(texts), metadatas)
+
+
+def _has_store_files(path: str) -> bool:
+    return any(os.path.exists(os.path.join(path, name)) for name in (MANIFEST_FILE, VECTORS_FILE, IDS_FILE))
+
+
+def _link_or_copy(source: str, target: str):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def swap_in_directory(new_path: str, target_path: str):
+    """
+    Replace target_path with new_path using renames only
+
+    Open readers keep their mapped files (the old inodes live until unmapped).
+
+    Args:
+        new_path: Fully written directory
+        target_path: Directory to replace
+    """
+    if not os.path.exists(target_path):
+        os.rename(new_path, target_path)
+        return
+
+    retired_path = f"{target_path}.old-{time.time_ns()}"
+    os.rename(target_path, retired_path)
+    os.rename(new_path, target_path)
+    shutil.rmtree(retired_path, ignore_errors=True)
+
+
+def _prepare_new_store(path: str, dim: int) -> Dict[str, Any]:
+    """
+    Clear a directory for a new store and return its empty (unwritten) manifest
+
+    Old store files are unlinked, never truncated, so a reader still mapping
+    them keeps valid pages.
+    """
+    os.makedirs(path, exist_ok=True)
+    for name in (MANIFEST_FILE, VECTORS_FILE, IDS_FILE):
+        if os.path.exists(os.path.join(path, name)):
+            os.remove(os.path.join(path, name))
+    remove_chunk_files(path)
+    return {
+        "format": FORMAT_NAME,
+        "dim": dim,
+        "count": 0,
+        "metric": "l2",
+        "text_bytes": 0
+    }
+
+
+def _append_rows(path: str, manifest: Dict[str, Any], vectors, texts: List[str],
+                 metadatas: Optional[List[dict]], first_id: int,
+                 ids: Optional[List[int]] = None, commit: bool = True) -> List[int]:
+    """
+    Append rows after the rows counted in manifest and (by default) publish them
+    via manifest.json
+
+    Args:
+        commit: False only updates the in-memory manifest; the rows stay invisible
+            to readers until it is written
+
+    Returns:
+        ids of the appended rows
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count = int(manifest["count"])
+    dim = int(manifest["dim"])
+    n = len(texts)
+    if vectors.shape != (n, dim):
+        raise ValueError(f"Expected vectors of shape ({n}, {dim}), got {vectors.shape}")
+    if ids is None:
+        ids = list(range(first_id, first_id + n))
+
+    vectors_path = os.path.join(path, VECTORS_FILE)
+    ids_path = os.path.join(path, IDS_FILE)
+
+    # Discard anything written after the last commit
+    truncate_to(vectors_path, count * dim * 4)
+    truncate_to(ids_path, count * 8)
+
+    text_bytes = append_chunks(path, count, int(manifest["text_bytes"]), texts, metadatas)
+    with open(vectors_path, "ab") as f:
+        f.write(vectors.tobytes())
+    with open(ids_path, "ab") as f:
+        f.write(np.asarray(ids, dtype=np.int64).tobytes())
+
+    manifest["text_bytes"] = text_bytes
+    manifest["count"] = count + n
+    if commit:
+        _write_manifest(path, manifest)
+    return list(ids)
+
+
+class StoreAppender:
+    """
+    Streams batches of rows into a (new or existing) store and publishes them
+    together on commit()
+
+    Readers keep seeing the previously committed rows while batches are written;
+    an appender that is never committed leaves the store unchanged (its bytes are
+    truncated by the next append).
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Store directory (an mmap store, or missing/empty for a new one)
+        """
+        self.path = path
+        self.appended = 0
+        self.created = not is_mmap_store(path)
+        self._manifest: Optional[Dict[str, Any]] = None if self.created else _read_manifest(path)
+        self._next_id = 0
+        if self._manifest is not None and int(self._manifest["count"]):
+            count = int(self._manifest["count"])
+            self._next_id = int(_map_array(os.path.join(path, IDS_FILE), np.int64, count)[-1]) + 1
+
+    def append(self, vectors, texts: List[str], metadatas: Optional[List[dict]] = None) -> List[int]:
+        """Write one batch past the committed rows (not yet visible to readers)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2:
+            raise ValueError("vectors must be a 2-D array")
+        if self._manifest is None:
+            self._manifest = _prepare_new_store(self.path, int(vectors.shape[1]))
+        ids = _append_rows(self.path, self._manifest, vectors, texts, metadatas,
+                           self._next_id, commit=False)
+        self._next_id += len(ids)
+        self.appended += len(ids)
+        return ids
+
+    def commit(self, tag: Optional[str] = None) -> int:
+        """
+        Publish every appended batch by writing manifest.json
+
+        Args:
+            tag: Recorded in the manifest's commit log in the same write (see committed_tag)
+
+        Returns:
+            Committed row count
+        """
+        if self._manifest is None:
+            raise ValueError("Nothing appended to commit")
+        if tag is not None:
+            log = self._manifest.setdefault("commits", [])
+            log.append({"tag": tag, "rows": self.appended, "count": int(self._manifest["count"])})
+            del log[:-COMMIT_LOG_SIZE]
+        _write_manifest(self.path, self._manifest)
+        return int(self._manifest["count"])
+
+
+def faiss_to_arrays(index, docstore, index_to_docstore_id: Dict[int, str]) -> Tuple[np.ndarray, List[str], List[dict], List[int]]:
+    """
+    Extract vectors, texts and metadata from a FAISS index + docstore, in row order
+
+    Returns:
+        (vectors, texts, metadatas, ids)
+    """
+    ntotal = index.ntotal
+    vectors = index.reconstruct_n(0, ntotal) if ntotal else np.empty((0, index.d), dtype=np.float32)
+    texts, metadatas, ids = [], [], []
+    for row in range(ntotal):
+        doc = docstore.search(index_to_docstore_id[row])
+        texts.append(doc.page_content)
+        metadatas.append(dict(doc.metadata or {}))
+        ids.append(row)
+    return vectors, texts, metadatas, ids
+
+
+def open_vector_store(path: str, embedding: Embeddings):
+    """
+    Open a vector store directory in whichever format it uses
+
+    Returns:
+        MmapVectorStore for mmap-format directories, FAISS for legacy ones
+    """
+    if is_mmap_store(path):
+        return MmapVectorStore(path, embedding)
+
+    from langchain_community.vectorstores import FAISS
+    return FAISS.load_local(path, embedding, allow_dangerous_deserialization=True)
+
+
+def convert_faiss_directory(path: str, embedding: Optional[Embeddings] = None) -> Tuple[bool, str]:
+    """
+    Migrate a legacy index.faiss/index.pkl directory to the mmap format in place
+    The legacy files are left untouched so the migration can be rolled back
+
+    Returns:
+        (success: bool, message: str)
+    """
+    import faiss
+
+    if is_mmap_store(path):
+        return True, f"{path}: already in {FORMAT_NAME} format"
+
+    index_file = os.path.join(path, "index.faiss")
+    pickle_file = os.path.join(path, "index.pkl")
+    if not (os.path.isfile(index_file) and os.path.isfile(pickle_file)):
+        return False, f"{path}: no index.faiss/index.pkl found"
+
+    try:
+        index = faiss.read_index(index_file)
+        with open(pickle_file, "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        vectors, texts, metadatas, ids = faiss_to_arrays(index, docstore, index_to_docstore_id)
+        MmapVectorStore.create(path, embedding, vectors, texts, metadatas, ids=ids)
+        return True, f"{path}: converted {len(texts)} chunks"
+    except Exception as e:
+        return False, f"{path}: conversion failed: {e}"
+
+
+def convert_all(root: str = VECTOR_STORE_ROOT) -> Dict[str, Any]:
+    """Convert every legacy store directory under root"""
+    results = {"converted": [], "failed": []}
+    if not os.path.isdir(root):
+        return results
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if not os.path.isdir(path):
+            continue
+        success, message = convert_faiss_directory(path)
+        print(("✅ " if success else "❌ ") + message)
+        results["converted" if success else "failed"].append(path)
+    return results
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("VECTOR STORE MMAP CONVERTER")
+    print("=" * 60)
+
+    if "--convert" not in sys.argv:
+        print('Usage: python mmap_vector_store.py --convert ["vector store/<name>" ...]')
+        sys.exit(1)
+
+    targets = [arg for arg in sys.argv[1:] if arg != "--convert"]
+    if targets:
+        failed = 0
+        for target in targets:
+            success, message = convert_faiss_directory(target)
+            print(("✅ " if success else "❌ ") + message)
+            failed += 0 if success else 1
+    else:
+        failed = len(convert_all()["failed"])
+
+    print("=" * 60)
+    sys.exit(1 if failed else 0)
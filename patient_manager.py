@@ -6,12 +6,92 @@ Handles patient registration, authentication, and data isolation with SQLite
 import sqlite3
 import json
 import hashlib
+import base64
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Callable, Iterator, Tuple
 import os
+import time
+
+from db_migrations import get_schema_version, migrate, source_chunk_hash
+from sqlite_pool import ConnectionPool
 
 DB_PATH = "patient_data.db"
 
+# Columns query_patient_history can project
+HISTORY_COLUMNS = ("id", "question", "answer", "risk_level", "risk_reason",
+                   "source_documents", "timestamp")
+
+
+class LazySourceDocuments:
+    """
+    source_documents of a history row, resolved from source_chunks on first read
+    """
+
+    __slots__ = ("message_id", "_resolver", "_decoded")
+
+    def __init__(self, message_id: int, resolver: Callable[[int], List[str]]):
+        self.message_id = message_id
+        self._resolver = resolver
+        self._decoded: Optional[List[str]] = None
+
+    def decode(self) -> List[str]:
+        """Resolve the chunk references once and return the list"""
+        if self._decoded is None:
+            self._decoded = self._resolver(self.message_id)
+        return self._decoded
+
+    def __iter__(self):
+        return iter(self.decode())
+
+    def __len__(self) -> int:
+        return len(self.decode())
+
+    def __getitem__(self, index):
+        return self.decode()[index]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, LazySourceDocuments):
+            other = other.decode()
+        return self.decode() == other
+
+    def __repr__(self) -> str:
+        state = "decoded" if self._decoded is not None else "unresolved"
+        return f"LazySourceDocuments(message {self.message_id}, {state})"
+
+
+class _SourceDocumentResolver:
+    """Resolves the source documents of one history page in a single query"""
+
+    def __init__(self, manager: "PatientManager", message_ids: List[int]):
+        self._manager = manager
+        self._message_ids = message_ids
+        self._documents: Optional[Dict[int, List[str]]] = None
+
+    def __call__(self, message_id: int) -> List[str]:
+        if self._documents is None:
+            self._documents = self._manager.get_source_documents(self._message_ids)
+        return list(self._documents.get(message_id, []))
+
+
+def encode_history_cursor(ts: Optional[int], message_id: int) -> str:
+    """Opaque keyset cursor for the (ts, id) position of a history row"""
+    return base64.urlsafe_b64encode(f"{ts or 0}:{message_id}".encode()).decode().rstrip("=")
+
+
+def decode_history_cursor(cursor: str) -> Tuple[int, int]:
+    """
+    Inverse of encode_history_cursor
+
+    Raises:
+        ValueError: cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, message_id = raw.split(":")
+        return int(ts), int(message_id)
+    except Exception:
+        raise ValueError(f"Invalid history cursor: {cursor!r}")
+
 
 class PatientManager:
     """
@@ -19,16 +99,27 @@ class PatientManager:
     Ensures data isolation and secure patient records
     """
     
-    def __init__(self):
-        """Initialize database and create tables if needed"""
-        self.db_path = DB_PATH
+    def __init__(self, db_path: str = DB_PATH):
+        """
+        Initialize database and create tables if needed
+        
+        Args:
+            db_path: SQLite database file
+        """
+        self.db_path = db_path
+        # Per-thread WAL connections: no connect/close per call, concurrent
+        # readers, and writers wait for the lock instead of failing
+        self._pool = ConnectionPool(db_path)
         self._init_database()
     
     def _init_database(self):
-        """Create database schema if it doesn't exist"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        """Create database schema if it doesn't exist and apply pending migrations"""
+        with self._pool.transaction() as conn:
+            self._create_schema(conn.cursor())
+        migrate(self._pool.connection())
+    
+    def _create_schema(self, cursor: sqlite3.Cursor):
+        """Create the base (version 0) tables; later changes live in db_migrations"""
         # Patients table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS patients (
@@ -70,9 +161,16 @@ class PatientManager:
                 FOREIGN KEY (patient_id) REFERENCES patients(patient_id) ON DELETE CASCADE
             )
         ''')
-        
-        conn.commit()
-        conn.close()
+    
+    def close(self):
+        """Close pooled database connections"""
+        self._pool.close()
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Connection pool counters and schema version"""
+        stats = self._pool.get_stats()
+        stats["schema_version"] = get_schema_version(self._pool.connection())
+        return stats
     
     def register_patient(self, patient_id: str, name: str, email: Optional[str] = None, 
                         age: Optional[int] = None, medical_history: str = "") -> Dict[str, Any]:
@@ -90,16 +188,11 @@ class PatientManager:
             Success response with patient details
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO patients (patient_id, name, email, age, medical_history)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (patient_id, name, email, age, medical_history))
-            
-            conn.commit()
-            conn.close()
+            with self._pool.transaction() as conn:
+                conn.execute('''
+                    INSERT INTO patients (patient_id, name, email, age, medical_history)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (patient_id, name, email, age, medical_history))
             
             return {
                 "success": True,
@@ -121,12 +214,8 @@ class PatientManager:
         Returns:
             Patient dict or None if not found
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM patients WHERE patient_id = ?', (patient_id,))
+        cursor = self._pool.connection().execute('SELECT * FROM patients WHERE patient_id = ?', (patient_id,))
         row = cursor.fetchone()
-        conn.close()
         
         if not row:
             return None
@@ -143,12 +232,10 @@ class PatientManager:
     
     def get_all_patients(self) -> List[Dict[str, Any]]:
         """Get list of all registered patients"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT patient_id, name, email, age, created_at FROM patients ORDER BY last_accessed DESC')
+        cursor = self._pool.connection().execute(
+            'SELECT patient_id, name, email, age, created_at FROM patients ORDER BY last_accessed DESC'
+        )
         rows = cursor.fetchall()
-        conn.close()
         
         return [
             {
@@ -177,70 +264,296 @@ class PatientManager:
         Returns:
             Success status
         """
-        # Verify patient exists
-        if not self.get_patient(patient_id):
-            return False
+        return self.insert_chat_message(
+            patient_id, question, answer, risk_level, risk_reason, source_documents
+        ) is not None
+    
+    def insert_chat_message(self, patient_id: str, question: str, answer: str,
+                            risk_level: str, risk_reason: str,
+                            source_documents: List[str] = None) -> Optional[int]:
+        """
+        Save chat message to patient history and return its row id
         
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+        Args:
+            Same as save_chat_message
             
-            docs_json = json.dumps(source_documents or [])
+        Returns:
+            chat_history id, or None on failure
+        """
+        return self.insert_chat_messages([{
+            "patient_id": patient_id,
+            "question": question,
+            "answer": answer,
+            "risk_level": risk_level,
+            "risk_reason": risk_reason,
+            "source_documents": source_documents
+        }])[0]
+    
+    def insert_chat_messages(self, messages: List[Dict[str, Any]]) -> List[Optional[int]]:
+        """
+        Save several chat messages in one transaction (used by the chat write-behind queue)
+        
+        Args:
+            messages: dicts with the save_chat_message arguments
             
-            cursor.execute('''
-                INSERT INTO chat_history 
-                (patient_id, question, answer, risk_level, risk_reason, source_documents)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (patient_id, question, answer, risk_level, risk_reason, docs_json))
+        Returns:
+            chat_history id per message (None for unknown patients or on failure)
+        """
+        try:
+            with self._pool.transaction() as conn:
+                # One last_accessed touch per patient; doubles as the patient-exists check
+                # (no separate get_patient round trip)
+                known = set()
+                for patient_id in dict.fromkeys(m["patient_id"] for m in messages):
+                    cursor = conn.execute(
+                        'UPDATE patients SET last_accessed = CURRENT_TIMESTAMP WHERE patient_id = ?',
+                        (patient_id,)
+                    )
+                    if cursor.rowcount:
+                        known.add(patient_id)
+                
+                ids = []
+                chunk_ids: Dict[bytes, int] = {}
+                for m in messages:
+                    if m["patient_id"] not in known:
+                        ids.append(None)
+                        continue
+                    cursor = conn.execute('''
+                        INSERT INTO chat_history 
+                        (patient_id, question, answer, risk_level, risk_reason, ts)
+                        VALUES (?, ?, ?, ?, ?, CAST(strftime('%s', 'now') AS INTEGER))
+                    ''', (m["patient_id"], m["question"], m["answer"], m["risk_level"],
+                          m["risk_reason"]))
+                    ids.append(cursor.lastrowid)
+                    self._insert_source_refs(conn, cursor.lastrowid,
+                                             m.get("source_documents") or [], chunk_ids)
+                return ids
+        except Exception as e:
+            print(f"Error saving chat message: {e}")
+            return [None] * len(messages)
+    
+    def _insert_source_refs(self, conn: sqlite3.Connection, message_id: int,
+                            documents: List[str], chunk_ids: Dict[bytes, int]):
+        """Store each document once in source_chunks and reference it from chat_sources"""
+        refs = []
+        for position, content in enumerate(documents):
+            digest = source_chunk_hash(content)
+            chunk_id = chunk_ids.get(digest)
+            if chunk_id is None:
+                conn.execute('INSERT OR IGNORE INTO source_chunks (hash, content) VALUES (?, ?)',
+                             (digest, content))
+                chunk_id = conn.execute('SELECT id FROM source_chunks WHERE hash = ?',
+                                        (digest,)).fetchone()[0]
+                chunk_ids[digest] = chunk_id
+            refs.append((message_id, position, chunk_id))
+        if refs:
+            conn.executemany(
+                'INSERT INTO chat_sources (message_id, position, chunk_id) VALUES (?, ?, ?)', refs
+            )
+    
+    def get_source_documents(self, message_ids: List[int]) -> Dict[int, List[str]]:
+        """
+        Resolve the source documents of several chat messages
+        
+        Args:
+            message_ids: chat_history ids
             
-            # Update last_accessed timestamp
-            cursor.execute('UPDATE patients SET last_accessed = CURRENT_TIMESTAMP WHERE patient_id = ?', 
-                          (patient_id,))
+        Returns:
+            dict of message id -> documents in their original order
+        """
+        documents: Dict[int, List[str]] = {message_id: [] for message_id in message_ids}
+        conn = self._pool.connection()
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(message_ids), 500):
+            batch = message_ids[start:start + 500]
+            rows = conn.execute(f'''
+                SELECT s.message_id, c.content
+                FROM chat_sources s JOIN source_chunks c ON c.id = s.chunk_id
+                WHERE s.message_id IN ({", ".join("?" * len(batch))})
+                ORDER BY s.message_id, s.position
+            ''', batch).fetchall()
+            for message_id, content in rows:
+                documents[message_id].append(content)
+        return documents
+    
+    def _prune_source_chunks(self, conn: sqlite3.Connection) -> int:
+        """Delete chunks no chat message references any more"""
+        cursor = conn.execute('''
+            DELETE FROM source_chunks
+            WHERE NOT EXISTS (SELECT 1 FROM chat_sources WHERE chunk_id = source_chunks.id)
+        ''')
+        return cursor.rowcount
+    
+    def update_chat_risk(self, message_id: int, risk_level: str, risk_reason: str) -> bool:
+        """
+        Set the risk result of a saved chat message (deferred risk assessment)
+        
+        Args:
+            message_id: chat_history id
+            risk_level: Medical risk level
+            risk_reason: Risk explanation
             
-            conn.commit()
-            conn.close()
-            return True
+        Returns:
+            Success status
+        """
+        try:
+            with self._pool.transaction() as conn:
+                cursor = conn.execute(
+                    'UPDATE chat_history SET risk_level = ?, risk_reason = ? WHERE id = ?',
+                    (risk_level, risk_reason, message_id)
+                )
+                return cursor.rowcount > 0
         except Exception as e:
-            print(f"Error saving chat message: {e}")
+            print(f"Error updating chat risk: {e}")
             return False
     
+    def record_answer_cache_hit(self, record: Dict[str, Any]):
+        """
+        Append a semantic answer cache hit to the audit trail
+        
+        Args:
+            record: Hit with timestamp, patient_id, question, cached_question,
+                similarity, age_seconds and store_version
+        
+        Raises:
+            sqlite3.Error: The hit could not be recorded (the cached answer must not be served)
+        """
+        with self._pool.transaction() as conn:
+            conn.execute('''
+                INSERT INTO answer_cache_hits (patient_id, question, cached_question, similarity,
+                                               age_seconds, store_version, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (record["patient_id"], record["question"], record["cached_question"],
+                  record["similarity"], record["age_seconds"],
+                  json.dumps(record["store_version"]), record["timestamp"]))
+    
+    def get_answer_cache_hits(self, patient_id: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Recorded answer cache hits, newest first
+        
+        Args:
+            patient_id: Only hits for this patient (default: all)
+            limit: Max records returned
+        """
+        where, params = ("WHERE patient_id = ?", (patient_id,)) if patient_id is not None else ("", ())
+        rows = self._pool.connection().execute(f'''
+            SELECT timestamp, patient_id, question, cached_question, similarity, age_seconds, store_version
+            FROM answer_cache_hits {where} ORDER BY id DESC LIMIT ?
+        ''', (*params, limit)).fetchall()
+        columns = ("timestamp", "patient_id", "question", "cached_question", "similarity",
+                   "age_seconds", "store_version")
+        records = [dict(zip(columns, row)) for row in rows]
+        for record in records:
+            record["store_version"] = json.loads(record["store_version"]) if record["store_version"] else None
+        return records
+    
     def get_patient_history(self, patient_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """
         Retrieve chat history for a specific patient
-        
+
         Args:
             patient_id: Patient identifier
             limit: Maximum number of recent messages
-            
+
         Returns:
             List of chat messages (most recent first)
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, question, answer, risk_level, risk_reason, source_documents, timestamp
+        page = self.query_patient_history(patient_id, limit=limit)
+        for message in page["items"]:
+            message["source_documents"] = message["source_documents"].decode()
+        return page["items"]
+
+    def query_patient_history(self, patient_id: str, columns: Optional[List[str]] = None,
+                              limit: int = 50, cursor: Optional[str] = None,
+                              before_id: Optional[int] = None,
+                              before_ts: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Page through a patient's chat history, newest page first
+
+        Keyset pagination on (ts, id) walks the (patient_id, ts) index from the
+        newest message backwards, so every page costs the same however deep it is.
+        Only the requested columns are read, and source_documents is returned as
+        LazySourceDocuments (resolved from source_chunks, for the whole page in one
+        query, on first access).
+
+        Args:
+            patient_id: Patient identifier
+            columns: Columns to return (default: all of HISTORY_COLUMNS); id is always included
+            limit: Maximum messages per page
+            cursor: next_cursor of the previous page
+            before_id: Only messages older than this chat_history id
+            before_ts: Only messages older than this epoch timestamp
+
+        Returns:
+            dict with items (chronological within the page) and next_cursor
+            (None on the last page)
+        """
+        columns = list(HISTORY_COLUMNS) if columns is None else list(columns)
+        unknown = [c for c in columns if c not in HISTORY_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown history columns: {', '.join(unknown)}")
+        selected = ["id"] + [c for c in dict.fromkeys(columns) if c != "id"]
+        # source_documents lives in chat_sources/source_chunks, not in chat_history
+        read = [c for c in selected if c != "source_documents"]
+        limit = max(1, int(limit))
+
+        where = ["patient_id = ?"]
+        params: List[Any] = [patient_id]
+        if cursor is not None:
+            cursor_ts, cursor_id = decode_history_cursor(cursor)
+            where.append("(ts < ? OR (ts = ? AND id < ?))")
+            params += [cursor_ts, cursor_ts, cursor_id]
+        if before_id is not None:
+            where.append("id < ?")
+            params.append(int(before_id))
+        if before_ts is not None:
+            where.append("ts < ?")
+            params.append(int(before_ts))
+
+        # ts rides along for the cursor; fetch one extra row to detect the last page
+        rows = self._pool.connection().execute(f'''
+            SELECT ts, {", ".join(read)}
             FROM chat_history
-            WHERE patient_id = ?
-            ORDER BY timestamp DESC
+            WHERE {" AND ".join(where)}
+            ORDER BY ts DESC, id DESC
             LIMIT ?
-        ''', (patient_id, limit))
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return [
-            {
-                "id": row[0],
-                "question": row[1],
-                "answer": row[2],
-                "risk_level": row[3],
-                "risk_reason": row[4],
-                "source_documents": json.loads(row[5]) if row[5] else [],
-                "timestamp": row[6]
-            }
-            for row in reversed(rows)  # Return in chronological order
-        ]
+        ''', (*params, limit + 1)).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_history_cursor(rows[-1][0], rows[-1][1])
+
+        resolver = None
+        if "source_documents" in selected:
+            # One chat_sources/source_chunks join per page, run on first access
+            resolver = _SourceDocumentResolver(self, [row[1] for row in rows])
+        items = []
+        for row in reversed(rows):  # Return in chronological order
+            message = dict(zip(read, row[1:]))
+            if resolver is not None:
+                message["source_documents"] = LazySourceDocuments(message["id"], resolver)
+            items.append(message)
+        return {"items": items, "next_cursor": next_cursor}
+
+    def iter_patient_history(self, patient_id: str, columns: Optional[List[str]] = None,
+                             page_size: int = 200) -> Iterator[Dict[str, Any]]:
+        """
+        Stream a patient's whole history newest-first, one keyset page at a time
+
+        Args:
+            patient_id: Patient identifier
+            columns: Columns to return (see query_patient_history)
+            page_size: Messages fetched per query
+        """
+        cursor = None
+        while True:
+            page = self.query_patient_history(patient_id, columns=columns,
+                                              limit=page_size, cursor=cursor)
+            yield from reversed(page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return
     
     def get_patient_risk_summary(self, patient_id: str, days: int = 30) -> Dict[str, Any]:
         """
@@ -253,20 +566,24 @@ class PatientManager:
         Returns:
             Risk statistics
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Get risk levels from recent history
-        cursor.execute('''
-            SELECT risk_level, COUNT(*) as count
-            FROM chat_history
-            WHERE patient_id = ? 
-            AND timestamp > datetime('now', '-' || ? || ' days')
+        # Whole days inside the window come from the materialized daily buckets;
+        # only the partial first day is counted from raw history (index range scan)
+        since = int(time.time()) - days * 86400
+        first_day = since // 86400
+        cursor = self._pool.connection().execute('''
+            SELECT risk_level, SUM(count) FROM (
+                SELECT risk_level, count
+                FROM risk_daily_counts
+                WHERE patient_id = ? AND day > ?
+                UNION ALL
+                SELECT risk_level, 1
+                FROM chat_history
+                WHERE patient_id = ? AND ts > ? AND ts < ?
+            )
             GROUP BY risk_level
-        ''', (patient_id, days))
+        ''', (patient_id, first_day, patient_id, since, (first_day + 1) * 86400))
         
         risk_counts = cursor.fetchall()
-        conn.close()
         
         summary = {
             "LOW": 0,
@@ -299,12 +616,9 @@ class PatientManager:
             Success status
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('DELETE FROM chat_history WHERE patient_id = ?', (patient_id,))
-            conn.commit()
-            conn.close()
+            with self._pool.transaction() as conn:
+                conn.execute('DELETE FROM chat_history WHERE patient_id = ?', (patient_id,))
+                self._prune_source_chunks(conn)
             return True
         except Exception as e:
             print(f"Error clearing history: {e}")
@@ -321,13 +635,10 @@ class PatientManager:
             Success status
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Foreign key cascade will delete history and assessments
-            cursor.execute('DELETE FROM patients WHERE patient_id = ?', (patient_id,))
-            conn.commit()
-            conn.close()
+            with self._pool.transaction() as conn:
+                # Foreign key cascade will delete history and assessments
+                conn.execute('DELETE FROM patients WHERE patient_id = ?', (patient_id,))
+                self._prune_source_chunks(conn)
             return True
         except Exception as e:
             print(f"Error deleting patient: {e}")
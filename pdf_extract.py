@@ -0,0 +1,231 @@
+"""
+PDF Extraction
+Page-parallel text extraction for uploaded reports
+
+pypdf's extract_text is pure Python and single-threaded, so a long report keeps one
+core busy while the rest idle. PdfExtractor splits the pages of a file into small
+ranges and extracts them in a process pool, yielding pages in order as soon as
+they are ready so chunking can start before the last page is parsed. Short
+documents (fewer than PDF_PARALLEL_MIN_PAGES pages) and file objects are
+extracted in-process. Either way the text is identical to a sequential
+page.extract_text() loop; pages are joined once instead of with repeated +=.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+DEFAULT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+DEFAULT_MIN_PARALLEL_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+DEFAULT_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "4"))
+
+PdfSource = Union[str, os.PathLike, BinaryIO]
+
+
+@dataclass
+class ExtractedPage:
+    """Text of one PDF page and how long extracting it took"""
+    index: int
+    text: str
+    seconds: float
+    page_count: int = 0  # pages in the whole document
+
+
+def _open_reader(source: PdfSource):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("pypdf not installed. Install with: pip install pypdf")
+    return PdfReader(source)
+
+
+# Worker-process cache: consecutive tasks for one file reuse the parsed reader
+_worker_reader: Optional[Tuple[Tuple[str, int, int], Any]] = None
+
+
+def _extract_range(path: str, start: int, stop: int) -> List[Tuple[int, str, float]]:
+    """Extract pages [start, stop) of a file (runs in a worker process)"""
+    global _worker_reader
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if _worker_reader is None or _worker_reader[0] != key:
+        _worker_reader = (key, _open_reader(path))
+    reader = _worker_reader[1]
+    pages = []
+    for index in range(start, stop):
+        began = time.perf_counter()
+        text = reader.pages[index].extract_text()
+        pages.append((index, text, time.perf_counter() - began))
+    return pages
+
+
+class PdfExtractor:
+    """
+    Extracts PDF pages across a process pool, streaming them back in page order
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS,
+                 min_parallel_pages: int = DEFAULT_MIN_PARALLEL_PAGES,
+                 pages_per_task: int = DEFAULT_PAGES_PER_TASK):
+        """
+        Args:
+            max_workers: Extraction processes (1 disables the pool)
+            min_parallel_pages: Shorter documents are extracted in-process
+            pages_per_task: Pages handed to a worker per task
+        """
+        self.max_workers = max_workers
+        self.min_parallel_pages = min_parallel_pages
+        self.pages_per_task = max(1, pages_per_task)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "documents": 0,
+            "parallel_documents": 0,
+            "pages": 0,
+            "pool_failures": 0,
+            "page_seconds_total": 0.0,
+            "page_seconds_max": 0.0,
+            "wall_seconds_total": 0.0
+        }
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking the API process (threads, loaded models) is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def _record(self, page: ExtractedPage):
+        with self._lock:
+            self._stats["pages"] += 1
+            self._stats["page_seconds_total"] += page.seconds
+            self._stats["page_seconds_max"] = max(self._stats["page_seconds_max"], page.seconds)
+
+    def iter_pages(self, source: PdfSource) -> Iterator[ExtractedPage]:
+        """
+        Yield the pages of a PDF in order as they are extracted
+
+        Args:
+            source: Path to a PDF, or a binary file object (extracted in-process)
+
+        Yields:
+            ExtractedPage per page
+        """
+        started = time.perf_counter()
+        reader = _open_reader(source)
+        page_count = len(reader.pages)
+        parallel = (isinstance(source, (str, os.PathLike)) and self.max_workers > 1
+                    and page_count >= self.min_parallel_pages)
+        with self._lock:
+            self._stats["documents"] += 1
+            self._stats["parallel_documents"] += int(parallel)
+
+        try:
+            if parallel:
+                pages = self._iter_parallel(os.fspath(source), page_count, reader)
+            else:
+                pages = self._iter_sequential(reader, 0, page_count)
+            for page in pages:
+                page.page_count = page_count
+                self._record(page)
+                yield page
+        finally:
+            with self._lock:
+                self._stats["wall_seconds_total"] += time.perf_counter() - started
+
+    def _iter_sequential(self, reader, start: int, stop: int) -> Iterator[ExtractedPage]:
+        for index in range(start, stop):
+            began = time.perf_counter()
+            text = reader.pages[index].extract_text()
+            yield ExtractedPage(index, text, time.perf_counter() - began)
+
+    def _iter_parallel(self, path: str, page_count: int, reader) -> Iterator[ExtractedPage]:
+        pool = self._get_pool()
+        ranges = deque((start, min(start + self.pages_per_task, page_count))
+                       for start in range(0, page_count, self.pages_per_task))
+        # Bounded look-ahead: a slow consumer does not pile up finished pages
+        in_flight: deque = deque()
+        next_index = 0
+        try:
+            while ranges or in_flight:
+                while ranges and len(in_flight) < self.max_workers * 2:
+                    start, stop = ranges.popleft()
+                    in_flight.append((start, stop, pool.submit(_extract_range, path, start, stop)))
+                start, stop, future = in_flight.popleft()
+                for index, text, seconds in future.result():
+                    yield ExtractedPage(index, text, seconds)
+                    next_index = index + 1
+        except BrokenProcessPool:
+            # A worker died: drop the pool and finish this document in-process
+            print(f"[PDF] Extraction pool failed, continuing {path} in-process")
+            with self._lock:
+                self._stats["pool_failures"] += 1
+                if self._pool is pool:
+                    self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+            yield from self._iter_sequential(reader, next_index, page_count)
+        finally:
+            for _, _, pending in in_flight:
+                pending.cancel()
+
+    def extract_text(self, source: PdfSource, separator: str = "") -> str:
+        """
+        Extract a whole PDF as one string
+
+        Args:
+            source: Path or binary file object
+            separator: Appended after every page's text
+
+        Returns:
+            Same text as concatenating page.extract_text() + separator page by page
+        """
+        return "".join(page.text + separator for page in self.iter_pages(source))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Report extraction volume and per-page timing
+
+        Returns:
+            dict with documents, parallel_documents, pages, pool_failures,
+            avg/max page seconds, pages_per_second and workers
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        page_seconds = stats.pop("page_seconds_total")
+        wall_seconds = stats.pop("wall_seconds_total")
+        pages = stats["pages"]
+        stats["avg_page_seconds"] = round(page_seconds / pages, 4) if pages else None
+        stats["page_seconds_max"] = round(stats["page_seconds_max"], 4)
+        stats["pages_per_second"] = round(pages / wall_seconds, 1) if wall_seconds else None
+        stats["workers"] = self.max_workers
+        return stats
+
+    def close(self):
+        """Shut down the worker processes"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Singleton instance
+_pdf_extractor: Optional[PdfExtractor] = None
+_pdf_extractor_lock = threading.Lock()
+
+def get_pdf_extractor() -> PdfExtractor:
+    """Get or create singleton PdfExtractor instance"""
+    global _pdf_extractor
+    if _pdf_extractor is None:
+        with _pdf_extractor_lock:
+            if _pdf_extractor is None:
+                _pdf_extractor = PdfExtractor()
+    return _pdf_extractor
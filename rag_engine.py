@@ -5,15 +5,39 @@ Streamlit-independent module for RAG-based question answering with Groq LLM API
 
 import os
 import json
-import requests
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
 from typing import Dict, List, Optional, Any
 from dotenv import load_dotenv
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
 from patient_manager import get_patient_manager
+from embedding_registry import get_embeddings
+from shared_index import get_shared_index_service
+from mmap_vector_store import open_vector_store, store_version
+from llm_client import LLMError, get_llm_client, message_content
+from executors import ExecutorBusy, get_executor
+from latency_stats import get_latency_stats
+from risk_jobs import get_risk_job_store
+from chat_writer import get_chat_writer
+from answer_cache import ANSWER_CACHE_ENABLED, get_answer_cache
+from chat_prompts import create_chat_messages, create_chat_turn_prompt
+from context_assembler import (ANSWER_CONTEXT_TOKENS, CONTEXT_SEPARATOR, RISK_CONTEXT_TOKENS,
+                               get_context_assembler)
+from dual_retrieval import DEFAULT_QUOTAS, SOURCE_PATIENT, SOURCE_SHARED, dual_retrieve
+from langchain_core.documents import Document
 
 load_dotenv()
 
+RISK_MODES = ("sequential", "concurrent", "deferred")
+DEFAULT_RISK_MODE = os.getenv("RISK_ASSESSMENT_MODE", "sequential")
+
+# Minimum questions before a turn gets a risk assessment
+MIN_QUESTIONS_FOR_ASSESSMENT = 3
+
+# Stands in for the reply when the risk call runs concurrently with answer generation
+CONCURRENT_ANSWER_PLACEHOLDER = "(Assessed from the patient's message; the assistant reply is generated in parallel.)"
+
 
 class RAGEngine:
     """
@@ -21,7 +45,9 @@ class RAGEngine:
     Retrieves from BOTH shared medical books AND patient-specific medical records
     """
     
-    def __init__(self, patient_id: str, max_tokens: int = 500, temperature: float = 0.7):
+    def __init__(self, patient_id: str, max_tokens: int = 500, temperature: float = 0.7,
+                 retrieval_quotas: Optional[Dict[str, int]] = None,
+                 risk_mode: Optional[str] = None):
         """
         Initialize RAG engine with dual vector store retrieval
         
@@ -29,6 +55,10 @@ class RAGEngine:
             patient_id: Unique patient identifier (MANDATORY)
             max_tokens: Maximum tokens for LLM response
             temperature: LLM temperature (0.0-1.0)
+            retrieval_quotas: Max chunks per source, e.g. {"shared": 3, "patient": 3}
+            risk_mode: "sequential" (assess after the answer), "concurrent" (assess
+                       while the answer is generated) or "deferred" (return the answer
+                       first, poll the risk result); defaults to RISK_ASSESSMENT_MODE
         """
         if not patient_id:
             raise ValueError("patient_id is mandatory and cannot be empty")
@@ -37,10 +67,19 @@ class RAGEngine:
         self.max_tokens = max_tokens
         self.temperature = temperature
         self.chat_history = []
-        self.shared_retriever = None
+        self.shared_index = get_shared_index_service()
+        self.patient_store = None
+        self.patient_store_path = f"vector store/patient_{patient_id}"
         self.patient_retriever = None
+        self.retrieval_quotas = dict(retrieval_quotas or DEFAULT_QUOTAS)
+        self.risk_mode = risk_mode or DEFAULT_RISK_MODE
+        if self.risk_mode not in RISK_MODES:
+            raise ValueError(f"risk_mode must be one of {RISK_MODES}")
         self.patient_manager = get_patient_manager()
         self.question_count = 0  # Track questions in current session
+        # Pooled engines are shared by every request for the patient: hold this
+        # from prepare_turn to finalize_turn so turns don't interleave
+        self.turn_lock = threading.Lock()
         self.max_questions_per_session = 6  # Enforce maximum (per latest spec)
         
         # Verify patient exists
@@ -57,7 +96,12 @@ class RAGEngine:
     def _load_patient_history(self):
         """Load patient's previous chat history from database"""
         try:
-            history = self.patient_manager.get_patient_history(self.patient_id, limit=50)
+            # source_documents are never needed here: skip reading and decoding them
+            history = self.patient_manager.query_patient_history(
+                self.patient_id,
+                columns=["question", "answer", "risk_level", "risk_reason", "timestamp"],
+                limit=50
+            )["items"]
             # Convert to expected format
             self.chat_history = [
                 {
@@ -80,37 +124,24 @@ class RAGEngine:
         2. Patient-specific medical records (private, per-patient)
         """
         try:
-            instructor_embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/all-MiniLM-L6-v2", 
-                model_kwargs={'device': 'cpu'}
-            )
+            # Shared process-wide model (loaded once, not per request)
+            instructor_embeddings = get_embeddings()
             
-            # Load shared medical books vector store (ALWAYS AVAILABLE)
-            shared_path = "vector store/shared"
-            if os.path.exists(shared_path):
-                shared_db = FAISS.load_local(
-                    shared_path,
-                    instructor_embeddings,
-                    allow_dangerous_deserialization=True
-                )
-                self.shared_retriever = shared_db.as_retriever(search_kwargs={"k": 3})
-                print(f"✅ Loaded shared medical books vector store")
-            else:
-                print(f"⚠️ Shared medical books vector store not found at {shared_path}")
-                self.shared_retriever = None
+            # Shared medical books are NOT loaded here: the shared index service
+            # loads them once per process and every patient engine searches it
             
-            # Load patient-specific vector store (IF EXISTS)
-            patient_path = f"vector store/patient_{self.patient_id}"
-            if os.path.exists(patient_path):
-                patient_db = FAISS.load_local(
-                    patient_path,
-                    instructor_embeddings,
-                    allow_dangerous_deserialization=True
-                )
+            # Load patient-specific vector store (IF COMMITTED): a first upload
+            # creates the directory before its manifest, so test the commit marker
+            patient_path = self.patient_store_path
+            if store_version(patient_path) is not None:
+                # Memory-mapped (zero copy) when converted, legacy FAISS otherwise
+                patient_db = open_vector_store(patient_path, instructor_embeddings)
+                self.patient_store = patient_db
                 self.patient_retriever = patient_db.as_retriever(search_kwargs={"k": 3})
                 print(f"✅ Loaded patient-specific medical records for {self.patient_id}")
             else:
                 print(f"ℹ️ No patient-specific medical records found for {self.patient_id}")
+                self.patient_store = None
                 self.patient_retriever = None
             
             # At least one retriever must be available
@@ -120,68 +151,98 @@ class RAGEngine:
         except Exception as e:
             raise RuntimeError(f"Failed to load vector stores: {str(e)}")
     
-    def _call_groq(self, prompt: str) -> str:
+    @property
+    def shared_retriever(self):
+        """Retriever over the current shared index snapshot (follows hot-swaps)"""
+        shared_db = self.shared_index.get()
+        if shared_db is None:
+            return None
+        return shared_db.as_retriever(search_kwargs={"k": 3})
+    
+    def retrieve(self, question: str, quotas: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
         """
-        Call Groq LLM API for text generation
+        Single-pass dual retrieval: embed the question once, search the shared
+        books and the patient's records concurrently, merge hits by score
         
         Args:
-            prompt: Input prompt for the LLM
+            question: User's question
+            quotas: Max chunks per source (defaults to self.retrieval_quotas)
             
         Returns:
-            Generated text response
+            List of {content, score, source, metadata, rank}, closest first
         """
-        api_key = os.getenv("GROQ_API_KEY")
-        
-        if not api_key:
-            return "Error: GROQ_API_KEY environment variable not set"
-        
-        url = "https://api.groq.com/openai/v1/chat/completions"
-        
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": "llama-3.3-70b-versatile",
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "max_tokens": self.max_tokens,
-            "temperature": self.temperature
-        }
+        quotas = quotas or self.retrieval_quotas
+        stores = {SOURCE_PATIENT: self.patient_store}
+        precomputed = {}
+
+        # Fixed monitoring queries: shared hits were computed when the index loaded
+        shared_hits = None
+        if quotas.get(SOURCE_SHARED, 0) <= self.shared_index.precomputed_k:
+            shared_hits = self.shared_index.get_precomputed(question)
+        if shared_hits is not None:
+            precomputed[SOURCE_SHARED] = shared_hits
+        else:
+            stores[SOURCE_SHARED] = self.shared_index.get()
+
+        return dual_retrieve(
+            question,
+            embedding=get_embeddings(),
+            stores=stores,
+            quotas=quotas,
+            precomputed=precomputed
+        )
+    
+    def retrieve_documents(self, query: str, quotas: Optional[Dict[str, int]] = None) -> List[Document]:
+        """
+        Dual retrieval returning LangChain Documents (score/source added to metadata)
         
-        try:
-            response = requests.post(url, json=payload, headers=headers, timeout=60)
-            response.raise_for_status()
+        Args:
+            query: Search query
+            quotas: Max chunks per source
             
-            data = response.json()
-            return data["choices"][0]["message"]["content"].strip()
+        Returns:
+            List of Documents, closest first
+        """
+        return [
+            Document(
+                page_content=hit["content"],
+                metadata={**hit["metadata"], "score": hit["score"], "source": hit["source"]}
+            )
+            for hit in self.retrieve(query, quotas)
+        ]
+    
+    def _call_groq(self, messages: List[Dict[str, str]]) -> str:
+        """
+        Call Groq LLM API for text generation
+        
+        Args:
+            messages: Chat messages for the LLM (see build_messages)
             
-        except requests.exceptions.HTTPError as e:
-            # Try to extract error details from response
-            try:
-                error_detail = e.response.json() if hasattr(e.response, 'json') else str(e.response.text)
-                return f"Error calling Groq API: {e.response.status_code} - {str(error_detail)}"
-            except:
-                return f"Error calling Groq API: {str(e)}"
-        except requests.exceptions.RequestException as e:
+        Returns:
+            Generated text response
+        """
+        try:
+            data = get_llm_client().chat(
+                messages=messages,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                timeout=60
+            )
+            return message_content(data)
+        except LLMError as e:
             return f"Error calling Groq API: {str(e)}"
     
-    def _assess_medical_risk(self, question: str, answer: str, context: str) -> Dict[str, str]:
+    def _risk_request(self, question: str, answer: str, context: str) -> Dict[str, Any]:
         """
-        Assess medical risk level using LLM reasoning
+        Chat-completion arguments for a risk assessment call
         
         Args:
             question: User's question
-            answer: Generated answer
+            answer: Generated answer (or a placeholder when assessed concurrently)
             context: Retrieved context
             
         Returns:
-            dict with risk_level and risk_reason
+            kwargs for LLMClient.chat / submit_chat
         """
         # Build chat history context for risk assessment
         history_summary = ""
@@ -200,63 +261,119 @@ class RAGEngine:
             history=history_summary
         )
         
+        return {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": self._get_risk_assessment_system_prompt()
+                },
+                {
+                    "role": "user",
+                    "content": risk_prompt
+                }
+            ],
+            "max_tokens": 300,
+            "temperature": 0.3,  # Lower temperature for more consistent risk assessment
+            "timeout": 30,
+            "response_format": {"type": "json_object"},
+            "cache": True  # Identical question/answer/context/history reuse the stored assessment
+        }
+    
+    def _parse_risk_response(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalize the JSON risk assessment returned by the LLM"""
+        risk_data = json.loads(message_content(data))
+        
+        # Normalize risk_level to uppercase
+        risk_level = risk_data.get("risk_level", "UNKNOWN").upper()
+        reason = risk_data.get("reason", ["Unable to assess"])
+        action = risk_data.get("action", "Continue monitoring")
+        
+        return {
+            "risk_level": risk_level,
+            "reason": reason if isinstance(reason, list) else [reason],
+            "action": action
+        }
+    
+    def _assess_medical_risk(self, question: str, answer: str, context: str,
+                             pending: Optional[Future] = None) -> Dict[str, str]:
+        """
+        Assess medical risk level using LLM reasoning
+        
+        Args:
+            question: User's question
+            answer: Generated answer
+            context: Retrieved context
+            pending: Risk call already started by prepare_turn (concurrent mode)
+            
+        Returns:
+            dict with risk_level and risk_reason
+        """
         try:
             # Call Groq API for risk assessment
-            api_key = os.getenv("GROQ_API_KEY")
-            if not api_key:
+            if not os.getenv("GROQ_API_KEY"):
                 return {
                     "risk_level": "UNKNOWN",
                     "risk_reason": "API key not configured"
                 }
             
-            url = "https://api.groq.com/openai/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "model": "llama-3.3-70b-versatile",
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": self._get_risk_assessment_system_prompt()
-                    },
-                    {
-                        "role": "user",
-                        "content": risk_prompt
-                    }
-                ],
-                "max_tokens": 300,
-                "temperature": 0.3,  # Lower temperature for more consistent risk assessment
-                "response_format": {"type": "json_object"}
-            }
-            
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
-            risk_json = data["choices"][0]["message"]["content"].strip()
-            
-            # Parse JSON response
-            import json
-            risk_data = json.loads(risk_json)
-            
-            # Normalize risk_level to uppercase
-            risk_level = risk_data.get("risk_level", "UNKNOWN").upper()
-            reason = risk_data.get("reason", ["Unable to assess"])
-            action = risk_data.get("action", "Continue monitoring")
+            if pending is not None:
+                data = pending.result()
+            else:
+                data = get_llm_client().chat(**self._risk_request(question, answer, context))
             
-            return {
-                "risk_level": risk_level,
-                "reason": reason if isinstance(reason, list) else [reason],
-                "action": action
-            }
+            return self._parse_risk_response(data)
             
         except Exception as e:
             # Fallback to basic keyword detection if LLM fails
             return self._fallback_risk_assessment(question, answer, context)
     
+    def _start_deferred_risk(self, question: str, answer: str, context: str,
+                             saved: Future, history_entry: Dict[str, Any],
+                             started_at: float) -> str:
+        """
+        Run the risk assessment in the background and record it when done
+        
+        Args:
+            saved: Write-behind future resolving to the chat_history id of the turn
+        
+        Returns:
+            Job id for GET /api/chat/risk/{job_id}
+        """
+        jobs = get_risk_job_store()
+        job_id = jobs.create(self.patient_id)
+        
+        def complete(assessment: Dict[str, Any]):
+            risk_level = assessment.get("risk_level", "UNKNOWN")
+            reason_list = assessment.get("reason", [])
+            risk_reason = reason_list[0] if isinstance(reason_list, list) and reason_list \
+                else str(assessment.get("action", assessment.get("risk_reason", "")))
+            # The chat row is committed by the write-behind queue within a flush interval
+            message_id = saved.result(timeout=30)
+            if message_id is not None:
+                self.patient_manager.update_chat_risk(message_id, risk_level, risk_reason)
+            history_entry.update(risk_level=risk_level, risk_reason=risk_reason)
+            jobs.complete(job_id, {"risk_level": risk_level, "risk_reason": risk_reason, **assessment},
+                          message_id=message_id)
+            get_latency_stats().record("risk.deferred.completion", time.perf_counter() - started_at)
+        
+        def on_done(future: Future):
+            # Runs on the LLM client's loop thread: hand sqlite work to the io executor
+            def finish():
+                try:
+                    complete(self._assess_medical_risk(question, answer, context, pending=future))
+                except Exception as e:
+                    jobs.fail(job_id, str(e))
+            try:
+                get_executor("io").submit(finish)
+            except ExecutorBusy:
+                threading.Thread(target=finish, daemon=True).start()
+        
+        if not os.getenv("GROQ_API_KEY"):
+            complete(self._assess_medical_risk(question, answer, context))
+        else:
+            get_llm_client().submit_chat(**self._risk_request(question, answer, context)).add_done_callback(on_done)
+        return job_id
+    
     def _get_risk_assessment_system_prompt(self) -> str:
         """
         System prompt for neurological risk assessment (post-discharge monitoring)
@@ -288,6 +405,11 @@ IMPORTANT: Consider conversation history for symptom progression. Worsening tren
         """
         User prompt for neurological risk assessment with all context
         """
+        # The answer context is already packed whole-chunk; re-pack its paragraphs
+        # into the smaller risk budget instead of cutting at a character offset
+        risk_context = get_context_assembler().assemble(
+            context.split(CONTEXT_SEPARATOR), RISK_CONTEXT_TOKENS, purpose="risk"
+        )["context"]
         prompt = f"""Assess the neurological risk level for this patient post-discharge monitoring session.
 
 PATIENT'S SYMPTOM RESPONSE:
@@ -297,7 +419,7 @@ PATIENT'S ANSWER/SYMPTOMS:
 {answer}
 
 RELEVANT MEDICAL CONTEXT FROM NEUROLOGY DOCUMENTS:
-{context[:800]}"""
+{risk_context}"""
 
         if history:
             prompt += f"""
@@ -357,253 +479,363 @@ Remember: Be CONSERVATIVE. Use HIGH only if clearly justified."""
             "action": "You are doing well. Continue your normal routine and prescribed medications."
         }
     
-    def answer_question(self, question: str, context_docs: Optional[List[str]] = None) -> Dict[str, Any]:
+    def _lookup_cached_answer(self, question: str) -> Dict[str, Any]:
         """
-        Answer a question using dual RAG retrieval with Groq LLM
-        Retrieves context from BOTH shared medical books AND patient records
+        Check the semantic answer cache for a near-duplicate of this question
+        
+        Returns:
+            dict with the cache key fields (embedding, store_version, scope) and,
+            on a hit, "hit" with the cached turn payload
+        """
+        # Answers depend on the turn position (question number, acknowledgement),
+        # so only questions asked at the same position share an answer
+        lookup = {
+            "embedding": get_embeddings().embed_query(question),  # reused by retrieval (query cache)
+            "store_version": store_version(self.patient_store_path),
+            "scope": self.question_count
+        }
+        lookup["hit"] = get_answer_cache().lookup(
+            self.patient_id, question, lookup["embedding"], lookup["store_version"], scope=lookup["scope"]
+        )
+        return lookup
+    
+    def _remember_answer(self, question: str, answer: str, turn: Dict[str, Any]):
+        """Store a freshly generated answer in the semantic answer cache"""
+        lookup = turn.get("answer_cache")
+        if lookup is None or lookup["hit"] is not None or not answer:
+            return
+        if answer.startswith("Error calling Groq API"):
+            return  # never replay a failed generation
+        get_answer_cache().add(
+            self.patient_id, question, lookup["embedding"], lookup["store_version"],
+            payload={
+                "answer": answer,
+                "context": turn["context"],
+                "source_documents": turn["source_documents"],
+                "sources": turn["sources"]
+            },
+            scope=lookup["scope"]
+        )
+    
+    def prepare_turn(self, question: str, context_docs: Optional[List[str]] = None,
+                     use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Retrieve context and build the LLM prompt for one chat turn
         
         Args:
             question: User's question
             context_docs: Optional list of context documents (if None, retrieves from both vector stores)
+            use_cache: Allow reusing a recent answer to a near-identical question
             
         Returns:
-            dict with:
-                - answer: Generated answer text
-                - risk_level: Risk assessment (LOW/MEDIUM/HIGH/CRITICAL)
-                - risk_reason: Explanation of risk level
-                - source_documents: List of source document snippets
+            dict with prompt, context, source_documents and sources (plus
+            cached_answer on a semantic cache hit), or {"result": ...} when the
+            turn ends without an LLM call
         """
-        try:
-            # Retrieve relevant documents from BOTH stores if not provided
-            if context_docs is None:
-                source_documents = []
-                
-                # Retrieve from shared medical books
-                if self.shared_retriever:
-                    shared_docs = self.shared_retriever.invoke(question)
-                    source_documents.extend([doc.page_content for doc in shared_docs])
-                
-                # Retrieve from patient-specific records
-                if self.patient_retriever:
-                    patient_docs = self.patient_retriever.invoke(question)
-                    source_documents.extend([doc.page_content for doc in patient_docs])
-                
-                # If no retrievers available, return error
-                if not source_documents:
-                    return {
-                        "answer": "Error: No medical knowledge sources available",
-                        "risk_level": "UNKNOWN",
-                        "risk_reason": "System error",
-                        "source_documents": []
-                    }
-                
-                # Combine contexts (prioritize patient records, then medical books)
-                context = "\n\n".join(source_documents[:6])  # Top 6 chunks total
-            else:
-                source_documents = context_docs
-                context = "\n\n".join(context_docs[:6])
-            
-            # Pre-upload guard: if no patient-specific vector store, require upload
-            if self.patient_retriever is None:
-                upload_msg = "To begin today’s check-in, please upload your medical reports using the **Upload Medical Reports** section above."
+        started_at = time.perf_counter()
+        
+        # Near-duplicate of a recent question: reuse its answer and context
+        answer_cache = None
+        if (use_cache and ANSWER_CACHE_ENABLED and context_docs is None and
+                self.patient_retriever is not None):
+            answer_cache = self._lookup_cached_answer(question)
+            hit = answer_cache["hit"]
+            if hit is not None:
                 return {
-                    "answer": upload_msg,
-                    "risk_level": "PENDING",
-                    "risk_reason": upload_msg,
-                    "reason": [upload_msg],
-                    "action": upload_msg,
-                    "source_documents": [],
-                    "question_count": self.question_count
+                    "prompt": None,
+                    "context": hit["payload"]["context"],
+                    "source_documents": hit["payload"]["source_documents"],
+                    "sources": hit["payload"]["sources"],
+                    "started_at": started_at,
+                    "risk_future": None,
+                    "context_usage": None,
+                    "cached_answer": hit["payload"]["answer"],
+                    "answer_cache": answer_cache
                 }
-
-            # Build chat history context
-            history_context = ""
-            if self.chat_history:
-                history_context = "\n".join([
-                    f"User: {h['question']}\nAssistant: {h['answer']}"
-                    for h in self.chat_history[-2:]  # Last 2 exchanges
-                ])
-                history_context = f"\n\nPrevious conversation:\n{history_context}\n\n"
+        
+        # Retrieve relevant documents from BOTH stores if not provided
+        if context_docs is None:
+            # One query embedding, both stores searched concurrently, merged by score
+            retrieved = self.retrieve(question)
+            source_documents = [hit["content"] for hit in retrieved]
             
-            # Create prompt for Groq with combined context
-            prompt = f"""You are an AI assistant for post-discharge neurological monitoring.
-
-You are NOT a general chatbot. You operate ONLY inside a fixed Patient Dashboard UI with three sections:
-1) Upload Your Medical Reports (above chat)
-2) Chat Area (used only after upload)
-3) Daily Check-in Area (questions appear after upload)
-
-MANDATORY FLOW (STRICT):
-1) Login completed
-2) Patient identified
-3) Medical report upload REQUIRED
-4) Only after upload → start asking questions
-5) Risk assessment after questioning
-
-PRE-UPLOAD BEHAVIOR (CRITICAL):
-- If reports are NOT uploaded: do NOT ask questions; respond ONLY with: "To begin today’s check-in, please upload your medical reports using the **Upload Medical Reports** section above." Do not add anything else.
-
-POST-UPLOAD TRIGGER:
-- Once reports exist and are processed: respond first with "Thank you. I’ve reviewed your medical report. Let’s begin today’s check-in." then immediately ask the first symptom question.
-
-DOCUMENT SOURCES:
-- SOURCE A (Shared neurology books/guidelines in vector DB) → ONLY for medical reasoning via RAG
-- SOURCE B (Patient reports: condition, symptoms, meds, risk factors) → NOT medical knowledge; use only for context
-
-YOUR ROLE:
-1) Ask DAILY symptom questions after reports are uploaded
-2) Adapt questions using patient report context + previous answers + retrieved guidance
-3) Assess patient risk (LOW/MEDIUM/HIGH)
-4) Provide safe next-step actions
-
-QUESTION RULES (STRICT):
-- One question at a time (exactly one line), simple language
-- Focus ONLY on brain-related symptoms
-- Areas: Speech/confusion, Headache/pain, Dizziness/balance, Weakness/numbness, Vision, Seizures (if mentioned), Medications, Daily functioning
-- Allowed answer types: YES/NO OR numeric (0-10) OR short text (10-15 words; only for pain location or new symptoms)
-- Question number: {self.question_count + 1}/{self.max_questions_per_session}
-- Limits: MIN 3, MAX 6 questions. Never exceed 6. Stop early if stable.
-
-FOLLOW-UP RULES:
-- Ask a follow-up ONLY if patient answers YES or symptom worsens
-- Only ONE follow-up per symptom; follow all rules above
-
-ASSESSMENT LOGIC:
-- Combine patient answers + patient report context + retrieved neurology guidance
-- Analyze severity, trends, combinations
-
-FINAL RESPONSE FORMAT (STRICT JSON when ready):
-{{
-    "risk_level": "LOW|MEDIUM|HIGH",
-    "reason": ["bullet1", "bullet2"],
-    "action": "specific action text"
-}}
-
-REASON RULES:
-- 1-3 bullets, simple language, no diagnosis, no jargon, no sources
-
-ACTION RULES (STRICT):
-- HIGH: Visit doctor/hospital immediately; contact caregiver; no medication advice.
-- MEDIUM: Continue prescribed medicines; rest and monitor; no new meds or dosage changes.
-- LOW: Reassure; continue normal routine and prescribed meds.
-
-SAFETY RULES:
-- Do NOT diagnose; do NOT prescribe/change meds; do NOT replace a doctor; prioritize safety
-
-TONE: Calm, Supportive, Clear, Patient-friendly
-
-Retrieved medical context:
-{context[:1000]}
-
-{history_context}
-
-If reports are missing: reply with "To begin today’s check-in, please upload your medical reports using the **Upload Medical Reports** section above." If this is the first question after upload, start with "Thank you. I’ve reviewed your medical report. Let’s begin today’s check-in." then ask the question. If you have enough info (≥3 questions or at max limit), return the JSON assessment instead of another question."""
+            # If no retrievers available, return error
+            if not source_documents:
+                return {"result": {
+                    "answer": "Error: No medical knowledge sources available",
+                    "risk_level": "UNKNOWN",
+                    "risk_reason": "System error",
+                    "source_documents": []
+                }}
             
-            # Call Groq API
-            answer = self._call_groq(prompt)
+        else:
+            retrieved = []
+            source_documents = context_docs
+        
+        # Closest chunks first, whole and de-duplicated, up to the token budget
+        assembled = get_context_assembler().assemble(source_documents, ANSWER_CONTEXT_TOKENS, purpose="answer")
+        context = assembled["context"]
+        context_usage = {
+            "tokens_used": assembled["tokens_used"],
+            "budget": assembled["budget"],
+            "chunks_used": len(assembled["chunks"]),
+            "duplicates_dropped": assembled["duplicates_dropped"],
+            "over_budget_dropped": assembled["over_budget_dropped"]
+        }
+        
+        # Pre-upload guard: if no patient-specific vector store, require upload
+        if self.patient_retriever is None:
+            upload_msg = "To begin today’s check-in, please upload your medical reports using the **Upload Medical Reports** section above."
+            return {"result": {
+                "answer": upload_msg,
+                "risk_level": "PENDING",
+                "risk_reason": upload_msg,
+                "reason": [upload_msg],
+                "action": upload_msg,
+                "source_documents": [],
+                "question_count": self.question_count
+            }}
 
-            # Guarantee post-upload acknowledgement on the very first question
-            # Only when patient records exist, it's the first question, and no JSON assessment was returned
-            if self.patient_retriever is not None and self.question_count == 0:
-                lower = answer.lower()
-                has_assessment = ("risk_level" in lower and "reason" in lower and "action" in lower)
-                if not has_assessment:
-                    ack = "Thank you. I’ve reviewed your medical report. Let’s begin today’s check-in."
-                    # Prepend acknowledgement before the first question
-                    answer = f"{ack}\n{answer}"
-            
-            # Increment question counter
-            self.question_count += 1
-            
-            # Try to parse JSON if assessment is complete
-            risk_assessment = None
-            try:
-                # Check if answer contains JSON (assessment format)
-                if "risk_level" in answer.lower():
-                    import json
-                    # Extract JSON from response
-                    json_start = answer.find('{')
-                    json_end = answer.rfind('}') + 1
-                    if json_start != -1 and json_end > json_start:
-                        json_str = answer[json_start:json_end]
-                        risk_data = json.loads(json_str)
-                        risk_assessment = {
-                            "risk_level": risk_data.get("risk_level", "UNKNOWN").upper(),
-                            "reason": risk_data.get("reason", ["Unable to assess"]),
-                            "action": risk_data.get("action", "Continue monitoring")
-                        }
-                        # Reset question counter for next session
-                        self.question_count = 0
-            except:
-                pass
+        # Build chat history context
+        history_context = "\n".join([
+            f"User: {h['question']}\nAssistant: {h['answer']}"
+            for h in self.chat_history[-2:]  # Last 2 exchanges
+        ])
+        
+        # Static instructions are the shared system prompt (chat_prompts.py);
+        # only the per-turn slots are built here
+        prompt = create_chat_turn_prompt(
+            question_number=self.question_count + 1,
+            max_questions=self.max_questions_per_session,
+            context=context,
+            history=history_context
+        )
+        
+        turn = {
+            "prompt": prompt,
+            "context": context,
+            "source_documents": source_documents,
+            "sources": retrieved,
+            "started_at": started_at,
+            "risk_future": None,
+            "context_usage": context_usage,
+            "cached_answer": None,
+            "answer_cache": answer_cache
+        }
+        
+        # Concurrent mode: the risk call only needs the question, context and
+        # history, so start it now instead of after the answer
+        if (self.risk_mode == "concurrent" and os.getenv("GROQ_API_KEY") and
+                self.question_count + 1 >= MIN_QUESTIONS_FOR_ASSESSMENT):
+            turn["risk_future"] = get_llm_client().submit_chat(
+                **self._risk_request(question, CONCURRENT_ANSWER_PLACEHOLDER, context)
+            )
+        return turn
+    
+    def build_messages(self, turn: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Chat messages for a prepared turn: static system prompt + per-turn slots"""
+        return create_chat_messages(turn["prompt"])
+    
+    def generate_answer(self, turn: Dict[str, Any]) -> str:
+        """LLM completion for a prepared turn (or the cached answer on a semantic cache hit)"""
+        if turn["cached_answer"] is not None:
+            return turn["cached_answer"]
+        return self._call_groq(self.build_messages(turn))
+    
+    @staticmethod
+    def error_result(error: Exception) -> Dict[str, Any]:
+        """Chat response for a turn that failed with an unexpected error"""
+        return {
+            "answer": f"Error generating answer: {str(error)}",
+            "risk_level": "UNKNOWN",
+            "risk_reason": "System error occurred",
+            "source_documents": []
+        }
+    
+    def finalize_turn(self, question: str, answer: str, turn: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Post-process a generated answer: risk parsing/assessment, persistence, history
+        
+        Args:
+            question: User's question
+            answer: Full LLM completion
+            turn: Result of prepare_turn
             
-            # If no assessment yet, assess based on conversation depth
-            if not risk_assessment and self.question_count >= self.max_questions_per_session:
-                # Force assessment at max questions (6)
-                risk_assessment = self._assess_medical_risk(question, answer, context)
-            elif not risk_assessment and self.question_count >= 3:
-                # Minimum questions reached (3)
-                risk_assessment = self._assess_medical_risk(question, answer, context)
-            elif not risk_assessment:
-                # Still asking questions
+        Returns:
+            dict with answer, risk_level, risk_reason, reason, action and sources
+        """
+        context = turn["context"]
+        source_documents = turn["source_documents"]
+        retrieved = turn["sources"]
+        risk_future = turn.get("risk_future")
+        risk_path = "no_assessment"
+        deferred = False
+        self._remember_answer(question, answer, turn)
+        cache_hit = (turn.get("answer_cache") or {}).get("hit")
+        
+        # Guarantee post-upload acknowledgement on the very first question
+        # Only when patient records exist, it's the first question, and no JSON assessment was returned
+        if self.patient_retriever is not None and self.question_count == 0:
+            lower = answer.lower()
+            has_assessment = ("risk_level" in lower and "reason" in lower and "action" in lower)
+            if not has_assessment:
+                ack = "Thank you. I’ve reviewed your medical report. Let’s begin today’s check-in."
+                # Prepend acknowledgement before the first question
+                answer = f"{ack}\n{answer}"
+        
+        # Increment question counter
+        self.question_count += 1
+        
+        # Try to parse JSON if assessment is complete
+        risk_assessment = None
+        try:
+            # Check if answer contains JSON (assessment format)
+            if "risk_level" in answer.lower():
+                import json
+                # Extract JSON from response
+                json_start = answer.find('{')
+                json_end = answer.rfind('}') + 1
+                if json_start != -1 and json_end > json_start:
+                    json_str = answer[json_start:json_end]
+                    risk_data = json.loads(json_str)
+                    risk_assessment = {
+                        "risk_level": risk_data.get("risk_level", "UNKNOWN").upper(),
+                        "reason": risk_data.get("reason", ["Unable to assess"]),
+                        "action": risk_data.get("action", "Continue monitoring")
+                    }
+                    # Reset question counter for next session
+                    self.question_count = 0
+        except:
+            pass
+        
+        # If no assessment yet, assess based on conversation depth
+        # (minimum 3 questions reached, or forced at the max of 6)
+        if risk_assessment and risk_future is not None:
+            # The model returned its own JSON assessment: drop the speculative call
+            risk_future.cancel()
+        elif not risk_assessment and self.question_count >= MIN_QUESTIONS_FOR_ASSESSMENT:
+            if risk_future is not None:
+                # Concurrent mode: the call has been running alongside the answer
+                risk_path = "concurrent"
+                risk_assessment = self._assess_medical_risk(question, answer, context, pending=risk_future)
+            elif self.risk_mode == "deferred":
+                # Deferred mode: answer now, deliver the risk via job/poll
+                risk_path = "deferred"
+                deferred = True
                 risk_assessment = {
                     "risk_level": "PENDING",
-                    "reason": ["Gathering symptom information"],
-                    "action": answer  # Return the question
+                    "reason": ["Risk assessment in progress"],
+                    "action": "Continue monitoring"
                 }
-            
-            # Save to patient database
-            risk_level = risk_assessment.get("risk_level", "UNKNOWN")
-            # Convert reason array to string for database storage
-            reason_list = risk_assessment.get("reason", [])
-            if isinstance(reason_list, list) and reason_list:
-                risk_reason = reason_list[0]  # Use first bullet point
             else:
-                risk_reason = str(risk_assessment.get("action", ""))
-
-            # Enforce pre-condition: if no patient records, return upload message and skip logging
-            if self.patient_retriever is None:
-                upload_msg = "To begin today’s check-in, please upload your medical reports using the **Upload Medical Reports** section above."
-                return {
-                    "answer": upload_msg,
-                    "risk_level": "PENDING",
-                    "risk_reason": upload_msg,
-                    "reason": [upload_msg],
-                    "action": upload_msg,
-                    "source_documents": [],
-                    "question_count": self.question_count
-                }
-
-            self.patient_manager.save_chat_message(
-                patient_id=self.patient_id,
-                question=question,
-                answer=answer,
-                risk_level=risk_level,
-                risk_reason=risk_reason,
-                source_documents=source_documents
-            )
-            
+                risk_path = "sequential"
+                risk_assessment = self._assess_medical_risk(question, answer, context)
+        elif not risk_assessment:
+            # Still asking questions
+            risk_assessment = {
+                "risk_level": "PENDING",
+                "reason": ["Gathering symptom information"],
+                "action": answer  # Return the question
+            }
+        
+        # Save to patient database
+        risk_level = risk_assessment.get("risk_level", "UNKNOWN")
+        # Convert reason array to string for database storage
+        reason_list = risk_assessment.get("reason", [])
+        if isinstance(reason_list, list) and reason_list:
+            risk_reason = reason_list[0]  # Use first bullet point
+        else:
+            risk_reason = str(risk_assessment.get("action", ""))
+
+        # Enforce pre-condition: if no patient records, return upload message and skip logging
+        if self.patient_retriever is None:
+            upload_msg = "To begin today’s check-in, please upload your medical reports using the **Upload Medical Reports** section above."
             return {
-                "answer": answer,
-                "risk_level": risk_level,
-                "risk_reason": risk_reason,  # Convert back to string for API compatibility
-                "reason": risk_assessment.get("reason", []),  # Include array for reference
-                "action": risk_assessment.get("action", ""),
-                "source_documents": source_documents,
+                "answer": upload_msg,
+                "risk_level": "PENDING",
+                "risk_reason": upload_msg,
+                "reason": [upload_msg],
+                "action": upload_msg,
+                "source_documents": [],
                 "question_count": self.question_count
             }
+
+        # Write-behind: batched into the next chat_history transaction, off the request path
+        saved = get_chat_writer().submit(
+            patient_id=self.patient_id,
+            question=question,
+            answer=answer,
+            risk_level=risk_level,
+            risk_reason=risk_reason,
+            source_documents=source_documents
+        )
+        # Keep in-memory history current: pooled engines outlive a single request
+        history_entry = {
+            "question": question,
+            "answer": answer,
+            "risk_level": risk_level,
+            "risk_reason": risk_reason,
+            "timestamp": datetime.now().isoformat()
+        }
+        self.chat_history.append(history_entry)
+        
+        risk_job_id = None
+        if deferred:
+            risk_job_id = self._start_deferred_risk(
+                question, answer, context, saved, history_entry, turn["started_at"]
+            )
+        get_latency_stats().record(f"chat_turn.{risk_path}", time.perf_counter() - turn["started_at"])
+        
+        return {
+            "answer": answer,
+            "risk_level": risk_level,
+            "risk_reason": risk_reason,  # Convert back to string for API compatibility
+            "reason": risk_assessment.get("reason", []),  # Include array for reference
+            "action": risk_assessment.get("action", ""),
+            "source_documents": source_documents,
+            "sources": retrieved,  # Scores and provenance per chunk
+            "risk_job_id": risk_job_id,  # Poll /api/chat/risk/{id} in deferred mode
+            "cached": cache_hit is not None,  # Answer reused from a near-identical question
+            "context_usage": turn.get("context_usage"),  # Context tokens used vs budget
+            "question_count": self.question_count
+        }
+    
+    def answer_question(self, question: str, context_docs: Optional[List[str]] = None,
+                        use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Answer a question using dual RAG retrieval with Groq LLM
+        Retrieves context from BOTH shared medical books AND patient records
+        
+        Args:
+            question: User's question
+            context_docs: Optional list of context documents (if None, retrieves from both vector stores)
+            use_cache: Allow reusing a recent answer to a near-identical question
+            
+        Returns:
+            dict with:
+                - answer: Generated answer text
+                - risk_level: Risk assessment (LOW/MEDIUM/HIGH/CRITICAL)
+                - risk_reason: Explanation of risk level
+                - source_documents: List of source document snippets
+        """
+        try:
+            with self.turn_lock:
+                turn = self.prepare_turn(question, context_docs, use_cache=use_cache)
+                if "result" in turn:
+                    return turn["result"]
+                
+                # Call Groq API (unless a near-identical question was just answered)
+                answer = self.generate_answer(turn)
+                
+                return self.finalize_turn(question, answer, turn)
             
         except Exception as e:
-            return {
-                "answer": f"Error generating answer: {str(e)}",
-                "risk_level": "UNKNOWN",
-                "risk_reason": "System error occurred",
-                "source_documents": []
-            }
+            return self.error_result(e)
     
     def clear_history(self):
         """Clear chat history"""
-        self.chat_history = []
+        with self.turn_lock:
+            self.chat_history = []
     
     def get_history(self) -> List[Dict[str, str]]:
         """Get chat history"""
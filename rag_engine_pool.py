@@ -0,0 +1,154 @@
+"""
+RAG Engine Pool
+Keeps warm RAGEngine instances per patient instead of rebuilding one per request
+Bounded LRU with idle TTL; entries are invalidated when a patient's store changes
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from rag_engine import RAGEngine
+
+DEFAULT_POOL_MAX_SIZE = int(os.getenv("RAG_POOL_MAX_SIZE", "64"))
+DEFAULT_POOL_IDLE_TTL = float(os.getenv("RAG_POOL_IDLE_TTL_SECONDS", "900"))
+
+
+class RAGEnginePool:
+    """
+    LRU pool of RAGEngine instances keyed by patient_id
+
+    - get() returns a warm engine or builds one on a miss
+    - Engines idle longer than idle_ttl_seconds are dropped on next access
+    - invalidate() drops a single patient (e.g. after a report upload)
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_POOL_MAX_SIZE,
+        idle_ttl_seconds: float = DEFAULT_POOL_IDLE_TTL,
+        engine_factory: Optional[Callable[[str], Any]] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            max_size: Maximum number of warm engines kept
+            idle_ttl_seconds: Evict engines not used for this long
+            engine_factory: Builds an engine for a patient_id (defaults to RAGEngine)
+            clock: Monotonic time source (injectable for tests)
+        """
+        self.max_size = max(1, max_size)
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._engine_factory = engine_factory or (lambda patient_id: RAGEngine(patient_id=patient_id))
+        self._clock = clock
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions_lru": 0,
+            "evictions_ttl": 0,
+            "invalidations": 0
+        }
+
+    def get(self, patient_id: str) -> Any:
+        """
+        Get a warm engine for a patient, building it on a miss
+
+        Args:
+            patient_id: Patient identifier
+
+        Returns:
+            RAGEngine instance (shared between requests for the same patient)
+
+        Raises:
+            ValueError/RuntimeError from RAGEngine construction (not cached)
+        """
+        with self._lock:
+            self._evict_expired()
+            entry = self._entries.get(patient_id)
+            if entry is not None:
+                entry["last_used"] = self._clock()
+                self._entries.move_to_end(patient_id)
+                self._stats["hits"] += 1
+                return entry["engine"]
+            self._stats["misses"] += 1
+
+        # Build outside the lock so one slow load does not stall other patients
+        engine = self._engine_factory(patient_id)
+
+        with self._lock:
+            existing = self._entries.get(patient_id)
+            if existing is not None:
+                # Another request won the race; keep the first engine
+                existing["last_used"] = self._clock()
+                self._entries.move_to_end(patient_id)
+                return existing["engine"]
+
+            self._entries[patient_id] = {"engine": engine, "last_used": self._clock()}
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions_lru"] += 1
+            return engine
+
+    def invalidate(self, patient_id: str) -> bool:
+        """
+        Drop a patient's engine so the next request reloads its stores
+
+        Args:
+            patient_id: Patient identifier
+
+        Returns:
+            True if an engine was dropped
+        """
+        with self._lock:
+            if self._entries.pop(patient_id, None) is not None:
+                self._stats["invalidations"] += 1
+                return True
+            return False
+
+    def clear(self):
+        """Drop every pooled engine"""
+        with self._lock:
+            self._entries.clear()
+
+    def _evict_expired(self):
+        """Remove idle entries (lock held); oldest entries are at the front"""
+        if self.idle_ttl_seconds <= 0:
+            return
+        cutoff = self._clock() - self.idle_ttl_seconds
+        while self._entries:
+            patient_id, entry = next(iter(self._entries.items()))
+            if entry["last_used"] > cutoff:
+                break
+            self._entries.popitem(last=False)
+            self._stats["evictions_ttl"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool counters: hits, misses, evictions, current size"""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "evictions": self._stats["evictions_lru"] + self._stats["evictions_ttl"],
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "idle_ttl_seconds": self.idle_ttl_seconds,
+                "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0
+            }
+
+
+# Singleton instance
+_engine_pool: Optional[RAGEnginePool] = None
+_engine_pool_lock = threading.Lock()
+
+def get_rag_engine_pool() -> RAGEnginePool:
+    """Get or create singleton RAGEnginePool instance"""
+    global _engine_pool
+    if _engine_pool is None:
+        with _engine_pool_lock:
+            if _engine_pool is None:
+                _engine_pool = RAGEnginePool()
+    return _engine_pool
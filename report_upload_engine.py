@@ -4,26 +4,29 @@
 
 import os
 import json
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Callable, Dict, List, Optional, Any, Tuple
 from pathlib import Path
 from datetime import datetime
 import tempfile
 import shutil
+import threading
 
-from langchain_text_splitters import CharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
+from langchain_text_splitters import CharacterTextSplitter, RecursiveCharacterTextSplitter
+
+from embedding_registry import get_embeddings
+from ingest_jobs import IngestJobError, get_ingest_queue
+from ingest_pipeline import IngestPipeline
+from mmap_vector_store import committed_tag, store_version
+from pdf_extract import get_pdf_extractor
+from rag_engine_pool import get_rag_engine_pool
 
 
 class ReportProcessor:
     """Process medical reports: extract text, chunk, embed, and store in vector DB"""
     
     def __init__(self):
-        """Initialize embeddings model"""
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'}
-        )
+        """Initialize embeddings model (shared via the embedding registry)"""
+        self.embeddings = get_embeddings()
         # Text splitter for chunking
         self.splitter = CharacterTextSplitter(
             chunk_size=500,
@@ -42,17 +45,10 @@ class ReportProcessor:
             Extracted text
         """
         try:
-            from pypdf import PdfReader
-            
-            text = ""
-            with open(file_path, 'rb') as f:
-                pdf_reader = PdfReader(f)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-            
-            return text
-        except ImportError:
-            raise RuntimeError("pypdf not installed. Install with: pip install pypdf")
+            # Pages are extracted across the PDF process pool and joined once
+            return get_pdf_extractor().extract_text(file_path, separator="\n")
+        except RuntimeError:
+            raise
         except Exception as e:
             raise RuntimeError(f"Failed to extract PDF text: {str(e)}")
     
@@ -130,130 +126,31 @@ class ReportProcessor:
         """
         chunks = self.splitter.split_text(text)
         return [chunk for chunk in chunks if len(chunk.strip()) > 50]
-    
-    def process_report(self, file_path: str) -> Tuple[bool, str, List[str]]:
-        """
-        Complete processing pipeline: extract -> clean -> chunk
-        
-        Args:
-            file_path: Path to medical report file
-            
-        Returns:
-            (success: bool, message: str, chunks: List[str])
-        """
-        try:
-            file_ext = Path(file_path).suffix.lower()
-            
-            # Extract text based on file type
-            if file_ext == '.pdf':
-                raw_text = self.extract_text_from_pdf(file_path)
-                source_type = "PDF"
-            elif file_ext in ['.jpg', '.jpeg', '.png', '.tiff', '.bmp']:
-                raw_text = self.extract_text_from_image(file_path)
-                source_type = "Image (OCR)"
-            elif file_ext in ['.txt']:
-                raw_text = self.extract_text_from_plain_text(file_path)
-                source_type = "Plain Text"
-            else:
-                return False, f"Unsupported file type: {file_ext}", []
-            
-            # Clean text
-            clean_text = self.clean_text(raw_text)
-            
-            if len(clean_text.strip()) < 50:
-                return False, "Extracted text is too short. Please check the file.", []
-            
-            # Chunk text
-            chunks = self.chunk_text(clean_text)
-            
-            if not chunks:
-                return False, "Could not split text into meaningful chunks.", []
-            
-            message = f"Successfully processed {source_type} report: {len(chunks)} chunks extracted"
-            return True, message, chunks
-        
-        except Exception as e:
-            return False, f"Error processing report: {str(e)}", []
 
 
 class PatientVectorStoreManager:
     """Manage patient-specific vector stores and embeddings"""
     
     def __init__(self):
-        """Initialize embeddings model"""
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'}
-        )
+        """Initialize embeddings model (shared via the embedding registry)"""
+        self.embeddings = get_embeddings()
         self.base_path = "vector store"
         os.makedirs(self.base_path, exist_ok=True)
+        self._store_locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
     
     def get_patient_store_path(self, patient_id: str) -> str:
         """Get path for patient-specific vector store"""
         return os.path.join(self.base_path, f"patient_{patient_id}")
     
     def patient_has_reports(self, patient_id: str) -> bool:
-        """Check if patient has indexed reports"""
-        path = self.get_patient_store_path(patient_id)
-        return os.path.exists(path) and os.path.isdir(path)
+        """Check if patient has indexed reports (a committed store, not a partial upload)"""
+        return store_version(self.get_patient_store_path(patient_id)) is not None
     
-    def create_or_update_vector_store(
-        self, 
-        patient_id: str, 
-        text_chunks: List[str],
-        metadata: Optional[Dict[str, Any]] = None
-    ) -> Tuple[bool, str]:
-        """
-        Create or update patient's vector store with embeddings
-        
-        Args:
-            patient_id: Patient identifier
-            text_chunks: List of text chunks to embed
-            metadata: Optional metadata for chunks
-            
-        Returns:
-            (success: bool, message: str)
-        """
-        try:
-            store_path = self.get_patient_store_path(patient_id)
-            
-            # Create metadata for each chunk
-            metadatas = []
-            for i, chunk in enumerate(text_chunks):
-                meta = {
-                    "patient_id": patient_id,
-                    "chunk_index": i,
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-                if metadata:
-                    meta.update(metadata)
-                metadatas.append(meta)
-            
-            # Create FAISS vector store
-            if self.patient_has_reports(patient_id):
-                # Update existing store
-                vector_db = FAISS.load_local(
-                    store_path,
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
-                vector_db.add_texts(text_chunks, metadatas=metadatas)
-                vector_db.save_local(store_path)
-                message = f"Updated patient vector store with {len(text_chunks)} new chunks"
-            else:
-                # Create new store
-                vector_db = FAISS.from_texts(
-                    text_chunks,
-                    self.embeddings,
-                    metadatas=metadatas
-                )
-                vector_db.save_local(store_path)
-                message = f"Created patient vector store with {len(text_chunks)} chunks"
-            
-            return True, message
-        
-        except Exception as e:
-            return False, f"Failed to create/update vector store: {str(e)}"
+    def store_lock(self, patient_id: str) -> threading.Lock:
+        """Lock serializing writes to one patient's store"""
+        with self._locks_lock:
+            return self._store_locks.setdefault(patient_id, threading.Lock())
     
     def delete_patient_vector_store(self, patient_id: str) -> Tuple[bool, str]:
         """
@@ -267,8 +164,12 @@ class PatientVectorStoreManager:
         """
         try:
             store_path = self.get_patient_store_path(patient_id)
-            if os.path.exists(store_path):
-                shutil.rmtree(store_path)
+            with self.store_lock(patient_id):
+                exists = os.path.exists(store_path)
+                if exists:
+                    shutil.rmtree(store_path)
+            if exists:
+                get_rag_engine_pool().invalidate(patient_id)
                 return True, f"Deleted vector store for patient {patient_id}"
             else:
                 return False, f"No vector store found for patient {patient_id}"
@@ -291,6 +192,7 @@ class ReportUploadHandler:
         """Initialize components"""
         self.processor = ReportProcessor()
         self.vector_manager = PatientVectorStoreManager()
+        self.pipeline = IngestPipeline(self.processor)
         self.upload_dir = "uploads"
         os.makedirs(self.upload_dir, exist_ok=True)
     
@@ -328,7 +230,11 @@ class ReportUploadHandler:
         self,
         patient_id: str,
         file_path: str,
-        filename: str
+        filename: str,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        commit_tag: Optional[str] = None,
+        keep_file: bool = False,
+        raise_errors: bool = False
     ) -> Dict[str, Any]:
         """
         Complete pipeline: extract text -> chunk -> embed -> store
@@ -337,6 +243,13 @@ class ReportUploadHandler:
             patient_id: Patient identifier
             file_path: Path to uploaded file
             filename: Original filename
+            on_progress: Called after every indexed batch (see IngestPipeline.run)
+            commit_tag: Tag for the store commit; if a commit with it already exists
+                (a retried job) the report is not indexed again
+            keep_file: Leave the uploaded file in place (the caller removes it)
+            raise_errors: Raise instead of returning success=False: IngestJobError for
+                a file that cannot be indexed, the original exception otherwise (so an
+                ingestion job retries it)
             
         Returns:
             Status dictionary with success/messages
@@ -351,63 +264,136 @@ class ReportUploadHandler:
         }
         
         try:
-            # Step 1: Extract text
-            success, extract_msg, chunks = self.processor.process_report(file_path)
-            
-            if not success:
-                result["message"] = f"Text extraction failed: {extract_msg}"
-                return result
-            
-            result["chunks_count"] = len(chunks)
-            
-            # Step 2: Create/update vector store
             metadata = {
                 "source_file": filename,
                 "source_type": Path(file_path).suffix.lower()
             }
             
-            success, store_msg = self.vector_manager.create_or_update_vector_store(
-                patient_id,
-                chunks,
-                metadata
-            )
-            
-            if not success:
-                result["message"] = f"Vector store creation failed: {store_msg}"
-                return result
-            
-            # Step 3: Mark as successful
+            # Steps 1-4: extract -> chunk -> embed -> append, streamed through
+            # bounded queues and committed once at the end
+            store_path = self.vector_manager.get_patient_store_path(patient_id)
+            with self.vector_manager.store_lock(patient_id):
+                committed = committed_tag(store_path, commit_tag) if commit_tag else None
+                if committed:
+                    result["success"] = True
+                    result["chunks_count"] = committed["rows"]
+                    result["message"] = f"Report already indexed: {committed['rows']} chunks"
+                    return result
+                existed = self.vector_manager.patient_has_reports(patient_id)
+                try:
+                    stats = self.pipeline.run(patient_id, file_path, store_path, metadata,
+                                              on_progress=on_progress, commit_tag=commit_tag)
+                except ValueError as e:
+                    if raise_errors:
+                        raise IngestJobError(f"Text extraction failed: {str(e)}")
+                    result["message"] = f"Text extraction failed: {str(e)}"
+                    return result
+                except Exception as e:
+                    if raise_errors:
+                        raise
+                    result["message"] = f"Vector store creation failed: {str(e)}"
+                    return result
+            
+            result["chunks_count"] = stats["chunks_count"]
+            result["pipeline"] = stats
+            
+            # Step 5: Drop this patient's warm RAG engine so it reloads the new store
+            get_rag_engine_pool().invalidate(patient_id)
+            
+            # Step 6: Mark as successful
+            action = "Updated" if existed else "Created"
             result["success"] = True
-            result["message"] = f"{extract_msg}\n{store_msg}"
+            result["message"] = (
+                f"Successfully processed report: {stats['chunks_count']} chunks from "
+                f"{stats['pages']} page(s)\n"
+                f"{action} patient vector store with {stats['chunks_count']} chunks"
+            )
             
             return result
         
         except Exception as e:
+            if raise_errors:
+                raise
             result["message"] = f"Unexpected error: {str(e)}"
             return result
         
         finally:
             # Clean up temporary file
             try:
-                if os.path.exists(file_path):
+                if not keep_file and os.path.exists(file_path):
                     os.remove(file_path)
             except:
                 pass
     
+    def index_documents(
+        self,
+        patient_id: str,
+        files: List[Tuple[str, str]],
+        chunk_size: int,
+        chunk_overlap: int,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        commit_tag: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Index saved patient records through the ingest pipeline with one commit
+        
+        Args:
+            patient_id: Patient identifier
+            files: (file_path, filename) per record
+            chunk_size: Splitter chunk size
+            chunk_overlap: Splitter chunk overlap
+            on_progress: Called after every indexed batch (see IngestPipeline.run)
+            commit_tag: Tag for the store commit; if a commit with it already exists
+                (a retried job) nothing is indexed again
+            
+        Returns:
+            Pipeline stats (see IngestPipeline.run), or {chunks_count, already_committed}
+            
+        Raises:
+            ValueError: Unsupported file, too little text, or no usable chunks
+        """
+        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        pipeline = IngestPipeline(self.processor, splitter=splitter)
+        sources = [
+            (file_path, {"source_file": filename, "source_type": Path(file_path).suffix.lower()})
+            for file_path, filename in files
+        ]
+        store_path = self.vector_manager.get_patient_store_path(patient_id)
+        with self.vector_manager.store_lock(patient_id):
+            committed = committed_tag(store_path, commit_tag) if commit_tag else None
+            if committed:
+                return {"chunks_count": committed["rows"], "already_committed": True}
+            stats = pipeline.run_many(patient_id, sources, store_path, on_progress=on_progress,
+                                      commit_tag=commit_tag)
+        get_rag_engine_pool().invalidate(patient_id)
+        return stats
+    
     def get_upload_status(self, patient_id: str) -> Dict[str, Any]:
         """
         Get patient's report upload status
         
         Returns:
-            Status dict with has_medical_report flag
+            Status dict with has_medical_report flag and any upload still being indexed
         """
+        # The gate opens on the store's commit marker (manifest.json), which the
+        # ingest pipeline writes only after the last chunk of a report is indexed
         has_reports = self.vector_manager.patient_has_reports(patient_id)
+        active_jobs = get_ingest_queue().active_jobs(patient_id)
+        
+        if has_reports:
+            status = "Ready for monitoring"
+        elif active_jobs:
+            status = "Indexing medical report"
+        else:
+            status = "Awaiting medical report upload"
         
         return {
             "patient_id": patient_id,
             "has_medical_report": has_reports,
-            "status": "Ready for monitoring" if has_reports else "Awaiting medical report upload",
-            "can_proceed_with_monitoring": has_reports
+            "status": status,
+            "can_proceed_with_monitoring": has_reports,
+            "indexing": bool(active_jobs),
+            "active_job_ids": [job["job_id"] for job in active_jobs]
         }
 
 
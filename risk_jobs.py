@@ -0,0 +1,116 @@
+"""
+Deferred Risk Assessment Jobs
+In-memory registry of risk assessments that finish after the chat answer was returned
+
+RAGEngine (risk_mode="deferred") creates a job per assessed turn; the API polls it
+via GET /api/chat/risk/{job_id}. Finished jobs are kept for RISK_JOB_TTL_SECONDS.
+"""
+
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+DEFAULT_JOB_TTL_SECONDS = float(os.getenv("RISK_JOB_TTL_SECONDS", "3600"))
+
+STATUS_PENDING = "pending"
+STATUS_COMPLETE = "complete"
+STATUS_FAILED = "failed"
+
+
+class RiskJobStore:
+    """
+    Thread-safe job registry with TTL cleanup
+    """
+
+    def __init__(self, ttl_seconds: float = DEFAULT_JOB_TTL_SECONDS, clock=time.monotonic):
+        """
+        Args:
+            ttl_seconds: How long finished jobs stay pollable
+            clock: Monotonic time source (injectable for tests)
+        """
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._finished_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def create(self, patient_id: str, message_id: Optional[int] = None) -> str:
+        """
+        Register a pending assessment
+
+        Returns:
+            New job id
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._purge_expired()
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "patient_id": patient_id,
+                "message_id": message_id,
+                "status": STATUS_PENDING,
+                "result": None,
+                "error": None,
+                "created_at": datetime.now().isoformat(),
+                "completed_at": None
+            }
+        return job_id
+
+    def complete(self, job_id: str, result: Dict[str, Any], message_id: Optional[int] = None):
+        """Store a finished assessment (and the chat message it belongs to, if known by now)"""
+        self._finish(job_id, STATUS_COMPLETE, result=result, message_id=message_id)
+
+    def fail(self, job_id: str, error: str):
+        """Mark an assessment as failed"""
+        self._finish(job_id, STATUS_FAILED, error=error)
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None, message_id: Optional[int] = None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(status=status, result=result, error=error,
+                       completed_at=datetime.now().isoformat())
+            if message_id is not None:
+                job["message_id"] = message_id
+            self._finished_at[job_id] = self._clock()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Snapshot of a job, or None if unknown/expired"""
+        with self._lock:
+            self._purge_expired()
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _purge_expired(self):
+        """Drop finished jobs older than the TTL (lock held)"""
+        cutoff = self._clock() - self.ttl_seconds
+        for job_id in [j for j, finished in self._finished_at.items() if finished < cutoff]:
+            del self._finished_at[job_id]
+            self._jobs.pop(job_id, None)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Job counts by status"""
+        with self._lock:
+            counts = {STATUS_PENDING: 0, STATUS_COMPLETE: 0, STATUS_FAILED: 0}
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+            return counts
+
+
+# Singleton instance
+_risk_jobs: Optional[RiskJobStore] = None
+_risk_jobs_lock = threading.Lock()
+
+def get_risk_job_store() -> RiskJobStore:
+    """Get or create singleton RiskJobStore instance"""
+    global _risk_jobs
+    if _risk_jobs is None:
+        with _risk_jobs_lock:
+            if _risk_jobs is None:
+                _risk_jobs = RiskJobStore()
+    return _risk_jobs
@@ -0,0 +1,268 @@
+"""
+Shared Medical Books Index Service
+Loads vector store/shared once per process and shares it read-only with every patient
+The index is memory-mapped (mmap format, or FAISS mmap when supported) so forked workers share pages,
+and a rebuilt index is hot-swapped atomically without restarting the API
+Results for the fixed monitoring-guidance queries are computed with each snapshot
+and served from memory
+"""
+
+import os
+import pickle
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import faiss
+from langchain_community.vectorstores import FAISS
+
+from dual_retrieval import DEFAULT_QUOTAS, SOURCE_SHARED
+from embedding_registry import get_embeddings
+from mmap_vector_store import MANIFEST_FILE, MmapVectorStore, is_mmap_store
+
+SHARED_INDEX_PATH = "vector store/shared"
+DEFAULT_RELOAD_CHECK_INTERVAL = float(os.getenv("SHARED_INDEX_RELOAD_CHECK_SECONDS", "5"))
+
+# Fixed retrieval strings used by the monitoring endpoints; identical for every patient
+MONITORING_GUIDANCE_QUERIES = (
+    "neurological symptoms monitoring",
+    "neurological symptoms risk assessment",
+)
+PRECOMPUTED_K = DEFAULT_QUOTAS[SOURCE_SHARED]
+
+
+def _read_faiss_index(index_file: str) -> Tuple[Any, bool]:
+    """
+    Read a FAISS index, memory-mapped when the index type supports it
+
+    Returns:
+        (index, memory_mapped)
+    """
+    try:
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        return faiss.read_index(index_file, flags), True
+    except Exception:
+        # Index type without mmap support: fall back to a regular read
+        return faiss.read_index(index_file), False
+
+
+def _vector_count(db) -> int:
+    """Number of vectors in either store type"""
+    if isinstance(db, MmapVectorStore):
+        return db.count
+    return db.index.ntotal
+
+
+class SharedIndexService:
+    """
+    Process-level holder of the shared medical books vector store
+
+    get() always returns a complete index snapshot; reload() builds the new
+    one off to the side and swaps the reference under a lock, so in-flight
+    searches keep using the old snapshot until they finish.
+    """
+
+    def __init__(self, path: str = SHARED_INDEX_PATH,
+                 reload_check_interval: float = DEFAULT_RELOAD_CHECK_INTERVAL,
+                 precomputed_queries: Iterable[str] = MONITORING_GUIDANCE_QUERIES,
+                 precomputed_k: int = PRECOMPUTED_K):
+        """
+        Args:
+            path: Store directory (mmap format or legacy index.faiss / index.pkl)
+            reload_check_interval: Seconds between on-disk version checks (0 disables)
+            precomputed_queries: Queries searched once per snapshot and served from memory
+            precomputed_k: Hits kept per precomputed query
+        """
+        self.path = path
+        self.reload_check_interval = reload_check_interval
+        self.precomputed_queries = tuple(precomputed_queries)
+        self.precomputed_k = precomputed_k
+        self._db: Optional[Any] = None
+        self._precomputed: Dict[str, List[Dict[str, Any]]] = {}
+        self._version: Optional[Tuple[int, int]] = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            "loads": 0,
+            "load_seconds": None,
+            "loaded_at": None,
+            "memory_mapped": False,
+            "vectors": 0,
+            "precomputed_hits": 0
+        }
+
+    def _disk_version(self) -> Optional[Tuple[int, int]]:
+        """(mtime_ns, size) of the commit file (manifest.json or index.faiss), or None if missing"""
+        for name in (MANIFEST_FILE, "index.faiss"):
+            try:
+                stat = os.stat(os.path.join(self.path, name))
+                return (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                continue
+        return None
+
+    def _load(self):
+        """Load the index from disk (mmap format preferred, legacy FAISS otherwise)"""
+        if is_mmap_store(self.path):
+            self._stats["memory_mapped"] = True
+            return MmapVectorStore(self.path, get_embeddings())
+
+        index, memory_mapped = _read_faiss_index(os.path.join(self.path, "index.faiss"))
+        with open(os.path.join(self.path, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+
+        self._stats["memory_mapped"] = memory_mapped
+        return FAISS(
+            embedding_function=get_embeddings(),
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id
+        )
+
+    def _precompute(self, db) -> Dict[str, List[Dict[str, Any]]]:
+        """Search the fixed queries against a new snapshot (before it is swapped in)"""
+        if not self.precomputed_queries:
+            return {}
+        embedding = get_embeddings()
+        precomputed = {}
+        for query in self.precomputed_queries:
+            hits = db.similarity_search_with_score_by_vector(embedding.embed_query(query), k=self.precomputed_k)
+            precomputed[query] = [
+                {
+                    "content": doc.page_content,
+                    "score": float(score),
+                    "source": SOURCE_SHARED,
+                    "metadata": dict(doc.metadata or {})
+                }
+                for doc, score in hits
+            ]
+        return precomputed
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Load the on-disk index and atomically swap it in
+
+        Args:
+            force: Reload even if the on-disk version has not changed
+
+        Returns:
+            True if an index is installed, False if none is available
+        """
+        # Serialize loads so concurrent first requests do not load it twice
+        with self._reload_lock:
+            version = self._disk_version()
+            if version is None:
+                print(f"⚠️ Shared medical books vector store not found at {self.path}")
+                return self._db is not None
+            if not force and self._db is not None and version == self._version:
+                return True
+
+            start = time.perf_counter()
+            try:
+                db = self._load()
+            except Exception as e:
+                # Keep serving the previous snapshot if the new one is unreadable
+                print(f"❌ Failed to load shared vector store: {e}")
+                return self._db is not None
+            load_seconds = time.perf_counter() - start
+
+            try:
+                precomputed = self._precompute(db)
+            except Exception as e:
+                # Not fatal: those queries fall back to a live search
+                print(f"⚠️ Failed to precompute monitoring guidance retrieval: {e}")
+                precomputed = {}
+
+            with self._lock:
+                self._db = db
+                self._precomputed = precomputed
+                self._version = version
+                self._last_check = time.monotonic()
+                self._stats["loads"] += 1
+                self._stats["load_seconds"] = round(load_seconds, 3)
+                self._stats["loaded_at"] = datetime.utcnow().isoformat()
+                self._stats["vectors"] = _vector_count(db)
+
+        print(f"✅ Loaded shared medical books vector store ({_vector_count(db)} vectors, {load_seconds:.2f}s)")
+        return True
+
+    def get(self) -> Optional[Any]:
+        """
+        Get the current shared index, loading or hot-swapping it if needed
+
+        Returns:
+            MmapVectorStore or FAISS vector store, or None if the shared index does not exist
+        """
+        with self._lock:
+            db = self._db
+            due = (self.reload_check_interval > 0 and
+                   time.monotonic() - self._last_check >= self.reload_check_interval)
+            if due:
+                self._last_check = time.monotonic()
+
+        if db is None:
+            self.reload()
+            return self._db
+
+        if due:
+            version = self._disk_version()
+            if version is not None and version != self._version:
+                print("🔄 Shared medical books index changed on disk, hot-swapping")
+                self.reload()
+
+        return self._db
+
+    def get_precomputed(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Shared-index hits computed when the current snapshot was loaded
+
+        Args:
+            query: Exact query string (one of precomputed_queries)
+
+        Returns:
+            Copies of {content, score, source, metadata} hits, or None if not precomputed
+        """
+        if query not in self.precomputed_queries or self.get() is None:
+            return None
+        with self._lock:
+            hits = self._precomputed.get(query)
+            if hits is None:
+                return None
+            self._stats["precomputed_hits"] += 1
+            return [dict(hit, metadata=dict(hit["metadata"])) for hit in hits]
+
+    def is_loaded(self) -> bool:
+        """Check whether an index snapshot is installed"""
+        return self._db is not None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Load count, load time, vector count and mmap status"""
+        with self._lock:
+            return {"path": self.path, "loaded": self._db is not None, **self._stats,
+                    "precomputed_queries": len(self._precomputed)}
+
+
+# Singleton instance
+_shared_index: Optional[SharedIndexService] = None
+_shared_index_lock = threading.Lock()
+
+def get_shared_index_service() -> SharedIndexService:
+    """Get or create singleton SharedIndexService instance"""
+    global _shared_index
+    if _shared_index is None:
+        with _shared_index_lock:
+            if _shared_index is None:
+                _shared_index = SharedIndexService()
+    return _shared_index
+
+
+def notify_shared_index_rebuilt() -> bool:
+    """
+    Hot-swap the in-process shared index after a rebuild
+    No-op if this process has not loaded the shared index yet
+    """
+    if _shared_index is None or not _shared_index.is_loaded():
+        return False
+    return _shared_index.reload(force=True)
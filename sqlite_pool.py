@@ -0,0 +1,102 @@
+"""
+SQLite Connection Pool
+Per-thread SQLite connections configured for concurrent access
+
+Each thread (executor worker, request thread) keeps one open connection, so the
+connection setup cost and the sqlite3 prepared-statement cache are reused across
+calls instead of being thrown away by a connect/close per method. Connections run
+in WAL mode (readers never block the writer), wait up to busy_timeout for the
+write lock instead of failing with "database is locked", and use synchronous=NORMAL,
+which is durable across application crashes in WAL mode.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+DEFAULT_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+DEFAULT_CACHED_STATEMENTS = 256
+
+
+class ConnectionPool:
+    """
+    One long-lived connection per thread for a single database file
+    """
+
+    def __init__(self, db_path: str, busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+                 cached_statements: int = DEFAULT_CACHED_STATEMENTS):
+        """
+        Args:
+            db_path: SQLite database file
+            busy_timeout_ms: How long a writer waits for the lock before failing
+            cached_statements: Prepared statements kept per connection
+        """
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._stats = {"opened": 0, "transactions": 0, "rollbacks": 0}
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            cached_statements=self.cached_statements,
+            check_same_thread=False  # only the owning thread uses it; close() may run elsewhere
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        with self._lock:
+            self._connections.append(conn)
+            self._stats["opened"] += 1
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection (opened on first use)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Run a block on this thread's connection, committing on success and
+        rolling back on any exception
+        """
+        conn = self.connection()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            with self._lock:
+                self._stats["rollbacks"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._stats["transactions"] += 1
+
+    def close(self):
+        """Close every connection opened by the pool (threads reopen on next use)"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Connection and transaction counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["open_connections"] = len(self._connections)
+        stats["busy_timeout_ms"] = self.busy_timeout_ms
+        return stats
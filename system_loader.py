@@ -5,11 +5,14 @@ Run once on first startup or when vector store is missing
 """
 
 import os
+import shutil
 import sys
 from typing import List
 import falcon
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
+from embedding_registry import get_embeddings
+from shared_index import notify_shared_index_rebuilt
+from mmap_vector_store import MmapVectorStore, faiss_to_arrays, is_mmap_store, swap_in_directory
 
 
 def load_shared_medical_books(force_rebuild: bool = False) -> bool:
@@ -99,14 +102,24 @@ def load_shared_medical_books(force_rebuild: bool = False) -> bool:
     print("⏳ This may take several minutes depending on document size...")
     
     try:
-        embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={"device": "cpu"}
-        )
+        embeddings = get_embeddings()
         db = FAISS.from_documents(split_docs, embeddings)
         os.makedirs(os.path.dirname(shared_vs_path), exist_ok=True)
-        db.save_local(shared_vs_path)
+        
+        # Write to a staging directory and swap it in, so running API
+        # processes never observe a half-written index
+        staging_path = shared_vs_path + ".building"
+        if os.path.exists(staging_path):
+            shutil.rmtree(staging_path)
+        db.save_local(staging_path)
+        # Memory-mapped copy of the same index, preferred by the shared index service
+        vectors, texts, metadatas, ids = faiss_to_arrays(db.index, db.docstore, db.index_to_docstore_id)
+        MmapVectorStore.create(staging_path, embeddings, vectors, texts, metadatas, ids=ids)
+        swap_in_directory(staging_path, shared_vs_path)
         print(f"✅ Shared medical books vector store created at {shared_vs_path}")
+        
+        # Hot-swap the index in this process (API processes pick it up on their next check)
+        notify_shared_index_rebuilt()
         print(f"📊 Total chunks embedded: {len(split_docs)}")
         return True
     
@@ -127,9 +140,9 @@ def verify_shared_vector_store() -> bool:
     if not os.path.exists(shared_vs_path):
         return False
     
-    # Check for FAISS index file
+    # Check for FAISS index file (or the memory-mapped format)
     index_file = os.path.join(shared_vs_path, "index.faiss")
-    if not os.path.exists(index_file):
+    if not os.path.exists(index_file) and not is_mmap_store(shared_vs_path):
         print(f"⚠️ Vector store folder exists but index.faiss not found")
         return False
     
@@ -0,0 +1,121 @@
+"""
+Semantic Answer Cache Tests
+Verifies similarity threshold, per-patient scoping, TTL, store-version invalidation and audit
+"""
+
+from answer_cache import SemanticAnswerCache
+from patient_manager import PatientManager
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+HEADACHE = [1.0, 0.0, 0.0]
+HEADACHE_REPHRASED = [0.99, 0.05, 0.0]
+DIZZINESS = [0.0, 1.0, 0.0]
+
+
+def make_cache(**kwargs):
+    kwargs.setdefault("threshold", 0.95)
+    return SemanticAnswerCache(**kwargs)
+
+
+def test_near_duplicate_hits_and_distinct_question_misses():
+    cache = make_cache()
+    cache.add("P001", "Do I have a headache today?", HEADACHE, "v1", {"answer": "Rate it 0-10."})
+
+    hit = cache.lookup("P001", "do i have headache today", HEADACHE_REPHRASED, "v1")
+    assert hit["payload"]["answer"] == "Rate it 0-10."
+    assert hit["question"] == "Do I have a headache today?"
+    assert hit["similarity"] >= 0.95
+
+    assert cache.lookup("P001", "Am I dizzy?", DIZZINESS, "v1") is None
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_entries_are_scoped_per_patient_and_turn():
+    cache = make_cache()
+    cache.add("P001", "headache?", HEADACHE, "v1", {"answer": "a"}, scope=0)
+
+    assert cache.lookup("P002", "headache?", HEADACHE, "v1", scope=0) is None
+    assert cache.lookup("P001", "headache?", HEADACHE, "v1", scope=1) is None
+    assert cache.lookup("P001", "headache?", HEADACHE, "v1", scope=0) is not None
+
+
+def test_store_change_invalidates_patient_entries():
+    cache = make_cache()
+    cache.add("P001", "headache?", HEADACHE, "v1", {"answer": "a"})
+
+    assert cache.lookup("P001", "headache?", HEADACHE, "v2") is None
+    assert cache.lookup("P001", "headache?", HEADACHE, "v1") is None  # dropped, not hidden
+    assert cache.get_stats()["invalidations"] == 1
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = make_cache(ttl_seconds=60, clock=clock)
+    cache.add("P001", "headache?", HEADACHE, "v1", {"answer": "a"})
+
+    clock.now = 59
+    assert cache.lookup("P001", "headache?", HEADACHE, "v1") is not None
+    clock.now = 61
+    assert cache.lookup("P001", "headache?", HEADACHE, "v1") is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_every_hit_is_audited():
+    cache = make_cache()
+    cache.add("P001", "headache?", HEADACHE, "v1", {"answer": "a"})
+    cache.add("P002", "dizzy?", DIZZINESS, "v1", {"answer": "b"})
+    cache.lookup("P001", "any headache?", HEADACHE_REPHRASED, "v1")
+    cache.lookup("P002", "feeling dizzy?", DIZZINESS, "v1")
+
+    audit = cache.get_audit_log("P001")
+    assert len(audit) == 1
+    assert audit[0]["question"] == "any headache?"
+    assert audit[0]["cached_question"] == "headache?"
+    assert [r["patient_id"] for r in cache.get_audit_log()] == ["P002", "P001"]
+
+
+def test_hits_are_recorded_durably_before_the_answer_is_reused(tmp_path):
+    pm = PatientManager(db_path=str(tmp_path / "patient_data.db"))
+    pm.register_patient("P001", "Test Patient")
+    cache = make_cache(audit_store=pm)
+    cache.add("P001", "headache?", HEADACHE, (1, 2), {"answer": "a"})
+    assert cache.lookup("P001", "any headache?", HEADACHE_REPHRASED, (1, 2)) is not None
+
+    # A restarted process has an empty in-memory log but the same audit trail
+    restarted = make_cache(audit_store=pm)
+    audit = restarted.get_audit_log("P001")
+    assert len(audit) == 1
+    assert audit[0]["question"] == "any headache?" and audit[0]["cached_question"] == "headache?"
+    assert audit[0]["store_version"] == [1, 2]
+    assert restarted.get_audit_log("P002") == []
+    pm.close()
+
+
+def test_hit_that_cannot_be_audited_is_a_miss():
+    class BrokenStore:
+        def record_answer_cache_hit(self, record):
+            raise OSError("disk I/O error")
+
+    cache = make_cache(audit_store=BrokenStore())
+    cache.add("P001", "headache?", HEADACHE, "v1", {"answer": "a"})
+
+    assert cache.lookup("P001", "headache?", HEADACHE, "v1") is None
+    stats = cache.get_stats()
+    assert stats["hits"] == 0 and stats["audit_failures"] == 1
+
+
+def test_oldest_entries_dropped_beyond_limit():
+    cache = make_cache(max_entries_per_patient=1)
+    cache.add("P001", "headache?", HEADACHE, "v1", {"answer": "a"})
+    cache.add("P001", "dizzy?", DIZZINESS, "v1", {"answer": "b"})
+
+    assert cache.lookup("P001", "headache?", HEADACHE, "v1") is None
+    assert cache.lookup("P001", "dizzy?", DIZZINESS, "v1")["payload"]["answer"] == "b"
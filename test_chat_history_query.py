@@ -0,0 +1,73 @@
+"""
+Chat History Query Tests
+Verifies column projection, keyset pagination and lazy source_documents decoding
+"""
+
+import pytest
+
+from patient_manager import (
+    LazySourceDocuments,
+    PatientManager,
+    decode_history_cursor,
+    encode_history_cursor,
+)
+
+
+@pytest.fixture
+def pm(tmp_path):
+    manager = PatientManager(db_path=str(tmp_path / "patient_data.db"))
+    manager.register_patient("P001", "Alice")
+    manager.insert_chat_messages([
+        {"patient_id": "P001", "question": f"q{i}", "answer": f"a{i}", "risk_level": "LOW",
+         "risk_reason": "r", "source_documents": [f"doc{i}"]}
+        for i in range(7)
+    ])
+    yield manager
+    manager.close()
+
+
+def test_projection_reads_only_requested_columns(pm):
+    page = pm.query_patient_history("P001", columns=["question", "risk_level"], limit=3)
+    assert [set(item) for item in page["items"]] == [{"id", "question", "risk_level"}] * 3
+    assert [item["question"] for item in page["items"]] == ["q4", "q5", "q6"]
+
+    with pytest.raises(ValueError):
+        pm.query_patient_history("P001", columns=["question; DROP TABLE patients"])
+
+
+def test_keyset_pages_cover_history_once(pm):
+    seen, cursor = [], None
+    while True:
+        page = pm.query_patient_history("P001", columns=["question"], limit=3, cursor=cursor)
+        seen = [item["question"] for item in page["items"]] + seen
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"q{i}" for i in range(7)]
+
+    streamed = [m["question"] for m in pm.iter_patient_history("P001", columns=["question"], page_size=2)]
+    assert streamed == [f"q{i}" for i in reversed(range(7))]
+
+
+def test_before_id_filter(pm):
+    newest = pm.query_patient_history("P001", columns=["question"], limit=1)["items"][0]
+    page = pm.query_patient_history("P001", columns=["question"], limit=10, before_id=newest["id"])
+    assert [item["question"] for item in page["items"]] == [f"q{i}" for i in range(6)]
+    assert page["next_cursor"] is None
+
+
+def test_source_documents_decoded_lazily(pm):
+    item = pm.query_patient_history("P001", limit=1)["items"][0]
+    docs = item["source_documents"]
+    assert isinstance(docs, LazySourceDocuments)
+    assert docs._decoded is None
+    assert list(docs) == ["doc6"] and docs == ["doc6"]
+
+    # Legacy API still returns plain lists
+    assert pm.get_patient_history("P001", limit=1)[0]["source_documents"] == ["doc6"]
+
+
+def test_cursor_round_trip_and_validation():
+    assert decode_history_cursor(encode_history_cursor(1760000000, 42)) == (1760000000, 42)
+    with pytest.raises(ValueError):
+        decode_history_cursor("not-a-cursor")
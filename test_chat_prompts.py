@@ -0,0 +1,35 @@
+"""
+Chat Prompt Tests
+Verifies the static system prompt stays identical across turns and slots go in the user message
+"""
+
+from chat_prompts import CHAT_SYSTEM_PROMPT, create_chat_messages, create_chat_turn_prompt
+
+
+def test_system_message_is_identical_across_turns():
+    first = create_chat_messages(create_chat_turn_prompt(1, 6, "context A"))
+    later = create_chat_messages(create_chat_turn_prompt(4, 6, "context B", "User: yes\nAssistant: How strong?"))
+
+    assert first[0] == later[0] == {"role": "system", "content": CHAT_SYSTEM_PROMPT}
+    assert first[1]["role"] == later[1]["role"] == "user"
+
+
+def test_turn_prompt_carries_the_dynamic_slots():
+    prompt = create_chat_turn_prompt(3, 6, "Stroke warning signs.", "User: no\nAssistant: Any dizziness?")
+
+    assert prompt.startswith("Question number: 3/6")
+    assert "Retrieved medical context:\nStroke warning signs." in prompt
+    assert prompt.endswith("Previous conversation:\nUser: no\nAssistant: Any dizziness?")
+    assert "Previous conversation" not in create_chat_turn_prompt(1, 6, "ctx")
+
+
+def test_system_prompt_has_no_unfilled_slots():
+    assert "{context}" not in CHAT_SYSTEM_PROMPT
+    assert "{self." not in CHAT_SYSTEM_PROMPT
+    assert '"risk_level": "LOW|MEDIUM|HIGH"' in CHAT_SYSTEM_PROMPT
+
+
+def test_returned_messages_do_not_share_state():
+    messages = create_chat_messages("turn")
+    messages[0]["content"] = "mutated"
+    assert create_chat_messages("turn")[0]["content"] == CHAT_SYSTEM_PROMPT
@@ -0,0 +1,90 @@
+"""
+Chat Write-Behind Queue Tests
+Verifies batching, id resolution, flush/close and synchronous mode
+"""
+
+import threading
+
+from chat_writer import ChatWriteQueue
+from patient_manager import PatientManager
+
+
+def make_pm(tmp_path):
+    pm = PatientManager(db_path=str(tmp_path / "patients.db"))
+    pm.register_patient("P001", "Alice")
+    pm.register_patient("P002", "Bob")
+    return pm
+
+
+def submit(writer, patient_id, n):
+    return writer.submit(patient_id, f"q{n}", f"a{n}", "LOW", "stable", ["doc"])
+
+
+def test_messages_are_batched_and_ids_resolved(tmp_path):
+    pm = make_pm(tmp_path)
+    writer = ChatWriteQueue(pm, flush_interval=0.2, max_batch=100)
+
+    futures = [submit(writer, "P001" if n % 2 else "P002", n) for n in range(20)]
+    ids = [f.result(timeout=5) for f in futures]
+
+    assert None not in ids and len(set(ids)) == 20
+    stats = writer.get_stats()
+    assert stats["written"] == 20
+    assert stats["batches"] < 20
+    assert len(pm.get_patient_history("P001", limit=100)) == 10
+    writer.close()
+    pm.close()
+
+
+def test_max_batch_bounds_each_transaction(tmp_path):
+    pm = make_pm(tmp_path)
+    writer = ChatWriteQueue(pm, flush_interval=0.5, max_batch=4)
+
+    futures = [submit(writer, "P001", n) for n in range(10)]
+    assert writer.flush(timeout=5)
+
+    assert all(f.done() for f in futures)
+    assert writer.get_stats()["max_batch_size"] <= 4
+    writer.close()
+    pm.close()
+
+
+def test_unknown_patient_resolves_to_none(tmp_path):
+    pm = make_pm(tmp_path)
+    writer = ChatWriteQueue(pm, flush_interval=0.01)
+
+    assert submit(writer, "missing", 1).result(timeout=5) is None
+    assert submit(writer, "P001", 2).result(timeout=5) is not None
+    assert writer.get_stats()["failed"] == 1
+    writer.close()
+    pm.close()
+
+
+def test_close_flushes_pending_messages(tmp_path):
+    pm = make_pm(tmp_path)
+    writer = ChatWriteQueue(pm, flush_interval=30)  # would otherwise wait 30s
+
+    futures = []
+    threads = [threading.Thread(target=lambda n=n: futures.append(submit(writer, "P001", n))) for n in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close(timeout=5)
+
+    assert all(f.done() and f.result() is not None for f in futures)
+    assert len(pm.get_patient_history("P001", limit=100)) == 5
+    # After close, submits are written synchronously
+    assert submit(writer, "P001", 99).done()
+    pm.close()
+
+
+def test_disabled_queue_writes_synchronously(tmp_path):
+    pm = make_pm(tmp_path)
+    writer = ChatWriteQueue(pm, enabled=False)
+
+    future = submit(writer, "P001", 1)
+
+    assert future.done() and future.result() is not None
+    assert writer.get_stats()["pending"] == 0
+    pm.close()
@@ -0,0 +1,66 @@
+"""
+Columnar Chunk Store Tests
+Verifies metadata round-trips through the typed columns without pickling
+"""
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from chunk_store import DICTS_FILE, ChunkStore, append_chunks
+
+
+def test_round_trip_text_and_metadata(tmp_path):
+    texts = ["First chunk", "Zweiter Abschnitt – ünïcödé", "third"]
+    metadatas = [
+        {"patient_id": "P001", "chunk_index": 0, "timestamp": "2024-05-01T10:20:30.123456",
+         "source_file": "report.pdf", "source_type": ".pdf"},
+        {"patient_id": "P001", "chunk_index": 1, "timestamp": "2024-05-01T10:20:30",
+         "source_file": "report.pdf", "source_type": ".pdf"},
+        None,
+    ]
+    text_bytes = append_chunks(str(tmp_path), 0, 0, texts, metadatas)
+    store = ChunkStore(str(tmp_path), 3, text_bytes)
+
+    assert [store.get_text(i) for i in range(3)] == texts
+    assert store.get_metadata(0) == metadatas[0]
+    assert store.get_metadata(1) == metadatas[1]
+    assert store.get_metadata(2) == {}
+
+    doc = store.get_document(1)
+    assert doc.page_content == texts[1]
+    assert doc.metadata["source_file"] == "report.pdf"
+
+
+def test_values_that_do_not_fit_columns_are_kept(tmp_path):
+    metadata = {"chunk_index": "7", "timestamp": "2024-05-01T10:20:30+00:00", "page": 3}
+    text_bytes = append_chunks(str(tmp_path), 0, 0, ["x"], [metadata])
+
+    assert ChunkStore(str(tmp_path), 1, text_bytes).get_metadata(0) == metadata
+
+
+def test_repeated_values_are_dictionary_encoded(tmp_path):
+    n = 500
+    metadatas = [{"source_file": "book.pdf", "patient_id": "P002", "source_type": ".pdf"}] * n
+    append_chunks(str(tmp_path), 0, 0, ["chunk"] * n, metadatas)
+
+    dicts = (tmp_path / DICTS_FILE).read_text()
+    assert dicts.count("book.pdf") == 1
+
+
+def test_append_only_exposes_committed_rows(tmp_path):
+    first = append_chunks(str(tmp_path), 0, 0, ["a", "b"], [{"source_file": "one.txt"}] * 2)
+    second = append_chunks(str(tmp_path), 2, first, ["c"], [{"source_file": "two.txt"}])
+
+    old_view = ChunkStore(str(tmp_path), 2, first)
+    new_view = ChunkStore(str(tmp_path), 3, second)
+    assert len(old_view) == 2
+    assert new_view.get_text(2) == "c"
+    assert new_view.get_metadata(2) == {"source_file": "two.txt"}
+    assert new_view.get_metadata(0) == {"source_file": "one.txt"}
+
+    # Re-appending from the old commit point overwrites the uncommitted row
+    third = append_chunks(str(tmp_path), 2, first, ["d"], None)
+    view = ChunkStore(str(tmp_path), 3, third)
+    assert view.get_text(2) == "d"
+    assert view.get_metadata(2) == {}
@@ -0,0 +1,70 @@
+"""
+Context Assembler Tests
+Verifies whole-chunk packing, budget accounting and near-duplicate removal
+"""
+
+from context_assembler import ContextAssembler, estimate_tokens
+
+
+def sentence(topic, n=12):
+    return f"Patients with {topic} " + " ".join(f"word{i}" for i in range(n)) + "."
+
+
+def test_estimate_tokens_counts_words_and_punctuation():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("Any pain today?") == 4
+    assert estimate_tokens("hemiparesis") > estimate_tokens("pain")
+
+
+def test_chunks_are_packed_whole_within_budget():
+    chunks = [sentence("stroke"), sentence("seizure"), sentence("migraine")]
+    budget = estimate_tokens(chunks[0]) + estimate_tokens(chunks[1]) + 2
+
+    result = ContextAssembler().assemble(chunks, budget)
+
+    assert result["chunks"] == chunks[:2]
+    assert result["context"] == "\n\n".join(chunks[:2])
+    assert result["tokens_used"] <= budget
+    assert result["over_budget_dropped"] == 1
+
+
+def test_smaller_lower_ranked_chunk_fills_remaining_budget():
+    big = sentence("stroke", n=40)
+    small = "Check blood pressure."
+    budget = estimate_tokens(sentence("seizure")) + estimate_tokens(small) + 2
+
+    result = ContextAssembler().assemble([sentence("seizure"), big, small], budget)
+
+    assert result["chunks"] == [sentence("seizure"), small]
+
+
+def test_near_duplicates_are_removed():
+    original = sentence("stroke", n=30)
+    overlapping = original.replace("word29", "word30")
+
+    result = ContextAssembler().assemble([original, overlapping, sentence("seizure")], budget=1000)
+
+    assert result["chunks"] == [original, sentence("seizure")]
+    assert result["duplicates_dropped"] == 1
+
+
+def test_oversized_first_chunk_is_cut_at_a_sentence_boundary():
+    chunk = "First sentence here. Second sentence is here. " + " ".join(["filler"] * 200)
+
+    result = ContextAssembler().assemble([chunk], budget=12)
+
+    assert result["context"] == "First sentence here. Second sentence is here."
+    assert result["tokens_used"] <= 12
+
+
+def test_stats_report_usage_per_purpose():
+    assembler = ContextAssembler()
+    assembler.assemble([sentence("stroke")], budget=100, purpose="answer")
+    assembler.assemble([sentence("stroke")], budget=100, purpose="risk")
+    assembler.assemble([sentence("stroke")], budget=100, purpose="risk")
+
+    stats = assembler.get_stats()
+    assert stats["answer"]["calls"] == 1
+    assert stats["risk"]["calls"] == 2
+    assert stats["risk"]["tokens_used"] == 2 * estimate_tokens(sentence("stroke"))
+    assert 0 < stats["risk"]["budget_utilization"] < 1
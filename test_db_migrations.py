@@ -0,0 +1,171 @@
+"""
+Database Migration Tests
+Verifies in-place upgrade of a version-0 patient database and index use
+"""
+
+import sqlite3
+
+from db_migrations import SCHEMA_VERSION, get_schema_version, migrate
+from patient_manager import PatientManager
+
+LEGACY_SCHEMA = [
+    '''CREATE TABLE patients (
+        patient_id TEXT PRIMARY KEY, name TEXT NOT NULL, email TEXT UNIQUE, age INTEGER,
+        medical_history TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+    '''CREATE TABLE chat_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, patient_id TEXT NOT NULL, question TEXT NOT NULL,
+        answer TEXT NOT NULL, risk_level TEXT, risk_reason TEXT, source_documents TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+]
+
+
+def make_legacy_db(path):
+    conn = sqlite3.connect(path)
+    for statement in LEGACY_SCHEMA:
+        conn.execute(statement)
+    conn.execute("INSERT INTO patients (patient_id, name) VALUES ('P001', 'Alice')")
+    for i, (risk, stamp) in enumerate([("LOW", "2026-01-01 08:00:00"), ("HIGH", "2026-01-02 09:30:00")]):
+        conn.execute(
+            "INSERT INTO chat_history (patient_id, question, answer, risk_level, risk_reason, "
+            "source_documents, timestamp) VALUES ('P001', ?, 'a', ?, 'r', '[]', ?)",
+            (f"q{i}", risk, stamp)
+        )
+    conn.commit()
+    conn.close()
+
+
+def test_legacy_database_upgrades_in_place(tmp_path):
+    path = str(tmp_path / "patient_data.db")
+    make_legacy_db(path)
+
+    pm = PatientManager(db_path=path)
+    conn = sqlite3.connect(path)
+
+    assert get_schema_version(conn) == SCHEMA_VERSION
+    assert conn.execute("SELECT ts FROM chat_history ORDER BY id").fetchall() == [(1767254400,), (1767346200,)]
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_chat_history_patient_ts", "idx_chat_history_patient_risk_ts"} <= indexes
+
+    assert [h["question"] for h in pm.get_patient_history("P001")] == ["q0", "q1"]
+    assert pm.get_patient_risk_summary("P001", days=100000)["risk_distribution"]["HIGH"] == 1
+    pm.close()
+
+
+def test_migrate_is_idempotent(tmp_path):
+    path = str(tmp_path / "patient_data.db")
+    make_legacy_db(path)
+    conn = sqlite3.connect(path)
+
+    assert migrate(conn) == (0, SCHEMA_VERSION)
+    assert migrate(conn) == (SCHEMA_VERSION, SCHEMA_VERSION)
+
+
+def test_new_messages_get_epoch_and_queries_use_indexes(tmp_path):
+    pm = PatientManager(db_path=str(tmp_path / "patient_data.db"))
+    pm.register_patient("P001", "Alice")
+    pm.insert_chat_message("P001", "q", "a", "LOW", "r")
+
+    conn = sqlite3.connect(pm.db_path)
+    assert conn.execute("SELECT ts FROM chat_history").fetchone()[0] > 1_700_000_000
+    plan = " ".join(str(row) for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM chat_history WHERE patient_id = ? ORDER BY ts DESC, id DESC LIMIT 10",
+        ("P001",)
+    ))
+    assert "idx_chat_history_patient_ts" in plan
+    pm.close()
+
+
+def bucket_rows(conn, patient_id):
+    return conn.execute(
+        "SELECT risk_level, SUM(count) FROM risk_daily_counts WHERE patient_id = ? GROUP BY risk_level",
+        (patient_id,)
+    ).fetchall()
+
+
+def test_risk_buckets_are_backfilled_and_follow_writes(tmp_path):
+    path = str(tmp_path / "patient_data.db")
+    make_legacy_db(path)
+    pm = PatientManager(db_path=path)
+    conn = sqlite3.connect(path)
+    assert sorted(bucket_rows(conn, "P001")) == [("HIGH", 1), ("LOW", 1)]
+
+    message_id = pm.insert_chat_message("P001", "q", "a", "PENDING", "r")
+    pm.update_chat_risk(message_id, "MEDIUM", "deferred result")
+    assert sorted(bucket_rows(conn, "P001")) == [("HIGH", 1), ("LOW", 1), ("MEDIUM", 1)]
+
+    pm.clear_patient_history("P001")
+    assert bucket_rows(conn, "P001") == []
+    pm.close()
+
+
+def test_windowed_summary_matches_raw_history(tmp_path):
+    import time
+
+    pm = PatientManager(db_path=str(tmp_path / "patient_data.db"))
+    pm.register_patient("P001", "Alice")
+    conn = sqlite3.connect(pm.db_path)
+    now = int(time.time())
+    levels = ["LOW", "MEDIUM", "HIGH", "CRITICAL"]
+    for hours_ago in range(0, 24 * 100, 7):
+        conn.execute(
+            "INSERT INTO chat_history (patient_id, question, answer, risk_level, ts) VALUES ('P001', 'q', 'a', ?, ?)",
+            (levels[hours_ago % 4], now - hours_ago * 3600)
+        )
+    conn.commit()
+
+    for days in (7, 30, 90):
+        expected = dict(conn.execute(
+            "SELECT risk_level, COUNT(*) FROM chat_history WHERE patient_id = 'P001' AND ts > ? GROUP BY risk_level",
+            (now - days * 86400,)
+        ).fetchall())
+        distribution = pm.get_patient_risk_summary("P001", days=days)["risk_distribution"]
+        assert {k: v for k, v in distribution.items() if v} == expected
+    pm.close()
+
+
+def test_legacy_source_documents_are_compacted(tmp_path):
+    import json
+
+    path = str(tmp_path / "patient_data.db")
+    make_legacy_db(path)
+    conn = sqlite3.connect(path)
+    shared = ["Stroke warning signs include facial droop.", "Call emergency services."]
+    conn.execute("UPDATE chat_history SET source_documents = ? WHERE question = 'q0'", (json.dumps(shared),))
+    conn.execute("UPDATE chat_history SET source_documents = ? WHERE question = 'q1'",
+                 (json.dumps([shared[1], "Blood pressure above 180/120 is a crisis."]),))
+    conn.commit()
+    conn.close()
+
+    pm = PatientManager(db_path=path)
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM chat_history WHERE source_documents IS NOT NULL").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM source_chunks").fetchone()[0] == 3
+    history = pm.get_patient_history("P001")
+    assert history[0]["source_documents"] == shared
+    assert history[1]["source_documents"] == [shared[1], "Blood pressure above 180/120 is a crisis."]
+    pm.close()
+
+
+def test_source_chunks_are_shared_and_pruned(tmp_path):
+    pm = PatientManager(db_path=str(tmp_path / "patient_data.db"))
+    pm.register_patient("P001", "Alice")
+    pm.register_patient("P002", "Bob")
+    docs = ["chunk a", "chunk b"]
+    pm.insert_chat_messages([
+        {"patient_id": "P001", "question": "q1", "answer": "a", "risk_level": "LOW",
+         "risk_reason": "r", "source_documents": docs},
+        {"patient_id": "P001", "question": "q2", "answer": "a", "risk_level": "LOW",
+         "risk_reason": "r", "source_documents": docs[::-1]},
+    ])
+    pm.insert_chat_message("P002", "q3", "a", "LOW", "r", ["chunk b", "chunk c"])
+
+    conn = sqlite3.connect(pm.db_path)
+    assert conn.execute("SELECT COUNT(*) FROM source_chunks").fetchone()[0] == 3
+    assert [h["source_documents"] for h in pm.get_patient_history("P001")] == [docs, docs[::-1]]
+
+    pm.clear_patient_history("P001")
+    assert [row[0] for row in conn.execute("SELECT content FROM source_chunks ORDER BY content")] == \
+        ["chunk b", "chunk c"]
+    assert pm.get_patient_history("P002")[0]["source_documents"] == ["chunk b", "chunk c"]
+    pm.close()
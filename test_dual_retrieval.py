@@ -0,0 +1,83 @@
+"""
+Dual Retrieval Tests
+Verifies the query is embedded once and hits are merged by score with quotas
+"""
+
+from types import SimpleNamespace
+
+from dual_retrieval import SOURCE_PATIENT, SOURCE_SHARED, dual_retrieve, merge_by_score
+
+
+class CountingEmbedding:
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [0.0, 1.0]
+
+
+class FakeStore:
+    def __init__(self, hits):
+        self.hits = hits
+        self.vectors = []
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4):
+        self.vectors.append(embedding)
+        return [(SimpleNamespace(page_content=text, metadata={"id": text}), score)
+                for text, score in self.hits[:k]]
+
+
+def test_query_is_embedded_once_for_both_stores():
+    embedding = CountingEmbedding()
+    shared = FakeStore([("book-a", 0.4), ("book-b", 0.9)])
+    patient = FakeStore([("report-a", 0.2)])
+
+    hits = dual_retrieve("headache", embedding, {SOURCE_SHARED: shared, SOURCE_PATIENT: patient})
+
+    assert embedding.calls == 1
+    assert shared.vectors == patient.vectors == [[0.0, 1.0]]
+    assert [h["content"] for h in hits] == ["report-a", "book-a", "book-b"]
+    assert [h["source"] for h in hits] == [SOURCE_PATIENT, SOURCE_SHARED, SOURCE_SHARED]
+    assert [h["rank"] for h in hits] == [0, 1, 2]
+    assert hits[0]["metadata"] == {"id": "report-a"}
+
+
+def test_quotas_limit_each_source():
+    results = {
+        SOURCE_SHARED: [{"content": f"s{i}", "score": 0.1 * i} for i in range(5)],
+        SOURCE_PATIENT: [{"content": f"p{i}", "score": 1.0 + i} for i in range(5)],
+    }
+    merged = merge_by_score(results, {SOURCE_SHARED: 2, SOURCE_PATIENT: 1})
+
+    assert [h["content"] for h in merged] == ["s0", "s1", "p0"]
+
+
+def test_missing_store_is_skipped_without_embedding():
+    embedding = CountingEmbedding()
+
+    assert dual_retrieve("q", embedding, {SOURCE_SHARED: None, SOURCE_PATIENT: None}) == []
+    assert embedding.calls == 0
+
+    patient = FakeStore([("report", 0.5)])
+    hits = dual_retrieve("q", embedding, {SOURCE_SHARED: None, SOURCE_PATIENT: patient})
+    assert [h["source"] for h in hits] == [SOURCE_PATIENT]
+
+
+def test_precomputed_source_is_not_searched():
+    embedding = CountingEmbedding()
+    shared = FakeStore([("book-live", 0.1)])
+    patient = FakeStore([("report", 0.5)])
+    cached = [{"content": "book-cached", "score": 0.3, "source": SOURCE_SHARED, "metadata": {}}]
+
+    hits = dual_retrieve("q", embedding, {SOURCE_SHARED: shared, SOURCE_PATIENT: patient},
+                         precomputed={SOURCE_SHARED: cached})
+
+    assert shared.vectors == []
+    assert [h["content"] for h in hits] == ["book-cached", "report"]
+
+    # Nothing left to search: no query embedding at all
+    embedding.calls = 0
+    hits = dual_retrieve("q", embedding, {SOURCE_PATIENT: None}, precomputed={SOURCE_SHARED: cached})
+    assert embedding.calls == 0
+    assert [h["content"] for h in hits] == ["book-cached"]
@@ -0,0 +1,85 @@
+"""
+Query Embedding Cache Tests
+Verifies repeated queries skip the model and the cache stays bounded
+"""
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from embedding_cache import CachedEmbeddings, QueryEmbeddingCache, normalize_query
+
+
+class CountingModel:
+    def __init__(self):
+        self.queries = []
+        self.model_name = "fake-model"
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(text)), 1.0]
+
+    def embed_documents(self, texts):
+        return [[float(len(t)), 0.0] for t in texts]
+
+
+def test_repeated_query_skips_model():
+    model = CountingModel()
+    model.model_name = "sentence-transformers/all-MiniLM-L6-v2"
+    embeddings = CachedEmbeddings(model, QueryEmbeddingCache(max_size=8))
+
+    first = embeddings.embed_query("neurological symptoms monitoring")
+    second = embeddings.embed_query("  Neurological   symptoms monitoring ")
+
+    assert first == second
+    assert model.queries == ["neurological symptoms monitoring"]
+    stats = embeddings.cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_model_embeds_the_text_as_written():
+    model = CountingModel()
+    uncased = CachedEmbeddings(model, uncased=True)
+    uncased.embed_query("  Blood Pressure ")
+    assert model.queries == ["  Blood Pressure "]
+
+    # Not known to be uncased: case and spacing give separate entries
+    cased = CachedEmbeddings(model)
+    assert not cased.uncased
+    cased.embed_query("Blood Pressure")
+    cased.embed_query("blood pressure")
+    cased.embed_query("Blood Pressure")
+    assert model.queries[1:] == ["Blood Pressure", "blood pressure"]
+
+
+def test_cached_vector_cannot_be_mutated_by_caller():
+    embeddings = CachedEmbeddings(CountingModel())
+    vector = embeddings.embed_query("headache")
+    vector[0] = -1.0
+
+    assert embeddings.embed_query("headache")[0] != -1.0
+
+
+def test_lru_evicts_least_recently_used():
+    model = CountingModel()
+    embeddings = CachedEmbeddings(model, QueryEmbeddingCache(max_size=2))
+    embeddings.embed_query("a")
+    embeddings.embed_query("b")
+    embeddings.embed_query("a")  # "b" is now least recently used
+    embeddings.embed_query("c")
+    embeddings.embed_query("a")
+
+    assert model.queries == ["a", "b", "c"]
+    assert embeddings.cache.get_stats()["evictions"] == 1
+
+
+def test_documents_and_attributes_pass_through():
+    model = CountingModel()
+    embeddings = CachedEmbeddings(model)
+
+    assert embeddings.embed_documents(["ab"]) == [[2.0, 0.0]]
+    assert embeddings.model_name == "fake-model"
+    assert normalize_query("  Tired\tand DIZZY ") == "tired and dizzy"
+    assert normalize_query("  Tired\tand DIZZY ", uncased=False) == "  Tired\tand DIZZY "
@@ -0,0 +1,77 @@
+"""
+Embedding Registry Tests
+Verifies the embedding model is loaded once and shared across threads
+"""
+
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("langchain_huggingface")
+
+import embedding_registry
+from embedding_registry import EmbeddingRegistry
+
+
+class FakeEmbeddings:
+    """Stand-in for HuggingFaceEmbeddings that counts constructions"""
+    instances = 0
+
+    def __init__(self, model_name, model_kwargs):
+        time.sleep(0.05)  # widen the race window
+        FakeEmbeddings.instances += 1
+        self.model_name = model_name
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    FakeEmbeddings.instances = 0
+    monkeypatch.setattr(embedding_registry, "HuggingFaceEmbeddings", FakeEmbeddings)
+    return EmbeddingRegistry()
+
+
+def test_model_loaded_once_across_threads(registry):
+    """Concurrent callers must all receive the same instance"""
+    results = []
+
+    def worker():
+        results.append(registry.get())
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert FakeEmbeddings.instances == 1
+    assert all(r is results[0] for r in results)
+
+
+def test_stats_report_load_time_and_requests(registry):
+    registry.get()
+    registry.get()
+
+    stats = registry.get_stats()
+    assert stats["loaded_models"] == 1
+    model_stats = stats["models"][0]
+    assert model_stats["model_name"] == embedding_registry.DEFAULT_EMBEDDING_MODEL
+    assert model_stats["load_seconds"] > 0
+    assert model_stats["requests"] == 2
+    assert "rss_delta_bytes" in model_stats
+
+
+def test_concurrent_requests_are_all_counted(registry):
+    registry.get()
+
+    def worker():
+        for _ in range(500):
+            registry.get()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert registry.get_stats()["models"][0]["requests"] == 1 + 8 * 500
@@ -0,0 +1,207 @@
+"""
+Dispatch Layer Tests
+Verifies chats and health checks keep flowing while a large ingest occupies the cpu
+executor, and that a cancelled request keeps its lock until its worker finishes
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from executors import BoundedExecutor, ExecutorBusy, LockedSteps
+
+
+def slow_pdf_ingest(done: threading.Event):
+    """Stand-in for extracting and embedding a large PDF"""
+    time.sleep(1.0)
+    done.set()
+    return "ingested"
+
+
+def chat_turn(i: int):
+    """Stand-in for a chat: sqlite lookup + LLM round-trip"""
+    time.sleep(0.02)
+    return f"answer {i}"
+
+
+def test_chats_flow_while_large_pdf_is_ingested():
+    cpu = BoundedExecutor("cpu-test", max_workers=1, max_queue=4)
+    io = BoundedExecutor("io-test", max_workers=8, max_queue=64)
+    ingest_done = threading.Event()
+
+    async def heartbeat(stop: asyncio.Event, gaps: list):
+        last = time.perf_counter()
+        while not stop.is_set():
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    async def scenario():
+        stop, gaps = asyncio.Event(), []
+        ticker = asyncio.create_task(heartbeat(stop, gaps))
+        ingest = asyncio.create_task(cpu.run(slow_pdf_ingest, ingest_done))
+        await asyncio.sleep(0.05)  # ingest is now running
+
+        answers = await asyncio.gather(*[io.run(chat_turn, i) for i in range(40)])
+        chats_finished_during_ingest = not ingest_done.is_set()
+
+        assert await ingest == "ingested"
+        stop.set()
+        await ticker
+        return answers, chats_finished_during_ingest, max(gaps)
+
+    try:
+        answers, during_ingest, max_gap = asyncio.run(scenario())
+    finally:
+        cpu.shutdown()
+        io.shutdown()
+
+    assert answers == [f"answer {i}" for i in range(40)]
+    assert during_ingest
+    assert max_gap < 0.2  # event loop never blocked by the ingest
+
+
+def test_stats_report_queue_depth_and_wait():
+    executor = BoundedExecutor("stats-test", max_workers=1, max_queue=4)
+    gate = threading.Event()
+    try:
+        first = executor.submit(gate.wait)
+        queued = [executor.submit(time.sleep, 0) for _ in range(2)]
+        time.sleep(0.05)
+
+        stats = executor.get_stats()
+        assert stats["running"] == 1
+        assert stats["queue_depth"] == 2
+
+        gate.set()
+        for future in [first] + queued:
+            future.result()
+
+        stats = executor.get_stats()
+        assert stats["queue_depth"] == 0
+        assert stats["completed"] == 3
+        assert stats["max_queue_depth"] >= 2
+        assert stats["max_wait_seconds"] >= 0.05
+    finally:
+        gate.set()
+        executor.shutdown()
+
+
+def test_full_queue_is_rejected():
+    executor = BoundedExecutor("busy-test", max_workers=1, max_queue=1)
+    gate = threading.Event()
+    try:
+        executor.submit(gate.wait)
+        executor.submit(gate.wait)
+        with pytest.raises(ExecutorBusy):
+            executor.submit(gate.wait)
+        assert executor.get_stats()["rejected"] == 1
+    finally:
+        gate.set()
+        executor.shutdown()
+
+
+def test_failures_are_counted_and_propagated():
+    executor = BoundedExecutor("fail-test", max_workers=1, max_queue=1)
+
+    def boom():
+        raise ValueError("bad pdf")
+
+    try:
+        with pytest.raises(ValueError):
+            asyncio.run(executor.run(boom))
+        assert executor.get_stats()["failed"] == 1
+    finally:
+        executor.shutdown()
+
+
+def test_cancelled_request_keeps_lock_until_its_worker_finishes():
+    executor = BoundedExecutor("locked-test", max_workers=2, max_queue=4)
+    lock = threading.Lock()
+    started = threading.Event()
+    finished = []
+
+    def finalize_turn(name, seconds):
+        started.set()
+        time.sleep(seconds)
+        finished.append(name)
+
+    async def chat_turn_steps(name, seconds):
+        steps = LockedSteps(lock, poll_seconds=0.005)
+        await steps.acquire()
+        try:
+            await steps.run(executor, finalize_turn, name, seconds)
+        finally:
+            steps.release()
+
+    async def main():
+        first = asyncio.ensure_future(chat_turn_steps("first", 0.2))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        first.cancel()  # client disconnected while the worker is finalizing
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert lock.locked()
+        await chat_turn_steps("second", 0)
+
+    try:
+        asyncio.run(main())
+        assert finished == ["first", "second"]
+        assert not lock.locked()
+    finally:
+        executor.shutdown()
+
+
+def test_health_responds_while_real_ingest_saturates_cpu_pool(tmp_path):
+    """A real ingest (split + embed + index) on the cpu pool must not stall the event loop"""
+    fastapi = pytest.importorskip("fastapi")
+    httpx = pytest.importorskip("httpx")
+    pytest.importorskip("langchain_text_splitters")
+    from ingest_pipeline import IngestPipeline
+    from test_ingest_pipeline import Processor, report_lines
+
+    report = tmp_path / "report.txt"
+    report.write_text("\n".join(report_lines(20000)), encoding="utf-8")
+    pipeline = IngestPipeline(Processor())
+    cpu = BoundedExecutor("cpu-health", max_workers=1, max_queue=2)
+
+    app = fastapi.FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.post("/ingest/{n}")
+    async def ingest(n: int):
+        stats = await cpu.run(pipeline.run, "P001", str(report), str(tmp_path / f"store{n}"))
+        return {"chunks": stats["chunks_count"]}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            ingests = [asyncio.create_task(client.post(f"/ingest/{n}")) for n in range(3)]
+            await asyncio.sleep(0.05)  # pool is now saturated (1 running, 2 queued)
+            assert cpu.get_stats()["running"] == 1
+
+            latencies = []
+            for _ in range(20):
+                began = time.perf_counter()
+                response = await client.get("/health")
+                latencies.append(time.perf_counter() - began)
+                assert response.json() == {"status": "healthy"}
+                await asyncio.sleep(0.01)
+            still_ingesting = not all(task.done() for task in ingests)
+
+            responses = await asyncio.gather(*ingests)
+            return latencies, still_ingesting, responses
+
+    try:
+        latencies, still_ingesting, responses = asyncio.run(scenario())
+    finally:
+        cpu.shutdown()
+
+    assert all(r.status_code == 200 and r.json()["chunks"] > 0 for r in responses)
+    assert still_ingesting
+    assert max(latencies) < 0.25, latencies
@@ -0,0 +1,252 @@
+"""
+Ingestion Job Queue Tests
+Verifies background processing, progress/ETA, retries, restart recovery and
+job leases across processes
+"""
+
+import threading
+import time
+
+from ingest_jobs import (
+    STATUS_COMPLETE, STATUS_FAILED, STATUS_RUNNING,
+    IngestJobError, IngestJobQueue,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def wait_for(queue, job_id, statuses=(STATUS_COMPLETE, STATUS_FAILED), timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {queue.get(job_id)['status']}")
+
+
+def test_job_reports_progress_and_completes(tmp_path):
+    clock = FakeClock()
+    queue = IngestJobQueue(str(tmp_path / "jobs.db"), workers=1, clock=clock)
+    halfway = threading.Event()
+    resume = threading.Event()
+
+    def handler(job, progress):
+        progress(stage="indexing", pages_total=10)
+        clock.now += 20
+        progress(pages_done=4, chunks_done=32)
+        halfway.set()
+        resume.wait(5)
+        return {"chunks_count": 64, "file": job["payload"]["file_path"]}
+
+    queue.register("report", handler)
+    queue.start()
+    try:
+        job_id = queue.submit("report", "P001", {"file_path": "uploads/a.pdf"})
+        assert halfway.wait(5)
+
+        job = queue.get(job_id)
+        assert job["status"] == STATUS_RUNNING and job["stage"] == "indexing"
+        assert (job["pages_done"], job["pages_total"], job["chunks_done"]) == (4, 10, 32)
+        assert job["progress"] == 0.4
+        assert job["eta_seconds"] == 30.0  # 20s for 4 pages, 6 to go
+        assert [j["job_id"] for j in queue.active_jobs("P001")] == [job_id]
+
+        resume.set()
+        job = wait_for(queue, job_id)
+        assert job["status"] == STATUS_COMPLETE and job["stage"] == "committed"
+        assert job["result"] == {"chunks_count": 64, "file": "uploads/a.pdf"}
+        assert job["progress"] == 1.0 and job["attempts"] == 1
+        assert queue.active_jobs("P001") == []
+        assert queue.get_stats()["jobs"][STATUS_COMPLETE] == 1
+    finally:
+        resume.set()
+        queue.close()
+
+
+def test_permanent_errors_fail_and_transient_errors_retry(tmp_path):
+    queue = IngestJobQueue(str(tmp_path / "jobs.db"), workers=1, max_attempts=3)
+    calls = {"bad": 0, "flaky": 0}
+
+    def bad(job, progress):
+        calls["bad"] += 1
+        raise IngestJobError("No content extracted from files")
+
+    def flaky(job, progress):
+        calls["flaky"] += 1
+        if calls["flaky"] < 3:
+            raise RuntimeError("embedding service unavailable")
+        return {"ok": True}
+
+    queue.register("bad", bad)
+    queue.register("flaky", flaky)
+    queue.start()
+    try:
+        bad_id = queue.submit("bad", "P001", {})
+        flaky_id = queue.submit("flaky", "P001", {})
+
+        job = wait_for(queue, bad_id)
+        assert job["status"] == STATUS_FAILED
+        assert job["error"] == "No content extracted from files"
+        assert calls["bad"] == 1
+
+        job = wait_for(queue, flaky_id)
+        assert job["status"] == STATUS_COMPLETE and job["attempts"] == 3
+        assert job["error"] is None
+
+        stats = queue.get_stats()
+        assert stats["retried"] == 2 and stats["failed"] == 1 and stats["completed"] == 1
+        assert queue.get("missing") is None
+    finally:
+        queue.close()
+
+
+def test_interrupted_jobs_are_retried_on_restart(tmp_path):
+    clock = FakeClock()
+    path = str(tmp_path / "jobs.db")
+    crashed = IngestJobQueue(path, max_attempts=2, clock=clock)
+    retry_id = crashed.submit("report", "P001", {"file_path": "a.pdf"})
+    exhausted_id = crashed.submit("report", "P001", {"file_path": "b.pdf"})
+    # Simulate a process that died mid-job: claimed, never finished
+    assert crashed._claim()["job_id"] == retry_id
+    crashed._claim()
+    with crashed._pool.transaction() as conn:
+        conn.execute("UPDATE ingest_jobs SET attempts = 2 WHERE job_id = ?", (exhausted_id,))
+    crashed.close()
+
+    restarted = IngestJobQueue(path, workers=1, max_attempts=2, lease_seconds=60, clock=clock)
+    assert restarted.start() == 0  # leases still fresh: their owner may be alive
+    restarted.close()
+
+    clock.now += 61
+    restarted = IngestJobQueue(path, workers=1, max_attempts=2, lease_seconds=60, clock=clock)
+    seen = []
+    restarted.register("report", lambda job, progress: seen.append(job["payload"]["file_path"]) or {})
+    try:
+        assert restarted.start() == 1
+        job = wait_for(restarted, retry_id)
+        assert job["status"] == STATUS_COMPLETE and job["attempts"] == 2
+        assert seen == ["a.pdf"]
+
+        job = restarted.get(exhausted_id)
+        assert job["status"] == STATUS_FAILED and "Interrupted" in job["error"]
+        assert restarted.get_stats()["recovered"] == 1
+    finally:
+        restarted.close()
+
+
+def test_finished_hook_runs_only_once_a_job_is_terminal(tmp_path):
+    clock = FakeClock()
+    path = str(tmp_path / "jobs.db")
+    crashed = IngestJobQueue(path, max_attempts=2, clock=clock)
+    exhausted_id = crashed.submit("report", "P001", {"file_path": "c.pdf"})
+    crashed._claim()
+    with crashed._pool.transaction() as conn:
+        conn.execute("UPDATE ingest_jobs SET attempts = 2 WHERE job_id = ?", (exhausted_id,))
+    crashed.close()
+
+    clock.now += 61
+    queue = IngestJobQueue(path, workers=1, max_attempts=2, lease_seconds=60, clock=clock)
+    finished = []
+    calls = {"flaky": 0}
+
+    def flaky(job, progress):
+        calls["flaky"] += 1
+        if calls["flaky"] == 1:
+            assert finished == [exhausted_id]  # retry still needs the upload
+            raise RuntimeError("embedding service unavailable")
+        return {}
+
+    def bad(job, progress):
+        raise IngestJobError("Unsupported file type")
+
+    queue.register("report", flaky, on_finished=lambda job: finished.append(job["job_id"]))
+    queue.register("bad", bad, on_finished=lambda job: finished.append(job["job_id"]))
+    queue.register("plain", lambda job, progress: {})
+    queue.start()
+    try:
+        assert finished == [exhausted_id]
+        flaky_id = queue.submit("report", "P001", {"file_path": "a.pdf"})
+        job = wait_for(queue, flaky_id)
+        assert job["status"] == STATUS_COMPLETE and job["attempts"] == 2
+
+        bad_id = queue.submit("bad", "P001", {})
+        assert wait_for(queue, bad_id)["status"] == STATUS_FAILED
+        plain_id = queue.submit("plain", "P001", {})
+        assert wait_for(queue, plain_id)["status"] == STATUS_COMPLETE
+        deadline = time.monotonic() + 5
+        while len(finished) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert finished == [exhausted_id, flaky_id, bad_id]
+    finally:
+        queue.close()
+
+
+def test_second_process_only_takes_over_expired_leases(tmp_path):
+    clock = FakeClock()
+    path = str(tmp_path / "jobs.db")
+    first = IngestJobQueue(path, workers=1, lease_seconds=60, clock=clock)
+    started = threading.Event()
+    resume = threading.Event()
+    runs = []
+
+    def slow(job, progress):
+        runs.append(job["attempts"])
+        started.set()
+        resume.wait(5)
+        return {"attempt": job["attempts"]}
+
+    first.register("report", slow)
+    first.start()
+    second = IngestJobQueue(path, workers=1, lease_seconds=60, clock=clock)
+    second.register("report", lambda job, progress: {"attempt": job["attempts"]})
+    try:
+        job_id = first.submit("report", "P001", {})
+        assert started.wait(5)
+        clock.now += 30
+        assert second.start() == 0
+        assert second.get(job_id)["owner"] == first.owner
+
+        # The first process stops renewing (e.g. it hung); the lease runs out
+        clock.now += 61
+        assert second._requeue_abandoned() == 1
+        job = wait_for(second, job_id)
+        assert job["status"] == STATUS_COMPLETE and job["result"] == {"attempt": 2}
+
+        # The first worker's late result does not overwrite the new owner's
+        resume.set()
+        first.close()  # joins the worker once it has tried to record its result
+        assert second.get(job_id)["result"] == {"attempt": 2}
+        assert first._stats["completed"] == 0 and runs == [1]
+    finally:
+        resume.set()
+        first.close()
+        second.close()
+
+
+def test_old_finished_jobs_are_purged_on_start(tmp_path):
+    clock = FakeClock()
+    path = str(tmp_path / "jobs.db")
+    queue = IngestJobQueue(path, workers=1, retention_seconds=60, clock=clock)
+    queue.register("report", lambda job, progress: {})
+    queue.start()
+    job_id = queue.submit("report", "P001", {})
+    wait_for(queue, job_id)
+    queue.close()
+
+    clock.now += 120
+    restarted = IngestJobQueue(path, workers=1, retention_seconds=60, clock=clock)
+    restarted.register("report", lambda job, progress: {})
+    restarted.start()
+    try:
+        assert restarted.get(job_id) is None
+        fresh_id = restarted.submit("report", "P001", {})
+        assert wait_for(restarted, fresh_id)["status"] == STATUS_COMPLETE
+    finally:
+        restarted.close()
@@ -0,0 +1,182 @@
+"""
+Ingest Pipeline Tests
+Verifies streamed chunking, batched appends, a single commit and failure rollback
+"""
+
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("langchain_text_splitters")
+pytest.importorskip("pypdf")
+
+from langchain_text_splitters import CharacterTextSplitter, RecursiveCharacterTextSplitter
+
+from ingest_pipeline import IngestPipeline
+from mmap_vector_store import MmapVectorStore, StoreAppender, committed_tag, is_mmap_store
+from test_mmap_vector_store import FakeEmbeddings
+from test_pdf_extract import make_pdf
+
+
+class Processor:
+    """The parts of ReportProcessor the pipeline uses"""
+
+    def __init__(self, embeddings=None):
+        self.embeddings = embeddings or FakeEmbeddings()
+        self.splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50, separator="\n")
+
+    def clean_text(self, text):
+        return "\n".join(line.strip() for line in text.split("\n") if line.strip())
+
+    def extract_text_from_plain_text(self, file_path):
+        with open(file_path, encoding="utf-8") as f:
+            return f.read()
+
+
+class FailingEmbeddings(FakeEmbeddings):
+    def __init__(self, fail_after):
+        self.calls = 0
+        self.fail_after = fail_after
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.calls > self.fail_after:
+            raise RuntimeError("embedding model crashed")
+        return super().embed_documents(texts)
+
+
+def report_lines(n):
+    return [f"Line {i}: systolic pressure {120 + i % 40} mmHg, pulse {60 + i % 30} bpm, stable."
+            for i in range(n)]
+
+
+def test_text_report_is_chunked_embedded_and_committed(tmp_path):
+    path = tmp_path / "report.txt"
+    path.write_text("\n".join(report_lines(400)), encoding="utf-8")
+    store_path = str(tmp_path / "patient_P001")
+    progress = []
+
+    pipeline = IngestPipeline(Processor(), embed_batch_size=8, queue_size=2)
+    stats = pipeline.run("P001", str(path), store_path, {"source_file": "report.txt"},
+                         on_progress=progress.append)
+
+    store = MmapVectorStore(store_path, FakeEmbeddings())
+    assert store.count == stats["chunks_count"] > 8
+    assert progress[-1]["chunks_indexed"] == stats["chunks_count"]
+    assert progress[-1]["pages_total"] == 1
+    assert [p["chunks_indexed"] for p in progress] == sorted(p["chunks_indexed"] for p in progress)
+    assert store.get_metadata(0)["source_file"] == "report.txt"
+    assert store.get_metadata(store.count - 1)["chunk_index"] == store.count - 1
+    assert set(stats["stages"]) == {"extract", "split", "embed", "index"}
+    assert stats["stages"]["embed"]["items"] == stats["chunks_count"]
+    assert max(stats["peak_queue_depth"].values()) <= 2
+
+    # Every line is indexed, in order
+    indexed = "\n".join(store.get_text(row) for row in range(store.count))
+    positions = [indexed.find(line) for line in report_lines(400)]
+    assert -1 not in positions and positions == sorted(positions)
+
+
+def test_pdf_pages_stream_into_existing_store(tmp_path):
+    store_path = str(tmp_path / "patient_P001")
+    first = tmp_path / "first.txt"
+    first.write_text("\n".join(report_lines(30)), encoding="utf-8")
+    pipeline = IngestPipeline(Processor(), embed_batch_size=4)
+    before = pipeline.run("P001", str(first), store_path)["chunks_count"]
+
+    pdf = make_pdf(tmp_path / "report.pdf", [f"Page {i} " + "hemoglobin 13.5 g/dL " * 12 for i in range(12)])
+    stats = pipeline.run("P001", pdf, store_path)
+
+    store = MmapVectorStore(store_path, FakeEmbeddings())
+    assert stats["pages"] == 12
+    assert store.count == before + stats["chunks_count"]
+    assert "Page 11" in store.get_text(store.count - 1)
+
+
+def test_several_files_share_one_commit_and_custom_splitter(tmp_path):
+    store_path = str(tmp_path / "patient_P001")
+    notes = tmp_path / "notes.txt"
+    notes.write_text("\n".join(report_lines(40)), encoding="utf-8")
+    pdf = make_pdf(tmp_path / "labs.pdf", [f"Page {i} " + "hemoglobin 13.5 g/dL " * 12 for i in range(3)])
+    splitter = RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=0)
+
+    pipeline = IngestPipeline(Processor(), embed_batch_size=4, splitter=splitter)
+    stats = pipeline.run_many("P001", [(str(notes), {"source_file": "notes.txt"}),
+                                       (pdf, {"source_file": "labs.pdf"})], store_path)
+
+    store = MmapVectorStore(store_path, FakeEmbeddings())
+    assert stats["files"] == 2 and stats["pages"] == 4
+    assert store.count == stats["chunks_count"]
+    sources = [store.get_metadata(row)["source_file"] for row in range(store.count)]
+    first_pdf = sources.index("labs.pdf")
+    assert set(sources[:first_pdf]) == {"notes.txt"} and set(sources[first_pdf:]) == {"labs.pdf"}
+    assert store.get_metadata(first_pdf)["chunk_index"] == 0
+    assert "Page 0" in store.get_text(first_pdf) and "Line" not in store.get_text(first_pdf)
+    assert max(len(store.get_text(row)) for row in range(store.count)) <= 200
+
+
+def test_commit_tag_is_recorded_with_the_commit(tmp_path):
+    path = tmp_path / "report.txt"
+    path.write_text("\n".join(report_lines(60)), encoding="utf-8")
+    store_path = str(tmp_path / "patient_P001")
+    pipeline = IngestPipeline(Processor())
+
+    assert committed_tag(store_path, "job-1") is None
+    first = pipeline.run("P001", str(path), store_path, commit_tag="job-1")
+    second = pipeline.run("P001", str(path), store_path, commit_tag="job-2")
+    pipeline.run("P001", str(path), store_path)
+
+    assert committed_tag(store_path, "job-1") == {"tag": "job-1", "rows": first["chunks_count"],
+                                                  "count": first["chunks_count"]}
+    assert committed_tag(store_path, "job-2")["rows"] == second["chunks_count"]
+    assert committed_tag(store_path, "job-3") is None
+
+    with pytest.raises(RuntimeError):
+        IngestPipeline(Processor(FailingEmbeddings(fail_after=0))).run(
+            "P001", str(path), store_path, commit_tag="job-3")
+    assert committed_tag(store_path, "job-3") is None
+
+
+def test_failed_upload_leaves_store_untouched(tmp_path):
+    path = tmp_path / "report.txt"
+    path.write_text("\n".join(report_lines(200)), encoding="utf-8")
+    new_store = str(tmp_path / "patient_new")
+
+    with pytest.raises(RuntimeError, match="embedding model crashed"):
+        IngestPipeline(Processor(FailingEmbeddings(fail_after=2)), embed_batch_size=4).run(
+            "P001", str(path), new_store)
+    assert not os.path.exists(new_store)
+
+    existing = str(tmp_path / "patient_P001")
+    count = IngestPipeline(Processor()).run("P001", str(path), existing)["chunks_count"]
+    with pytest.raises(RuntimeError):
+        IngestPipeline(Processor(FailingEmbeddings(fail_after=2)), embed_batch_size=4).run(
+            "P001", str(path), existing)
+    assert MmapVectorStore(existing, FakeEmbeddings()).count == count
+
+
+def test_short_and_unsupported_files_are_rejected(tmp_path):
+    short = tmp_path / "short.txt"
+    short.write_text("ok", encoding="utf-8")
+    with pytest.raises(ValueError, match="too short"):
+        IngestPipeline(Processor()).run("P001", str(short), str(tmp_path / "store"))
+
+    other = tmp_path / "report.docx"
+    other.write_bytes(b"x")
+    with pytest.raises(ValueError, match="Unsupported"):
+        IngestPipeline(Processor()).run("P001", str(other), str(tmp_path / "store"))
+    assert not os.path.exists(tmp_path / "store")
+
+
+def test_appender_rows_are_invisible_until_commit(tmp_path):
+    embeddings = FakeEmbeddings()
+    path = str(tmp_path / "store")
+    MmapVectorStore.create(path, embeddings, embeddings.embed_documents(["a", "b"]), ["a", "b"])
+
+    appender = StoreAppender(path)
+    assert appender.append(embeddings.embed_documents(["c"]), ["c"]) == [2]
+    assert MmapVectorStore(path, embeddings).count == 2
+    appender.commit()
+    assert MmapVectorStore(path, embeddings).count == 3
+    assert is_mmap_store(path)
@@ -0,0 +1,81 @@
+"""
+LLM Response Cache Tests
+Verifies key normalization, TTL expiry and size-bounded eviction
+"""
+
+from llm_cache import LLMResponseCache, make_cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def response(text, tokens=10):
+    return {"choices": [{"message": {"content": text}}], "usage": {"total_tokens": tokens}}
+
+
+def test_key_normalizes_whitespace_but_not_params():
+    messages = [{"role": "user", "content": "Any  new\nsymptoms? "}]
+    same = [{"role": "user", "content": "Any new symptoms?"}]
+    params = {"temperature": 0.3, "response_format": {"type": "json_object"}}
+
+    assert make_cache_key("m", messages, params) == make_cache_key("m", same, dict(params))
+    assert make_cache_key("m", messages, params) != make_cache_key("m", messages, {"temperature": 0.7})
+    assert make_cache_key("m", messages, params) != make_cache_key("other", messages, params)
+
+
+def test_hit_miss_and_saved_tokens(tmp_path):
+    cache = LLMResponseCache(path=str(tmp_path / "cache.db"))
+    assert cache.get("k") is None
+
+    cache.put("k", response("LOW", tokens=42))
+    assert cache.get("k")["choices"][0]["message"]["content"] == "LOW"
+
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+    assert stats["saved_tokens"] == 42
+    assert stats["entries"] == 1
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    clock = FakeClock()
+    cache = LLMResponseCache(path=str(tmp_path / "cache.db"), ttl_seconds=60, clock=clock)
+    cache.put("old", response("a"))
+    clock.now += 30
+    cache.put("new", response("b"))
+
+    clock.now += 31
+    assert cache.get("old") is None
+    assert cache.get("new") is not None
+    assert cache.purge_expired() == 0
+    clock.now += 60
+    assert cache.purge_expired() == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    clock = FakeClock()
+    cache = LLMResponseCache(path=str(tmp_path / "cache.db"), max_entries=2, clock=clock)
+    cache.put("a", response("a"))
+    clock.now += 1
+    cache.put("b", response("b"))
+    clock.now += 1
+    cache.get("a")  # refresh a
+    clock.now += 1
+    cache.put("c", response("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    LLMResponseCache(path=path).put("k", response("kept"))
+    assert LLMResponseCache(path=path).get("k")["choices"][0]["message"]["content"] == "kept"
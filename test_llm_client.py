@@ -0,0 +1,271 @@
+"""
+LLM Client Tests
+Runs the shared client against a local stub chat-completions server
+"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from llm_cache import LLMResponseCache
+from llm_client import LLMClient, LLMError, message_content
+
+
+class StubState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.statuses = []      # queued status codes; 200 once empty
+        self.delay = 0.0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections = set()
+        self.payloads = []
+        self.tokens = ["Hello", ", ", "world"]
+        self.token_delay = 0.0
+        self.retry_after = None  # Retry-After header on error responses
+        self.raw_body = None     # replaces the JSON body of 200 responses
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            with state.lock:
+                state.requests += 1
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+                state.connections.add(self.client_address)
+                state.payloads.append(json.loads(body))
+                status = state.statuses.pop(0) if state.statuses else 200
+            time.sleep(state.delay)
+            with state.lock:
+                state.in_flight -= 1
+
+            if status == 200 and state.payloads[-1].get("stream"):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for token in state.tokens:
+                    chunk = {"choices": [{"index": 0, "delta": {"content": token}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(state.token_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+                return
+
+            if status == 200:
+                data = {"choices": [{"message": {"content": " stub answer "}}],
+                        "usage": {"total_tokens": 7}}
+            else:
+                data = {"error": {"message": f"status {status}"}}
+            raw = json.dumps(data).encode()
+            if status == 200 and state.raw_body is not None:
+                raw = state.raw_body
+            try:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                if status != 200 and state.retry_after:
+                    self.send_header("Retry-After", state.retry_after)
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client gave up (timeout test)
+
+    return Handler
+
+
+@pytest.fixture
+def stub():
+    state = StubState()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_client(stub, tmp_path):
+    clients = []
+
+    def _make(**kwargs):
+        kwargs.setdefault("backoff_base", 0.01)
+        kwargs.setdefault("response_cache", LLMResponseCache(path=str(tmp_path / "llm_cache.db")))
+        client = LLMClient(base_url=stub.base_url, api_key="test-key", **kwargs)
+        clients.append(client)
+        return client
+    yield _make
+    for client in clients:
+        client.close()
+
+
+def test_sync_call_reuses_connection(stub, make_client):
+    client = make_client()
+    for _ in range(3):
+        data = client.chat([{"role": "user", "content": "hi"}], max_tokens=5,
+                           response_format={"type": "json_object"})
+        assert message_content(data) == "stub answer"
+
+    assert stub.requests == 3
+    assert len(stub.connections) == 1
+    assert stub.payloads[0]["response_format"] == {"type": "json_object"}
+
+
+def test_cached_calls_skip_the_network(stub, make_client):
+    client = make_client()
+    messages = [{"role": "user", "content": "assess  this\n"}]
+
+    first = client.chat(messages, temperature=0.3, cache=True)
+    second = client.chat([{"role": "user", "content": "assess this"}], temperature=0.3, cache=True)
+    client.chat(messages, temperature=0.3)                 # not opted in
+    client.chat(messages, temperature=0.5, cache=True)     # different params
+
+    assert message_content(first) == message_content(second) == "stub answer"
+    assert stub.requests == 3
+    cache_stats = client.get_stats()["cache"]
+    assert cache_stats["hits"] == 1
+    assert cache_stats["saved_tokens"] == 7
+
+
+def test_retries_429_and_5xx_then_succeeds(stub, make_client):
+    stub.statuses = [429, 503]
+    client = make_client(max_retries=3)
+
+    data = client.chat([{"role": "user", "content": "hi"}])
+
+    assert message_content(data) == "stub answer"
+    stats = client.get_stats()
+    assert stats["attempts"] == 3
+    assert stats["retries"] == 2
+    assert stats["failures"] == 0
+
+
+def test_non_retryable_error_is_raised_immediately(stub, make_client):
+    stub.statuses = [400]
+    client = make_client(max_retries=3)
+
+    with pytest.raises(LLMError) as excinfo:
+        client.chat([{"role": "user", "content": "hi"}])
+    assert excinfo.value.status_code == 400
+    assert stub.requests == 1
+
+
+def test_retries_exhausted(stub, make_client):
+    stub.statuses = [500, 500]
+    client = make_client(max_retries=1)
+
+    with pytest.raises(LLMError) as excinfo:
+        client.chat([{"role": "user", "content": "hi"}])
+    assert excinfo.value.status_code == 500
+    assert client.get_stats()["failures"] == 1
+
+
+def test_concurrency_is_bounded_for_async_callers(stub, make_client):
+    stub.delay = 0.05
+    client = make_client(max_concurrency=2)
+
+    async def run():
+        return await asyncio.gather(*[
+            client.achat([{"role": "user", "content": str(i)}]) for i in range(6)
+        ])
+
+    results = asyncio.run(run())
+    assert len(results) == 6
+    assert stub.max_in_flight <= 2
+
+
+def test_backoff_does_not_hold_a_concurrency_slot(stub, make_client):
+    stub.statuses = [429]
+    stub.retry_after = "0.5"
+    client = make_client(max_concurrency=1, max_retries=1)
+
+    async def timed_call(delay):
+        await asyncio.sleep(delay)
+        start = time.perf_counter()
+        await client.achat([{"role": "user", "content": "hi"}])
+        return time.perf_counter() - start
+
+    async def run():
+        return await asyncio.gather(timed_call(0), timed_call(0.1))
+
+    retried, fresh = asyncio.run(run())
+    assert retried >= 0.5
+    assert fresh < 0.3  # ran while the first call was backing off
+    assert client.get_stats()["retries"] == 1
+
+
+def test_invalid_json_success_body_raises_llm_error(stub, make_client):
+    stub.raw_body = b"<html>gateway</html>"
+    client = make_client(max_retries=0)
+
+    with pytest.raises(LLMError) as excinfo:
+        client.chat([{"role": "user", "content": "hi"}])
+    assert excinfo.value.status_code == 200
+    assert client.get_stats()["failures"] == 1
+
+
+def test_per_call_timeout(stub, make_client):
+    stub.delay = 0.5
+    client = make_client(max_retries=0)
+
+    with pytest.raises(LLMError):
+        client.chat([{"role": "user", "content": "hi"}], timeout=0.1)
+
+
+def test_stream_relays_tokens_as_they_arrive(stub, make_client):
+    stub.token_delay = 0.2
+    client = make_client()
+
+    async def run():
+        start = time.perf_counter()
+        arrivals = []
+        async for delta in client.astream([{"role": "user", "content": "hi"}]):
+            arrivals.append((delta, time.perf_counter() - start))
+        return arrivals
+
+    arrivals = asyncio.run(run())
+    assert [delta for delta, _ in arrivals] == ["Hello", ", ", "world"]
+    # First token is delivered well before the completion finishes
+    assert arrivals[0][1] < 0.15
+    assert arrivals[-1][1] >= 0.35
+    assert stub.payloads[0]["stream"] is True
+
+
+def test_stream_retries_before_first_token(stub, make_client):
+    stub.statuses = [503]
+    client = make_client(max_retries=2)
+
+    async def run():
+        return [delta async for delta in client.astream([{"role": "user", "content": "hi"}])]
+
+    assert "".join(asyncio.run(run())) == "Hello, world"
+    assert client.get_stats()["retries"] == 1
+
+
+def test_stream_error_is_raised(stub, make_client):
+    stub.statuses = [401]
+    client = make_client()
+
+    async def run():
+        return [delta async for delta in client.astream([{"role": "user", "content": "hi"}])]
+
+    with pytest.raises(LLMError) as excinfo:
+        asyncio.run(run())
+    assert excinfo.value.status_code == 401
@@ -0,0 +1,138 @@
+"""
+Memory-Mapped Vector Store Tests
+Verifies search results, incremental appends, crash safety and FAISS conversion
+"""
+
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+
+from mmap_vector_store import (
+    MANIFEST_FILE,
+    VECTORS_FILE,
+    MmapVectorStore,
+    convert_faiss_directory,
+    is_mmap_store,
+    open_vector_store,
+)
+
+DIM = 8
+
+
+class FakeEmbeddings:
+    """Deterministic embeddings: hash each text into a fixed vector"""
+
+    def _vector(self, text):
+        rng = np.random.default_rng(abs(hash(text)) % (2 ** 32))
+        return rng.standard_normal(DIM).astype(np.float32).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+@pytest.fixture
+def embeddings():
+    return FakeEmbeddings()
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).standard_normal((20, DIM)).astype(np.float32)
+
+
+def test_create_and_search_matches_brute_force(tmp_path, embeddings, vectors):
+    texts = [f"chunk {i}" for i in range(len(vectors))]
+    metadatas = [{"chunk_index": i} for i in range(len(vectors))]
+    store = MmapVectorStore.create(str(tmp_path), embeddings, vectors, texts, metadatas)
+
+    query = vectors[7] + 0.01
+    results = store.similarity_search_with_score_by_vector(query, k=3)
+
+    expected = np.argsort(((vectors - query) ** 2).sum(axis=1))[:3]
+    assert [doc.metadata["chunk_index"] for doc, _ in results] == list(expected)
+    assert results[0][0].page_content == "chunk 7"
+    assert results[0][1] == pytest.approx(float(((vectors[7] - query) ** 2).sum()), abs=1e-4)
+
+
+def test_append_is_visible_after_commit(tmp_path, embeddings, vectors):
+    store = MmapVectorStore.create(str(tmp_path), embeddings, vectors[:5], [f"a{i}" for i in range(5)])
+    ids = store.add_vectors(vectors[5:8], ["b0", "b1", "b2"], [{"batch": 2}] * 3)
+
+    assert ids == ["5", "6", "7"]
+    reopened = MmapVectorStore(str(tmp_path), embeddings)
+    assert reopened.count == 8
+    assert reopened.get_text(6) == "b1"
+    assert reopened.get_metadata(6) == {"batch": 2}
+    assert reopened.get_metadata(0) == {}
+
+
+def test_uncommitted_bytes_are_ignored_and_discarded(tmp_path, embeddings, vectors):
+    store = MmapVectorStore.create(str(tmp_path), embeddings, vectors[:3], ["x", "y", "z"])
+
+    # Simulate a crash after writing vectors but before replacing the manifest
+    with open(os.path.join(tmp_path, VECTORS_FILE), "ab") as f:
+        f.write(vectors[3:5].tobytes())
+
+    assert MmapVectorStore(str(tmp_path), embeddings).count == 3
+    store.add_vectors(vectors[5:6], ["w"])
+    reopened = MmapVectorStore(str(tmp_path), embeddings)
+    assert reopened.count == 4
+    np.testing.assert_array_equal(reopened._vectors[3], vectors[5])
+
+
+def test_rebuild_keeps_open_readers_valid(tmp_path, embeddings, vectors):
+    path = str(tmp_path / "store")
+    reader = MmapVectorStore.create(path, embeddings, vectors, [f"old {i}" for i in range(len(vectors))])
+    with open(os.path.join(path, "index.faiss"), "wb") as f:
+        f.write(b"legacy")
+
+    MmapVectorStore.create(path, embeddings, vectors[:2], ["new 0", "new 1"])
+
+    # The old mapping still reads its full contents (truncation would SIGBUS here)
+    assert reader.similarity_search_by_vector(vectors[-1], k=1)[0].page_content == f"old {len(vectors) - 1}"
+    assert float(np.asarray(reader._vectors)[-1].sum()) == pytest.approx(float(vectors[-1].sum()))
+    rebuilt = MmapVectorStore(path, embeddings)
+    assert rebuilt.count == 2 and rebuilt.get_text(1) == "new 1"
+    assert os.path.exists(os.path.join(path, "index.faiss"))  # non-store files kept
+    assert sorted(os.listdir(tmp_path)) == ["store"]  # staging and retired dirs removed
+
+
+def test_retriever_interface(tmp_path, embeddings):
+    texts = ["headache today", "dizziness and balance", "vision changes"]
+    store = MmapVectorStore.from_texts(texts, embeddings, path=str(tmp_path))
+
+    docs = store.as_retriever(search_kwargs={"k": 1}).invoke("vision changes")
+    assert [d.page_content for d in docs] == ["vision changes"]
+
+
+def test_convert_legacy_faiss_directory(tmp_path, embeddings, vectors):
+    pytest.importorskip("faiss")
+    from langchain_community.vectorstores import FAISS
+
+    texts = [f"legacy {i}" for i in range(len(vectors))]
+    pairs = list(zip(texts, vectors.tolist()))
+    legacy = FAISS.from_embeddings(pairs, embeddings, metadatas=[{"i": i} for i in range(len(texts))])
+    legacy.save_local(str(tmp_path))
+
+    success, message = convert_faiss_directory(str(tmp_path))
+    assert success, message
+    assert is_mmap_store(str(tmp_path))
+    assert os.path.exists(os.path.join(tmp_path, "index.faiss"))  # legacy files kept
+
+    store = open_vector_store(str(tmp_path), embeddings)
+    assert isinstance(store, MmapVectorStore)
+    legacy_hits = legacy.similarity_search_with_score_by_vector(vectors[3].tolist(), k=4)
+    mmap_hits = store.similarity_search_with_score_by_vector(vectors[3], k=4)
+    assert [d.page_content for d, _ in mmap_hits] == [d.page_content for d, _ in legacy_hits]
+    assert [s for _, s in mmap_hits] == pytest.approx([float(s) for _, s in legacy_hits], abs=1e-3)
+    assert store.get_metadata(3) == {"i": 3}
+
+    # Second run is a no-op
+    assert convert_faiss_directory(str(tmp_path))[0]
+    assert os.path.exists(os.path.join(tmp_path, MANIFEST_FILE))
@@ -0,0 +1,73 @@
+"""
+PDF Extraction Tests
+Verifies parallel page extraction matches the sequential pypdf loop
+"""
+
+import pytest
+
+pypdf = pytest.importorskip("pypdf")
+
+from pdf_extract import PdfExtractor
+
+
+def make_pdf(path, page_texts):
+    """Write a minimal PDF with one line of Helvetica text per page"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in page_texts:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(out)
+    return str(path)
+
+
+@pytest.fixture
+def report(tmp_path):
+    return make_pdf(tmp_path / "report.pdf", [f"Page {i} blood pressure 120/80" for i in range(11)])
+
+
+def sequential_text(path, separator):
+    return "".join(page.extract_text() + separator for page in pypdf.PdfReader(path).pages)
+
+
+def test_parallel_matches_sequential(report):
+    extractor = PdfExtractor(max_workers=2, min_parallel_pages=2, pages_per_task=3)
+    try:
+        pages = list(extractor.iter_pages(report))
+        assert [page.index for page in pages] == list(range(11))
+        assert all(page.seconds >= 0 for page in pages)
+        assert all(page.page_count == 11 for page in pages)
+        assert extractor.extract_text(report, separator="\n") == sequential_text(report, "\n")
+        assert "Page 10 blood pressure" in pages[10].text
+
+        stats = extractor.get_stats()
+        assert stats["parallel_documents"] == 2 and stats["pages"] == 22
+        assert stats["pool_failures"] == 0
+        assert stats["avg_page_seconds"] is not None
+    finally:
+        extractor.close()
+
+
+def test_short_documents_and_file_objects_stay_in_process(tmp_path, report):
+    extractor = PdfExtractor(max_workers=2, min_parallel_pages=20)
+    assert extractor.extract_text(report) == sequential_text(report, "")
+
+    with open(report, "rb") as f:
+        assert PdfExtractor(max_workers=2, min_parallel_pages=1).extract_text(f) == sequential_text(report, "")
+    assert extractor.get_stats()["parallel_documents"] == 0
+    assert extractor._pool is None
@@ -0,0 +1,170 @@
+"""
+RAG Engine Pool Tests
+Verifies LRU bounds, idle TTL, per-patient invalidation, that turns on a
+shared engine are serialized and that engines only load committed patient stores
+"""
+
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("langchain_huggingface")
+
+import rag_engine
+from mmap_vector_store import StoreAppender
+from rag_engine import RAGEngine
+from rag_engine_pool import RAGEnginePool
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def built():
+    return []
+
+
+@pytest.fixture
+def make_pool(built):
+    def factory(patient_id):
+        engine = {"patient_id": patient_id, "build": len(built)}
+        built.append(engine)
+        return engine
+
+    def _make(**kwargs):
+        return RAGEnginePool(engine_factory=factory, **kwargs)
+    return _make
+
+
+def test_hit_reuses_engine(make_pool, built):
+    pool = make_pool(max_size=4)
+    first = pool.get("P001")
+    second = pool.get("P001")
+
+    assert first is second
+    assert len(built) == 1
+    stats = pool.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_lru_eviction(make_pool):
+    pool = make_pool(max_size=2)
+    pool.get("P001")
+    pool.get("P002")
+    pool.get("P001")  # P002 is now least recently used
+    pool.get("P003")
+
+    stats = pool.get_stats()
+    assert stats["size"] == 2
+    assert stats["evictions_lru"] == 1
+    pool.get("P001")
+    assert pool.get_stats()["hits"] == 2
+
+
+def test_idle_ttl_expires_engine(make_pool, built):
+    clock = FakeClock()
+    pool = make_pool(idle_ttl_seconds=60, clock=clock)
+    pool.get("P001")
+
+    clock.now = 61
+    pool.get("P001")
+
+    assert len(built) == 2
+    assert pool.get_stats()["evictions_ttl"] == 1
+
+
+def test_invalidate_only_drops_one_patient(make_pool, built):
+    pool = make_pool()
+    pool.get("P001")
+    pool.get("P002")
+
+    assert pool.invalidate("P001") is True
+    assert pool.invalidate("P001") is False
+
+    pool.get("P002")
+    pool.get("P001")
+    assert len(built) == 3
+    assert pool.get_stats()["invalidations"] == 1
+
+
+def test_failed_build_is_not_cached():
+    calls = []
+
+    def factory(patient_id):
+        calls.append(patient_id)
+        raise ValueError("Patient not found")
+
+    pool = RAGEnginePool(engine_factory=factory)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            pool.get("MISSING")
+    assert len(calls) == 2
+    assert pool.get_stats()["size"] == 0
+
+
+def test_concurrent_turns_on_shared_engine_are_serialized():
+    """Each turn sees the previous turn's question_count and history"""
+    engine = RAGEngine.__new__(RAGEngine)  # no stores or database needed
+    engine.turn_lock = threading.Lock()
+    engine.question_count = 0
+    engine.chat_history = []
+
+    def prepare_turn(question, context_docs=None, use_cache=True):
+        number = engine.question_count + 1
+        time.sleep(0.005)  # widen the race window
+        return {"number": number, "history": len(engine.chat_history), "cached_answer": question}
+
+    def finalize_turn(question, answer, turn):
+        time.sleep(0.005)
+        engine.question_count += 1
+        engine.chat_history.append({"question": question, "answer": answer})
+        return turn
+
+    engine.prepare_turn = prepare_turn
+    engine.finalize_turn = finalize_turn
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(engine.answer_question(f"q{i}")))
+               for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(r["number"] for r in results) == list(range(1, 9))
+    assert sorted(r["history"] for r in results) == list(range(8))
+    assert engine.question_count == 8 and len(engine.chat_history) == 8
+
+
+def test_patient_store_without_commit_marker_is_not_loaded(tmp_path, monkeypatch):
+    """A first upload in progress (directory, no manifest yet) means no patient store"""
+    from test_mmap_vector_store import FakeEmbeddings
+
+    class SharedIndex:
+        def get(self):
+            return self
+
+        def as_retriever(self, search_kwargs=None):
+            return object()
+
+    monkeypatch.setattr(rag_engine, "get_embeddings", lambda: FakeEmbeddings())
+    engine = RAGEngine.__new__(RAGEngine)
+    engine.patient_id = "P001"
+    engine.patient_store_path = str(tmp_path / "patient_P001")
+    engine.shared_index = SharedIndex()
+
+    appender = StoreAppender(engine.patient_store_path)
+    embeddings = FakeEmbeddings()
+    appender.append(embeddings.embed_documents(["blood pressure 120/80"]), ["blood pressure 120/80"])
+    engine._load_dual_vector_stores()
+    assert engine.patient_store is None and engine.patient_retriever is None
+
+    appender.commit()
+    engine._load_dual_vector_stores()
+    assert engine.patient_store.count == 1
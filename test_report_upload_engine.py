@@ -0,0 +1,102 @@
+"""
+Report Upload Engine Tests
+Verifies that report jobs retry transient failures, never index a committed
+upload twice and keep the uploaded file until the job is finished
+"""
+
+import os
+import time
+
+import pytest
+
+pytest.importorskip("langchain_huggingface")
+
+import report_upload_engine
+from ingest_jobs import STATUS_COMPLETE, STATUS_FAILED, IngestJobQueue
+from ingest_pipeline import IngestPipeline
+from mmap_vector_store import MmapVectorStore, committed_tag
+from test_mmap_vector_store import FakeEmbeddings
+
+
+class FlakyEmbeddings(FakeEmbeddings):
+    """Raises OSError (e.g. disk full, model files unreadable) on the first call"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.calls == 1:
+            raise OSError("No space left on device")
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def handler(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(report_upload_engine, "get_embeddings", lambda: FakeEmbeddings())
+    return report_upload_engine.ReportUploadHandler()
+
+
+def wait_for(queue, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in (STATUS_COMPLETE, STATUS_FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {queue.get(job_id)['status']}")
+
+
+def run_queue(handler, tmp_path, **payload):
+    removed = []
+
+    def run_report(job, progress):
+        return handler.process_and_index_report(
+            job["patient_id"], job["payload"]["file_path"], job["payload"]["filename"],
+            commit_tag=job["job_id"], keep_file=True, raise_errors=True)
+
+    def remove_upload(job):
+        removed.append(job["job_id"])
+        os.remove(job["payload"]["file_path"])
+
+    queue = IngestJobQueue(str(tmp_path / "jobs.db"), workers=1, max_attempts=3)
+    queue.register("report", run_report, on_finished=remove_upload)
+    queue.start()
+    try:
+        job = wait_for(queue, queue.submit("report", "P001", payload))
+        deadline = time.monotonic() + 5
+        while not removed and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return job, removed
+    finally:
+        queue.close()
+
+
+def test_transient_pipeline_error_is_retried(handler, tmp_path):
+    flaky = FlakyEmbeddings()
+    handler.processor.embeddings = flaky
+    handler.pipeline = IngestPipeline(handler.processor)
+    success, file_path = handler.save_uploaded_file(
+        "\n".join(f"Line {i}: blood pressure 120/80 mmHg, pulse 70 bpm, stable." for i in range(80)).encode(),
+        "report.txt")
+    assert success
+
+    job, removed = run_queue(handler, tmp_path, file_path=file_path, filename="report.txt")
+
+    assert job["status"] == STATUS_COMPLETE and job["attempts"] == 2
+    store_path = handler.vector_manager.get_patient_store_path("P001")
+    assert committed_tag(store_path, job["job_id"])["rows"] == job["result"]["chunks_count"]
+    assert MmapVectorStore(store_path, FakeEmbeddings()).count == job["result"]["chunks_count"]
+    assert removed == [job["job_id"]] and not os.path.exists(file_path)
+
+
+def test_unreadable_report_fails_without_retry(handler, tmp_path):
+    success, file_path = handler.save_uploaded_file(b"ok", "short.txt")
+    assert success
+
+    job, removed = run_queue(handler, tmp_path, file_path=file_path, filename="short.txt")
+
+    assert job["status"] == STATUS_FAILED and job["attempts"] == 1
+    assert job["error"].startswith("Text extraction failed")
+    assert removed == [job["job_id"]] and not os.path.exists(file_path)
@@ -0,0 +1,55 @@
+"""
+Deferred Risk Job Tests
+Verifies job lifecycle and TTL cleanup of finished jobs
+"""
+
+from risk_jobs import STATUS_COMPLETE, STATUS_FAILED, STATUS_PENDING, RiskJobStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_job_lifecycle():
+    store = RiskJobStore()
+    job_id = store.create("P001", message_id=42)
+
+    job = store.get(job_id)
+    assert job["status"] == STATUS_PENDING
+    assert job["message_id"] == 42
+
+    store.complete(job_id, {"risk_level": "HIGH", "reason": ["Sudden weakness"]})
+    job = store.get(job_id)
+    assert job["status"] == STATUS_COMPLETE
+    assert job["result"]["risk_level"] == "HIGH"
+    assert job["completed_at"] is not None
+
+
+def test_failed_job_keeps_error():
+    store = RiskJobStore()
+    job_id = store.create("P001")
+    store.fail(job_id, "timeout")
+
+    assert store.get(job_id)["status"] == STATUS_FAILED
+    assert store.get(job_id)["error"] == "timeout"
+    assert store.get_stats()[STATUS_FAILED] == 1
+
+
+def test_finished_jobs_expire_but_pending_jobs_do_not():
+    clock = FakeClock()
+    store = RiskJobStore(ttl_seconds=60, clock=clock)
+    done = store.create("P001")
+    pending = store.create("P002")
+    store.complete(done, {"risk_level": "LOW"})
+
+    clock.now = 61
+    assert store.get(done) is None
+    assert store.get(pending)["status"] == STATUS_PENDING
+
+
+def test_unknown_job():
+    assert RiskJobStore().get("missing") is None
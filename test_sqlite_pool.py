@@ -0,0 +1,74 @@
+"""
+SQLite Connection Pool Tests
+Verifies per-thread connection reuse, WAL settings and concurrent PatientManager writes
+"""
+
+import threading
+
+import pytest
+
+from patient_manager import PatientManager
+from sqlite_pool import ConnectionPool
+
+
+def test_connection_is_reused_per_thread_and_configured(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), busy_timeout_ms=1234)
+    conn = pool.connection()
+
+    assert pool.connection() is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 1234
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(pool.connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+    assert pool.get_stats()["opened"] == 2
+    pool.close()
+    assert pool.get_stats()["open_connections"] == 0
+
+
+def test_transaction_rolls_back_on_error(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"))
+    with pool.transaction() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+
+    with pytest.raises(RuntimeError):
+        with pool.transaction() as conn:
+            conn.execute("INSERT INTO t VALUES (1)")
+            raise RuntimeError("boom")
+
+    assert pool.connection().execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    assert pool.get_stats()["rollbacks"] == 1
+
+
+def test_concurrent_chat_writes_do_not_fail(tmp_path):
+    pm = PatientManager(db_path=str(tmp_path / "patients.db"))
+    for i in range(4):
+        pm.register_patient(f"P{i}", f"Patient {i}")
+
+    failures = []
+
+    def writer(patient_id):
+        for n in range(50):
+            if pm.insert_chat_message(patient_id, f"q{n}", "a", "LOW", "ok", ["doc"]) is None:
+                failures.append((patient_id, n))
+
+    threads = [threading.Thread(target=writer, args=(f"P{i % 4}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert failures == []
+    assert sum(len(pm.get_patient_history(f"P{i}", limit=1000)) for i in range(4)) == 400
+    pm.close()
+
+
+def test_insert_for_unknown_patient_returns_none(tmp_path):
+    pm = PatientManager(db_path=str(tmp_path / "patients.db"))
+    assert pm.insert_chat_message("missing", "q", "a", "LOW", "ok") is None
+    assert pm.get_patient_history("missing") == []
+    pm.close()